@@ -1,5 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
+from django.db.models import F
 from .models import User, PatientProfile, DoctorProfile
 
 
@@ -9,6 +10,7 @@ class CustomUserAdmin(UserAdmin):
     list_filter = ('user_type', 'is_active', 'is_staff', 'date_joined')
     search_fields = ('username', 'email', 'first_name', 'last_name', 'phone_number')
     ordering = ('-date_joined',)
+    actions = ['reset_calendar_feeds']
     
     fieldsets = UserAdmin.fieldsets + (
         ('Health Profile', {
@@ -23,6 +25,11 @@ class CustomUserAdmin(UserAdmin):
                       'emergency_contact_name', 'emergency_contact_phone')
         }),
     )
+    
+    def reset_calendar_feeds(self, request, queryset):
+        updated = queryset.update(calendar_feed_version=F('calendar_feed_version') + 1)
+        self.message_user(request, f'{updated} calendar feed links have been revoked.')
+    reset_calendar_feeds.short_description = "Revoke calendar feed links of selected users"
 
 
 @admin.register(PatientProfile)
@@ -0,0 +1,88 @@
+import asyncio
+import time
+from urllib.parse import parse_qs
+from channels.db import database_sync_to_async
+from channels.middleware import BaseMiddleware
+from django.contrib.auth.models import AnonymousUser
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken, TokenError
+from rest_framework_simplejwt.tokens import AccessToken
+from .tokens import ClaimsUser
+
+TOKEN_QUERY_PARAM = 'token'
+# Browsers cannot set headers on a WebSocket, so the token can also be offered as ['bearer', <token>] subprotocols
+TOKEN_SUBPROTOCOL = 'bearer'
+TOKEN_EXPIRED_CLOSE_CODE = 4001  # Tells the client to refresh its token and reconnect
+
+
+def raw_token(scope):
+    """The access token and the subprotocol to accept, from the subprotocols or the query string"""
+    subprotocols = list(scope.get('subprotocols') or [])
+    if TOKEN_SUBPROTOCOL in subprotocols[:-1]:
+        return subprotocols[subprotocols.index(TOKEN_SUBPROTOCOL) + 1], TOKEN_SUBPROTOCOL
+    query = parse_qs(scope.get('query_string', b'').decode())
+    if query.get(TOKEN_QUERY_PARAM):
+        return query[TOKEN_QUERY_PARAM][0], None
+    return None, None
+
+
+@database_sync_to_async
+def token_model_user(token):
+    try:
+        return JWTAuthentication().get_user(token)
+    except (AuthenticationFailed, InvalidToken):
+        return AnonymousUser()
+
+
+class JWTAuthMiddleware(BaseMiddleware):
+    """Authenticates WebSocket connections with a SimpleJWT access token.
+
+    The token is verified locally and ``scope['user']`` is a ``ClaimsUser``
+    built from its claims, so connecting costs no session or user query.
+    Only tokens issued before the ``user_type`` claim existed fall back to
+    loading the user. When the token expires the socket is closed with code
+    4001 and nothing more is sent on it; the client refreshes and reconnects.
+    """
+
+    async def __call__(self, scope, receive, send):
+        scope = dict(scope)
+        token, subprotocol = raw_token(scope)
+        validated = None
+        if token:
+            try:
+                validated = AccessToken(token)
+            except TokenError:
+                pass
+
+        if validated is None:
+            scope['user'] = AnonymousUser()
+            return await super().__call__(scope, receive, send)
+
+        if 'user_type' in validated:
+            scope['user'] = ClaimsUser(validated)
+        else:
+            scope['user'] = await token_model_user(validated)
+        scope['token_expires_at'] = validated['exp']
+
+        closed = False
+
+        async def guarded_send(message):
+            nonlocal closed
+            if closed:
+                return
+            if message['type'] == 'websocket.accept' and subprotocol and not message.get('subprotocol'):
+                # The browser drops the connection unless one of its offered subprotocols is accepted
+                message = dict(message, subprotocol=subprotocol)
+            elif message['type'] == 'websocket.close':
+                closed = True
+            await send(message)
+
+        async def expire():
+            await asyncio.sleep(max(scope['token_expires_at'] - time.time(), 0))
+            await guarded_send({'type': 'websocket.close', 'code': TOKEN_EXPIRED_CLOSE_CODE})
+
+        expiry = asyncio.ensure_future(expire())
+        try:
+            return await super().__call__(scope, receive, guarded_send)
+        finally:
+            expiry.cancel()
@@ -20,6 +20,8 @@ class User(AbstractUser):
     emergency_contact_name = models.CharField(max_length=100, blank=True)
     emergency_contact_phone = models.CharField(max_length=15, blank=True)
     profile_picture = models.ImageField(upload_to='profiles/', null=True, blank=True)
+    # Signed into calendar feed URLs; bumping it revokes every URL issued before
+    calendar_feed_version = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
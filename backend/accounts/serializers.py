@@ -1,9 +1,14 @@
 from rest_framework import serializers
 from django.contrib.auth import authenticate
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
 from .models import User, PatientProfile, DoctorProfile
+from .tokens import user_access_token
+from alturos_health.eager_loading import EagerLoadingMixin
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(EagerLoadingMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['id', 'username', 'email', 'first_name', 'last_name', 'user_type', 
@@ -12,22 +17,33 @@ class UserSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at']
 
 
-class PatientProfileSerializer(serializers.ModelSerializer):
+class PatientProfileSerializer(EagerLoadingMixin, serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
+    select_related_fields = ('user',)
     
     class Meta:
         model = PatientProfile
         fields = '__all__'
 
 
-class DoctorProfileSerializer(serializers.ModelSerializer):
+class DoctorProfileSerializer(EagerLoadingMixin, serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
+    select_related_fields = ('user',)
     
     class Meta:
         model = DoctorProfile
         fields = '__all__'
 
 
+class DoctorSummarySerializer(EagerLoadingMixin, serializers.ModelSerializer):
+    name = serializers.CharField(source='user.get_full_name', read_only=True)
+    select_related_fields = ('user',)
+    
+    class Meta:
+        model = DoctorProfile
+        fields = ['id', 'name', 'specialty', 'years_of_experience', 'consultation_fee', 'rating']
+
+
 class RegisterSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, min_length=8)
     password_confirm = serializers.CharField(write_only=True)
@@ -98,3 +114,25 @@ class LoginSerializer(serializers.Serializer):
             return attrs
         else:
             raise serializers.ValidationError('Must include username and password')
+
+
+class UserTypeTokenRefreshSerializer(TokenRefreshSerializer):
+    """Refreshes re-read the user, so deactivated users are refused and role changes reach the new access token"""
+    
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        user = User.objects.filter(pk=refresh[api_settings.USER_ID_CLAIM], is_active=True).first()
+        if user is None:
+            raise AuthenticationFailed('User is inactive or no longer exists', code='user_inactive')
+        # Refresh tokens issued while the claim lived on them would keep copying it forward
+        refresh.payload.pop('user_type', None)
+        
+        data = {'access': str(user_access_token(refresh, user))}
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            if api_settings.BLACKLIST_AFTER_ROTATION:
+                refresh.blacklist()
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            data['refresh'] = str(refresh)
+        return data
@@ -0,0 +1,125 @@
+import json
+import time
+from datetime import time as clock
+from unittest import mock
+import pytest
+from asgiref.sync import async_to_sync
+from django.utils import timezone
+from asgiref.testing import ApplicationCommunicator
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+from accounts.middleware import TOKEN_EXPIRED_CLOSE_CODE, JWTAuthMiddleware
+from accounts.models import User
+from accounts.tokens import ClaimsUser, user_access_token
+from alturos_health.asgi import application
+from appointments.models import Appointment
+
+
+def socket_app(users):
+    async def app(scope, receive, send):
+        users.append(scope['user'])
+        await receive()
+        await send({'type': 'websocket.accept'})
+        while (await receive())['type'] != 'websocket.disconnect':
+            await send({'type': 'websocket.send', 'text': 'pong'})
+    return app
+
+
+def handshake(token=None, subprotocols=(), timeout=1):
+    users = []
+
+    async def run():
+        communicator = ApplicationCommunicator(JWTAuthMiddleware(socket_app(users)), {
+            'type': 'websocket', 'path': '/ws/stream/', 'headers': [], 'subprotocols': list(subprotocols),
+            'query_string': f'token={token}'.encode() if token else b'',
+        })
+        await communicator.send_input({'type': 'websocket.connect'})
+        accepted = await communicator.receive_output(timeout=1)
+        closed = await communicator.receive_output(timeout=timeout) if timeout > 1 else None
+        await communicator.send_input({'type': 'websocket.disconnect', 'code': 1000})
+        await communicator.wait(timeout=1)
+        return accepted, closed
+
+    accepted, closed = async_to_sync(run)()
+    return users[0], accepted, closed
+
+
+@pytest.mark.django_db
+def test_connect_builds_the_user_from_claims(patient, django_assert_num_queries):
+    access = user_access_token(RefreshToken.for_user(patient), patient)
+    with django_assert_num_queries(0):
+        user, accepted, _ = handshake(str(access))
+    assert isinstance(user, ClaimsUser)
+    assert (user.id, user.user_type) == (patient.id, 'patient')
+    assert 'subprotocol' not in accepted
+
+    user, accepted, _ = handshake(subprotocols=['bearer', str(access)])
+    assert user.id == patient.id
+    assert accepted['subprotocol'] == 'bearer'
+
+
+@pytest.mark.django_db
+def test_tokens_without_the_claim_load_the_user(patient):
+    user, _, _ = handshake(str(RefreshToken.for_user(patient).access_token))
+    assert isinstance(user, User) and user == patient
+
+    for bad in ('garbage', str(RefreshToken.for_user(patient))):
+        assert handshake(bad)[0].is_anonymous
+    assert handshake()[0].is_anonymous
+
+
+@pytest.mark.django_db
+def test_socket_closes_when_the_token_expires(patient):
+    access = AccessToken.for_user(patient)
+    access['user_type'] = patient.user_type
+    access['exp'] = int(time.time()) + 1
+    _, accepted, closed = handshake(str(access), timeout=3)
+    assert accepted['type'] == 'websocket.accept'
+    assert closed == {'type': 'websocket.close', 'code': TOKEN_EXPIRED_CLOSE_CODE}
+
+
+@pytest.mark.django_db
+def test_login_tokens_carry_the_user_type(client, patient):
+    response = client.post('/api/auth/login/', {'username': 'patient', 'password': 'Password123'})
+    assert AccessToken(response.data['access'])['user_type'] == 'patient'
+    refresh = response.data['refresh']
+    assert 'user_type' not in RefreshToken(refresh)
+
+    # A role change applies from the next refresh, and the rotated refresh token does not carry it
+    User.objects.filter(pk=patient.pk).update(user_type='doctor')
+    response = client.post('/api/auth/token/refresh/', {'refresh': refresh})
+    assert response.status_code == 200
+    assert AccessToken(response.data['access'])['user_type'] == 'doctor'
+    assert 'user_type' not in RefreshToken(response.data['refresh'])
+
+    User.objects.filter(pk=patient.pk).update(is_active=False)
+    response = client.post('/api/auth/token/refresh/', {'refresh': response.data['refresh']})
+    assert response.status_code == 401
+
+
+@pytest.mark.django_db(transaction=True)
+def test_consumers_act_for_the_claims_user(doctor, patient, settings):
+    settings.CHANNEL_LAYERS = {'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}}
+    appointment = Appointment.objects.create(patient=patient, doctor=doctor, appointment_type='consultation',
+                                             scheduled_date=timezone.localdate(), scheduled_time=clock(9, 0),
+                                             reason_for_visit='Checkup')
+    token = user_access_token(RefreshToken.for_user(doctor.user), doctor.user)
+
+    async def run():
+        communicator = ApplicationCommunicator(application, {
+            'type': 'websocket', 'path': '/ws/stream/', 'headers': [], 'subprotocols': [],
+            'query_string': f'token={token}&streams=appointments'.encode(),
+        })
+        await communicator.send_input({'type': 'websocket.connect'})
+        assert (await communicator.receive_output(timeout=1))['type'] == 'websocket.accept'
+        await communicator.send_input({'type': 'websocket.receive', 'text': json.dumps({
+            'stream': 'appointments',
+            'payload': {'type': 'update_status', 'appointment_id': str(appointment.id), 'status': 'confirmed'},
+        })})
+        await communicator.receive_nothing(timeout=0.2)
+        await communicator.send_input({'type': 'websocket.disconnect', 'code': 1000})
+        await communicator.wait(timeout=1)
+
+    with mock.patch('notifications.tasks.relay_outbox.delay'):
+        async_to_sync(run)()
+    appointment.refresh_from_db()
+    assert appointment.status == 'confirmed'
@@ -0,0 +1,28 @@
+from django.contrib.auth import get_user_model
+from django.utils.functional import cached_property
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+
+
+def user_access_token(refresh, user):
+    """An access token from ``refresh`` carrying the user's current type.
+
+    The claim only ever goes on short-lived access tokens and is read from the
+    user again at every refresh, so a role change applies from the next one.
+    """
+    access = refresh.access_token
+    access['user_type'] = user.user_type
+    return access
+
+
+class ClaimsUser(TokenUser):
+    """Stateless user built from access-token claims, for code that only needs the id and type"""
+
+    @cached_property
+    def id(self):
+        # The claim holds the UUID as a string; convert it so it compares equal to foreign key values
+        return get_user_model()._meta.pk.to_python(self.token[api_settings.USER_ID_CLAIM])
+
+    @cached_property
+    def user_type(self):
+        return self.token.get('user_type')
@@ -4,6 +4,8 @@ from rest_framework.response import Response
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth import authenticate
 from .models import User, PatientProfile, DoctorProfile
+from .tokens import user_access_token
+from alturos_health.eager_loading import EagerLoadingViewMixin
 from .serializers import (
     UserSerializer, PatientProfileSerializer, DoctorProfileSerializer,
     RegisterSerializer, LoginSerializer
@@ -26,7 +28,7 @@ class RegisterView(generics.CreateAPIView):
         return Response({
             'user': UserSerializer(user).data,
             'refresh': str(refresh),
-            'access': str(refresh.access_token),
+            'access': str(user_access_token(refresh, user)),
             'message': 'Registration successful'
         }, status=status.HTTP_201_CREATED)
 
@@ -50,7 +52,7 @@ def login_view(request):
             'user': UserSerializer(user).data,
             'profile': profile_data,
             'refresh': str(refresh),
-            'access': str(refresh.access_token),
+            'access': str(user_access_token(refresh, user)),
             'message': 'Login successful'
         })
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -94,7 +96,7 @@ class UserProfileView(generics.RetrieveUpdateAPIView):
         return self.request.user
 
 
-class DoctorListView(generics.ListAPIView):
+class DoctorListView(EagerLoadingViewMixin, generics.ListAPIView):
     queryset = DoctorProfile.objects.filter(is_available=True)
     serializer_class = DoctorProfileSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -128,7 +130,7 @@ def patient_list_view(request):
         if request.user.user_type != 'doctor':
             return Response({'error': 'Access denied. Doctors only.'}, status=status.HTTP_403_FORBIDDEN)
         
-        patients = PatientProfile.objects.all()
+        patients = PatientProfileSerializer.setup_eager_loading(PatientProfile.objects.all())
         serializer = PatientProfileSerializer(patients, many=True)
         return Response(serializer.data)
     except Exception as e:
@@ -4,15 +4,17 @@ ASGI config for alturos_health project.
 
 import os
 from django.core.asgi import get_asgi_application
-from channels.routing import ProtocolTypeRouter, URLRouter
-from channels.auth import AuthMiddlewareStack
-import notifications.routing
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'alturos_health.settings')
+django_asgi_app = get_asgi_application()
+
+from channels.routing import ProtocolTypeRouter, URLRouter  # noqa: E402
+from accounts.middleware import JWTAuthMiddleware  # noqa: E402
+import notifications.routing  # noqa: E402
 
 application = ProtocolTypeRouter({
-    "http": get_asgi_application(),
-    "websocket": AuthMiddlewareStack(
+    "http": django_asgi_app,
+    "websocket": JWTAuthMiddleware(
         URLRouter(
             notifications.routing.websocket_urlpatterns
         )
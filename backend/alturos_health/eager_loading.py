@@ -0,0 +1,54 @@
+"""
+Declarative eager loading for nested serializers.
+
+Serializers list the relations their representation reads; nested
+serializers contribute their own relations under the parent's prefix, so
+``AppointmentSerializer`` declaring ``doctor`` picks up ``doctor__user``
+from ``DoctorProfileSerializer``. Generic views using
+``EagerLoadingViewMixin`` apply the result to every queryset they serialize.
+"""
+
+
+class EagerLoadingMixin:
+    select_related_fields = ()
+    prefetch_related_fields = ()
+
+    @classmethod
+    def get_eager_relations(cls, prefix=''):
+        """Return ``(select_related, prefetch_related)`` lookups for this serializer and its nested ones"""
+        select = [prefix + name for name in cls.select_related_fields]
+        prefetch = [prefix + name for name in cls.prefetch_related_fields]
+
+        for field_name, field in cls._declared_fields.items():
+            nested = getattr(field, 'child', field)
+            if not isinstance(nested, EagerLoadingMixin):
+                continue
+            source = field.source or field_name
+            nested_select, nested_prefetch = type(nested).get_eager_relations(f'{prefix}{source}__')
+            if source in cls.select_related_fields:
+                select += nested_select
+                prefetch += nested_prefetch
+            elif source in cls.prefetch_related_fields:
+                # Anything below a prefetched relation has to be prefetched as well
+                prefetch += nested_select + nested_prefetch
+        return select, prefetch
+
+    @classmethod
+    def setup_eager_loading(cls, queryset):
+        select, prefetch = cls.get_eager_relations()
+        if select:
+            queryset = queryset.select_related(*select)
+        if prefetch:
+            queryset = queryset.prefetch_related(*prefetch)
+        return queryset
+
+
+class EagerLoadingViewMixin:
+    """Generic view mixin that applies the serializer's declared relations"""
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        serializer_class = self.get_serializer_class()
+        if issubclass(serializer_class, EagerLoadingMixin):
+            queryset = serializer_class.setup_eager_loading(queryset)
+        return queryset
@@ -0,0 +1,86 @@
+import base64
+import binascii
+import json
+from collections import OrderedDict
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(PageNumberPagination):
+    """
+    Page-number pagination by default, keyset pagination when the client sends
+    ``?cursor=`` (empty for the first page).
+
+    In keyset mode the view's ``keyset_ordering`` must end in a unique field.
+    Each page seeks past the last row of the previous one using the opaque
+    cursor, so there is no COUNT and no OFFSET and deep pages cost the same
+    as the first.
+    """
+    cursor_query_param = 'cursor'
+    keyset_ordering = ('-created_at', '-id')
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset_mode = self.cursor_query_param in request.query_params
+        if not self.keyset_mode:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        self.ordering = tuple(getattr(view, 'keyset_ordering', self.keyset_ordering))
+        self.fields = [queryset.model._meta.get_field(name.lstrip('-')) for name in self.ordering]
+        page_size = self.get_page_size(request)
+
+        position = self.decode_cursor(request.query_params[self.cursor_query_param])
+        queryset = queryset.order_by(*self.ordering)
+        if position is not None:
+            queryset = queryset.filter(self.seek_filter(position))
+
+        rows = list(queryset[:page_size + 1])
+        self.has_next = len(rows) > page_size
+        self.page = rows[:page_size]
+        return self.page
+
+    def seek_filter(self, position):
+        """Rows strictly after ``position`` in the lexicographic keyset order"""
+        condition = Q()
+        equal = Q()
+        for name, field, value in zip(self.ordering, self.fields, position):
+            lookup = 'lt' if name.startswith('-') else 'gt'
+            condition |= equal & Q(**{f'{field.name}__{lookup}': value})
+            equal &= Q(**{field.name: value})
+        return condition
+
+    def encode_cursor(self, obj):
+        values = [field.value_to_string(obj) for field in self.fields]
+        return base64.urlsafe_b64encode(json.dumps(values).encode()).decode('ascii')
+
+    def decode_cursor(self, cursor):
+        if not cursor:
+            return None
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+            if not isinstance(values, list) or len(values) != len(self.fields):
+                raise ValueError
+            return [field.to_python(value) for field, value in zip(self.fields, values)]
+        except (binascii.Error, UnicodeError, ValueError, TypeError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_next_link(self):
+        if not self.keyset_mode:
+            return super().get_next_link()
+        if not self.has_next:
+            return None
+        url = remove_query_param(self.request.build_absolute_uri(), self.page_query_param)
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.page[-1]))
+
+    def get_paginated_response(self, data):
+        if not self.keyset_mode:
+            return super().get_paginated_response(data)
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data),
+        ]))
@@ -37,6 +37,7 @@ INSTALLED_APPS = [
     'notifications',
     'places',
     'locations',
+    'analytics',
 ]
 
 MIDDLEWARE = [
@@ -117,6 +118,23 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# QR codes are rendered on demand and cached rather than stored under MEDIA_ROOT
+QR_CODE_CACHE_SIZE = 512  # Rendered images kept in each process
+QR_CODE_CACHE_TIMEOUT = 60 * 60 * 24  # Seconds in the shared cache
+QR_CODE_MAX_AGE = 60 * 60  # Cache-Control max-age for clients
+
+# QR check-in tokens
+CHECK_IN_EARLIEST = timedelta(hours=2)  # How long before the start a token is accepted
+CHECK_IN_TOKEN_GRACE = timedelta(hours=2)  # How long after the scheduled end a token stays valid
+
+# Scheduling
+AVAILABILITY_HORIZON_DAYS = 60  # How far ahead availability templates are expanded into slots
+WAITLIST_OFFER_HOLD = timedelta(minutes=15)  # How long a freed slot is held for the waitlisted patient it was offered to
+
+# Analytics exports (need pyarrow)
+ANALYTICS_EXPORT_ROOT = os.environ.get('ANALYTICS_EXPORT_ROOT', os.path.join(BASE_DIR, 'exports'))
+ANALYTICS_EXPORT_DEIDENTIFY = True  # Scheduled exports pseudonymise patients and drop free text
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -153,7 +171,8 @@ SIMPLE_JWT = {
     'USER_AUTHENTICATION_RULE': 'rest_framework_simplejwt.authentication.default_user_authentication_rule',
     'AUTH_TOKEN_CLASSES': ('rest_framework_simplejwt.tokens.AccessToken',),
     'TOKEN_TYPE_CLAIM': 'token_type',
-    'TOKEN_USER_CLASS': 'rest_framework_simplejwt.models.TokenUser',
+    'TOKEN_USER_CLASS': 'accounts.tokens.ClaimsUser',
+    'TOKEN_REFRESH_SERIALIZER': 'accounts.serializers.UserTypeTokenRefreshSerializer',
     'JTI_CLAIM': 'jti',
     'SLIDING_TOKEN_REFRESH_EXP_CLAIM': 'refresh_exp',
     'SLIDING_TOKEN_LIFETIME': timedelta(minutes=5),
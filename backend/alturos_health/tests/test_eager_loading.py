@@ -0,0 +1,58 @@
+import pytest
+from datetime import date, time
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from accounts.serializers import DoctorProfileSerializer
+from appointments.models import Appointment
+from appointments.serializers import AppointmentSerializer
+from medical_records.models import LabResult, MedicalRecord, Prescription
+from notifications.models import Notification
+
+
+def seed(patient, doctor, count):
+    for n in range(count):
+        appointment = Appointment.objects.create(
+            patient=patient, doctor=doctor, appointment_type='consultation',
+            scheduled_date=date(2030, 1, 1 + n), scheduled_time=time(9, 0), reason_for_visit='Checkup'
+        )
+        record = MedicalRecord.objects.create(patient=patient, doctor=doctor, appointment=appointment,
+                                              record_type='consultation', title=f'Visit {n}', description='Notes')
+        Prescription.objects.create(patient=patient, doctor=doctor, medical_record=record, medication_name='Drug',
+                                    dosage='1', frequency='daily', duration='1 week', start_date=date(2030, 1, 1))
+        LabResult.objects.create(patient=patient, doctor=doctor, medical_record=record, test_name='CBC',
+                                 test_type='blood', result_value='ok', test_date=timezone.now())
+        Notification.objects.create(recipient=patient, notification_type='system_update', title='Hi', message='x')
+
+
+ENDPOINTS = ['appointment_list_create', 'medical_record_list', 'prescription_list', 'lab_result_list', 'notification_list']
+
+
+def count_queries(client, url):
+    with CaptureQueriesContext(connection) as context:
+        response = client.get(url)
+    assert response.status_code == 200
+    return len(context), len(response.data['results'])
+
+
+def test_nested_serializers_contribute_prefixed_relations():
+    assert AppointmentSerializer.get_eager_relations() == (['patient', 'doctor', 'doctor__user'], [])
+    assert DoctorProfileSerializer.get_eager_relations() == (['user'], [])
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('endpoint', ENDPOINTS)
+def test_list_query_budget_is_independent_of_page_size(patient, doctor, endpoint):
+    client = APIClient()
+    client.force_authenticate(patient)
+    url = reverse(endpoint)
+
+    seed(patient, doctor, 2)
+    small_queries, small_rows = count_queries(client, url)
+    seed(patient, doctor, 18)
+    large_queries, large_rows = count_queries(client, url)
+
+    assert (small_rows, large_rows) == (2, 20)
+    assert small_queries == large_queries == 2  # COUNT plus one joined SELECT
@@ -0,0 +1,81 @@
+import pytest
+from datetime import date, time, timedelta
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from appointments.models import Appointment
+from notifications.models import Notification
+
+
+@pytest.fixture
+def client(patient):
+    client = APIClient()
+    client.force_authenticate(patient)
+    return client
+
+
+def walk(client, url):
+    """Follow next links from the first keyset page, returning ids and per-page SQL"""
+    ids, pages = [], []
+    url = f'{url}?cursor='
+    while url:
+        with CaptureQueriesContext(connection) as context:
+            r = client.get(url)
+        assert r.status_code == 200
+        assert set(r.data) == {'next', 'results'}
+        ids += [row['id'] for row in r.data['results']]
+        pages.append([q['sql'] for q in context.captured_queries])
+        url = r.data['next']
+    return ids, pages
+
+
+@pytest.mark.django_db
+def test_notification_cursor_walk_is_complete_and_stable(client, patient):
+    notifications = [
+        Notification.objects.create(recipient=patient, notification_type='system_update', title=str(n), message='x')
+        for n in range(45)
+    ]
+    # Force timestamp ties so the id tiebreaker matters
+    stamp = timezone.now()
+    Notification.objects.filter(id__in=[n.id for n in notifications[10:30]]).update(created_at=stamp)
+
+    ids, pages = walk(client, reverse('notification_list'))
+
+    expected = list(Notification.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+    assert ids == [str(i) for i in expected]
+    assert len(pages) == 3
+    for sql in pages:
+        assert len(sql) == 1
+        assert 'COUNT(' not in sql[0].upper() and 'OFFSET' not in sql[0].upper()
+
+
+@pytest.mark.django_db
+def test_appointment_cursor_uses_schedule_order(client, patient, doctor):
+    for n in range(25):
+        Appointment.objects.create(patient=patient, doctor=doctor, appointment_type='consultation',
+                                   scheduled_date=date(2030, 1, 1) + timedelta(days=n % 5),
+                                   scheduled_time=time(9, 0), reason_for_visit='Checkup')
+
+    ids, _ = walk(client, reverse('appointment_list_create'))
+
+    expected = Appointment.objects.order_by('-scheduled_date', '-scheduled_time', '-id').values_list('id', flat=True)
+    assert ids == [str(i) for i in expected]
+
+
+@pytest.mark.django_db
+def test_page_number_mode_is_unchanged(client, patient):
+    for n in range(25):
+        Notification.objects.create(recipient=patient, notification_type='system_update', title=str(n), message='x')
+
+    r = client.get(reverse('notification_list'), {'page': 2})
+
+    assert r.data['count'] == 25
+    assert len(r.data['results']) == 5
+
+
+@pytest.mark.django_db
+def test_invalid_cursor_is_404(client):
+    r = client.get(reverse('notification_list'), {'cursor': 'not-a-cursor'})
+    assert r.status_code == 404
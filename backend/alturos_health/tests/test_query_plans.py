@@ -0,0 +1,154 @@
+"""
+Query-plan regression tests for the hot read paths.
+
+Each test seeds enough rows for the planner to care, refreshes statistics and
+inspects ``QuerySet.explain()``. On SQLite the plan must SEARCH the table
+through the expected index rather than SCAN it; on PostgreSQL sequential scans
+are disabled for the check so any plan that still contains one means no usable
+index exists.
+"""
+import pytest
+from datetime import date, time, timedelta
+from django.db import connection, transaction
+from django.utils import timezone
+from accounts.models import User, DoctorProfile
+from appointments.availability import BLOCKING_STATUSES
+from appointments.models import Appointment, AppointmentSlot
+from medical_records.models import MedicalRecord
+from notifications.models import Notification
+
+DAY = date(2030, 3, 4)
+
+
+@pytest.fixture
+def seeded(db):
+    users = User.objects.bulk_create([
+        User(username=f'user{n}', user_type='patient' if n % 4 else 'doctor') for n in range(40)
+    ])
+    doctors = DoctorProfile.objects.bulk_create([
+        DoctorProfile(user=user, license_number=f'LIC-{user.username}', specialty='cardiology')
+        for user in users if user.user_type == 'doctor'
+    ])
+    patients = [user for user in users if user.user_type == 'patient']
+
+    appointments, slots, records, notifications = [], [], [], []
+    for n in range(2000):
+        doctor, patient = doctors[n % len(doctors)], patients[n % len(patients)]
+        day = DAY + timedelta(days=n % 60)
+        at = time(8 + n % 10, 0)
+        appointments.append(Appointment(
+            appointment_id=f'Q{n:08d}', patient=patient, doctor=doctor, appointment_type='consultation',
+            scheduled_date=day, scheduled_time=at, reason_for_visit='Checkup',
+            status=('scheduled', 'confirmed', 'cancelled', 'completed')[n % 4]
+        ))
+        slots.append(AppointmentSlot(doctor=doctor, date=day, start_time=at, end_time=time(8 + n % 10, 30)))
+        records.append(MedicalRecord(patient=patient, doctor=doctor, record_type='consultation',
+                                     title=str(n), description='x'))
+        notifications.append(Notification(recipient=patient, notification_type='system_update',
+                                          title=str(n), message='x', is_read=n % 5 != 0))
+    Appointment.objects.bulk_create(appointments)
+    AppointmentSlot.objects.bulk_create(slots, ignore_conflicts=True)
+    MedicalRecord.objects.bulk_create(records)
+    Notification.objects.bulk_create(notifications)
+
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+    return doctors[0], patients[0]
+
+
+def explain(queryset):
+    if connection.vendor == 'postgresql':
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            return queryset.explain()
+    return queryset.explain()
+
+
+def assert_uses_index(queryset, index_names):
+    plan = explain(queryset)
+    table = queryset.model._meta.db_table
+    if connection.vendor == 'postgresql':
+        assert f'Seq Scan on {table}' not in plan, plan
+    elif connection.vendor == 'sqlite':
+        lines = [line for line in plan.splitlines() if f' {table} ' in f'{line} ']
+        assert lines, plan
+        for line in lines:
+            assert f'SCAN {table}' not in line or 'USING' in line, plan
+        assert any(name in plan for name in index_names), plan
+    return plan
+
+
+@pytest.mark.django_db
+def test_doctor_agenda_uses_schedule_index(seeded):
+    doctor, _ = seeded
+    queryset = Appointment.objects.filter(doctor=doctor, scheduled_date=DAY).order_by('scheduled_time')
+    plan = assert_uses_index(queryset, ['appt_doctor_schedule_idx'])
+    if connection.vendor == 'sqlite':
+        assert 'TEMP B-TREE' not in plan, plan
+
+
+@pytest.mark.django_db
+def test_availability_build_uses_indexes(seeded):
+    doctor, _ = seeded
+    end = DAY + timedelta(days=30)
+    assert_uses_index(
+        Appointment.objects.filter(doctor_id__in=[doctor.id], scheduled_date__gte=DAY, scheduled_date__lte=end,
+                                   status__in=BLOCKING_STATUSES).order_by(),
+        ['appt_doctor_schedule_idx']
+    )
+    assert_uses_index(
+        AppointmentSlot.objects.filter(doctor_id__in=[doctor.id], date__gte=DAY, date__lte=end,
+                                       is_available=True).order_by(),
+        ['appointments_appointmentslot_doctor_id_date_start_time']
+    )
+
+
+@pytest.mark.django_db
+def test_slot_horizon_scan_uses_date_index(seeded):
+    assert_uses_index(
+        AppointmentSlot.objects.filter(date__gte=DAY, date__lte=DAY + timedelta(days=6)),
+        ['slot_date_time_idx']
+    )
+
+
+@pytest.mark.django_db
+def test_patient_timeline_uses_patient_index(seeded):
+    _, patient = seeded
+    queryset = Appointment.objects.filter(patient=patient).order_by('-scheduled_date', '-scheduled_time')
+    assert_uses_index(queryset, ['appt_patient_schedule_idx'])
+
+
+@pytest.mark.django_db
+def test_reminder_scan_uses_status_index(seeded):
+    queryset = Appointment.objects.filter(status='confirmed', scheduled_date=DAY)
+    assert_uses_index(queryset, ['appt_status_schedule_idx'])
+
+
+@pytest.mark.django_db
+def test_unread_notifications_use_partial_index(seeded):
+    _, patient = seeded
+    queryset = Notification.objects.filter(recipient=patient, is_read=False).order_by('-created_at')
+    assert_uses_index(queryset, ['notif_unread_idx', 'notif_recipient_read_idx'])
+
+
+@pytest.mark.django_db
+def test_notification_timeline_uses_recipient_index(seeded):
+    _, patient = seeded
+    queryset = Notification.objects.filter(recipient=patient).order_by('-created_at', '-id')
+    assert_uses_index(queryset, ['notif_recipient_created_idx'])
+
+
+@pytest.mark.django_db
+def test_recent_notes_use_doctor_index(seeded):
+    doctor, _ = seeded
+    queryset = MedicalRecord.objects.filter(
+        doctor=doctor, created_at__gte=timezone.now() - timedelta(days=30)
+    ).order_by('-created_at')
+    assert_uses_index(queryset, ['record_doctor_created_idx'])
+
+
+@pytest.mark.django_db
+def test_patient_records_use_patient_index(seeded):
+    _, patient = seeded
+    queryset = MedicalRecord.objects.filter(patient=patient).order_by('-created_at', '-id')
+    assert_uses_index(queryset, ['record_patient_created_idx'])
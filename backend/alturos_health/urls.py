@@ -14,6 +14,7 @@ urlpatterns = [
     path('api/notifications/', include('notifications.urls')),
     path('api/places/', include('places.urls')),
     path('api/locations/', include('locations.urls')),
+    path('api/analytics/', include('analytics.urls')),
 ]
 
 if settings.DEBUG:
@@ -0,0 +1,19 @@
+from django.contrib import admin
+from .models import DirtyDoctorDay, DoctorDailyStats
+
+
+@admin.register(DoctorDailyStats)
+class DoctorDailyStatsAdmin(admin.ModelAdmin):
+    list_display = ('doctor', 'specialty', 'date', 'total_count', 'completed_count', 'no_show_count',
+                    'cancelled_count', 'booked_minutes', 'capacity_minutes', 'updated_at')
+    list_filter = ('specialty', 'date')
+    search_fields = ('doctor__user__username', 'doctor__user__first_name', 'doctor__user__last_name')
+    ordering = ('-date',)
+    list_select_related = ('doctor__user',)
+    readonly_fields = [field.name for field in DoctorDailyStats._meta.fields]
+
+
+@admin.register(DirtyDoctorDay)
+class DirtyDoctorDayAdmin(admin.ModelAdmin):
+    list_display = ('doctor_id', 'date', 'marked_at')
+    ordering = ('marked_at',)
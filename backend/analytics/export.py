@@ -0,0 +1,262 @@
+import os
+import uuid
+from collections import defaultdict
+from datetime import timedelta
+from pathlib import Path
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.crypto import salted_hmac
+from appointments.models import Appointment
+from medical_records.models import LabResult
+from .models import ExportCursor
+
+EXPORT_CHUNK_SIZE = 2000  # Rows fetched per server-side cursor round trip
+EXPORT_BATCH_SIZE = 50000  # Rows buffered before they are written out as record batches
+# Rows younger than this are left for the next run so a slow transaction cannot commit behind the cursor
+SETTLE_DELAY = timedelta(minutes=1)
+FORMATS = ('arrow', 'parquet')
+
+
+class ExportUnavailable(Exception):
+    pass
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.ipc  # noqa: F401
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        raise ExportUnavailable('Columnar exports need pyarrow; install it with "pip install pyarrow"')
+    return pyarrow
+
+
+def pseudonym(value):
+    """A stable keyed hash, so de-identified tables still join, and upsert, on the ids it replaces"""
+    return salted_hmac('analytics.export.pseudonym', str(value)).hexdigest()[:32]
+
+
+class Column:
+    """One exported column: where it comes from, its Arrow type and how it is de-identified"""
+
+    def __init__(self, name, arrow_type, source=None, identifier=False, free_text=False):
+        self.name = name
+        self.arrow_type = arrow_type
+        self.source = source or name
+        # Identifiers are replaced by pseudonyms and free text is dropped when de-identifying
+        self.identifier = identifier
+        self.free_text = free_text
+
+    def convert(self, values, deidentify):
+        if self.identifier and deidentify:
+            return [pseudonym(value) if value is not None else None for value in values]
+        if self.arrow_type == 'string':
+            return [str(value) if value is not None else None for value in values]
+        return values
+
+    def type(self, pa, deidentify):
+        if self.identifier and deidentify:
+            return pa.string()
+        return {
+            'string': pa.string(),
+            'int64': pa.int64(),
+            'int32': pa.int32(),
+            'bool': pa.bool_(),
+            'date': pa.date32(),
+            'time': pa.time64('us'),
+            'timestamp': pa.timestamp('us', tz='UTC'),
+        }[self.arrow_type]
+
+
+class Dataset:
+    """A table exported in ``(updated_at, id)`` order and partitioned by the month of ``partition_by``"""
+
+    def __init__(self, model, partition_by, columns):
+        self.model = model
+        self.partition_by = partition_by
+        self.columns = columns
+
+    def export_columns(self, deidentify):
+        return [column for column in self.columns if not (deidentify and column.free_text)]
+
+    def schema(self, pa, deidentify):
+        return pa.schema([
+            pa.field(column.name, column.type(pa, deidentify)) for column in self.export_columns(deidentify)
+        ])
+
+    def rows(self, deidentify, after=None, until=None, chunk_size=EXPORT_CHUNK_SIZE):
+        """Yield ``(month, updated_at, id, values)`` with values in schema order"""
+        columns = self.export_columns(deidentify)
+        queryset = self.model._default_manager.order_by('updated_at', 'id')
+        if until is not None:
+            queryset = queryset.filter(updated_at__lte=until)
+        if after is not None:
+            updated_at, last_id = after
+            queryset = queryset.filter(Q(updated_at__gt=updated_at) | Q(updated_at=updated_at, id__gt=last_id))
+
+        fields = [column.source for column in columns] + [self.partition_by, 'updated_at', 'id']
+        for row in queryset.values_list(*fields).iterator(chunk_size=chunk_size):
+            *values, partition_value, updated_at, pk = row
+            month = f'{partition_value.year:04d}-{partition_value.month:02d}' if partition_value else 'unknown'
+            yield month, updated_at, pk, values
+
+
+DATASETS = {
+    # Row ids are pseudonymised too: they key the live tables and the patient-facing appointment code
+    'appointments': Dataset(Appointment, 'scheduled_date', [
+        Column('id', 'string', identifier=True),
+        Column('appointment_id', 'string', identifier=True),
+        Column('patient_id', 'string', identifier=True),
+        Column('doctor_id', 'int64'),
+        Column('specialty', 'string', source='doctor__specialty'),
+        Column('appointment_type', 'string'),
+        Column('status', 'string'),
+        Column('scheduled_date', 'date'),
+        Column('scheduled_time', 'time'),
+        Column('duration_minutes', 'int32'),
+        Column('reason_for_visit', 'string', free_text=True),
+        Column('notes', 'string', free_text=True),
+        Column('created_at', 'timestamp'),
+        Column('updated_at', 'timestamp'),
+    ]),
+    'lab_results': Dataset(LabResult, 'test_date', [
+        Column('id', 'string', identifier=True),
+        Column('patient_id', 'string', identifier=True),
+        Column('doctor_id', 'int64'),
+        Column('medical_record_id', 'string', identifier=True),
+        Column('test_name', 'string'),
+        Column('test_type', 'string'),
+        Column('result_value', 'string'),
+        Column('reference_range', 'string'),
+        Column('unit', 'string'),
+        Column('status', 'string'),
+        Column('notes', 'string', free_text=True),
+        Column('test_date', 'timestamp'),
+        Column('result_date', 'timestamp'),
+        Column('created_at', 'timestamp'),
+        Column('updated_at', 'timestamp'),
+    ]),
+}
+
+
+class PartitionedWriter:
+    """Writes rows into ``month=YYYY-MM/part-<run>.<format>`` files under a dataset directory.
+
+    Rows are buffered per month and flushed as record batches whenever the
+    buffers hold ``batch_size`` rows in total, so memory stays flat however
+    large the export is. Files are written under a temporary name and only
+    renamed into place by ``close()``, so readers never see a partial file.
+    Arrow files are written uncompressed in the IPC file format, which can be
+    memory-mapped directly.
+    """
+
+    def __init__(self, pa, directory, dataset, schema, file_format, deidentify, batch_size=EXPORT_BATCH_SIZE):
+        self.pa = pa
+        self.directory = Path(directory)
+        self.dataset = dataset
+        self.schema = schema
+        self.file_format = file_format
+        self.deidentify = deidentify
+        self.batch_size = batch_size
+        self.run = f'{timezone.now():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}'
+        self.buffers = defaultdict(list)
+        self.buffered = 0
+        self.writers = {}
+        self.rows = 0
+
+    def path(self, month):
+        return self.directory / f'month={month}' / f'part-{self.run}.{self.file_format}'
+
+    def add(self, month, values):
+        self.buffers[month].append(values)
+        self.buffered += 1
+        if self.buffered >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        columns = self.dataset.export_columns(self.deidentify)
+        for month, rows in self.buffers.items():
+            arrays = [
+                self.pa.array(column.convert(values, self.deidentify), type=field.type)
+                for column, field, values in zip(columns, self.schema, zip(*rows))
+            ]
+            self.writer(month).write_batch(self.pa.RecordBatch.from_arrays(arrays, schema=self.schema))
+            self.rows += len(rows)
+        self.buffers.clear()
+        self.buffered = 0
+
+    def writer(self, month):
+        if month not in self.writers:
+            temporary = self.path(month).with_suffix('.tmp')
+            temporary.parent.mkdir(parents=True, exist_ok=True)
+            if self.file_format == 'parquet':
+                writer = self.pa.parquet.ParquetWriter(str(temporary), self.schema)
+            else:
+                writer = self.pa.ipc.new_file(str(temporary), self.schema)
+            self.writers[month] = (writer, temporary)
+        return self.writers[month][0]
+
+    def close(self):
+        """Flush, close every file and move it into place; returns the final paths"""
+        self.flush()
+        paths = []
+        for month, (writer, temporary) in self.writers.items():
+            writer.close()
+            os.replace(temporary, self.path(month))
+            paths.append(self.path(month))
+        self.writers = {}
+        return sorted(paths)
+
+    def abort(self):
+        for writer, temporary in self.writers.values():
+            writer.close()
+            temporary.unlink(missing_ok=True)
+        self.writers = {}
+
+
+def export_dataset(name, root, deidentify=False, full=False, file_format='arrow', batch_size=EXPORT_BATCH_SIZE,
+                   chunk_size=EXPORT_CHUNK_SIZE, now=None):
+    """Stream one dataset into monthly Arrow or Parquet files under ``root``.
+
+    Each run appends new part files and only reads rows changed since the
+    destination's cursor, unless ``full`` is set. A row changed several
+    times can appear in several parts; the copy with the latest
+    ``updated_at`` is current. De-identified exports go to their own
+    directory with patients pseudonymised and free-text columns dropped.
+    Returns ``{'rows': ..., 'files': [...]}``.
+    """
+    if file_format not in FORMATS:
+        raise ValueError(f'Unknown export format {file_format!r}')
+    pa = _pyarrow()
+    dataset = DATASETS[name]
+    directory = Path(root) / (f'{name}_deidentified' if deidentify else name)
+    destination = str(directory.resolve())
+    until = (now or timezone.now()) - SETTLE_DELAY
+
+    cursor = ExportCursor.objects.filter(dataset=name, destination=destination).first()
+    after = (cursor.updated_at, cursor.last_id) if cursor and not full else None
+
+    writer = PartitionedWriter(pa, directory, dataset, dataset.schema(pa, deidentify), file_format,
+                               deidentify, batch_size=batch_size)
+    last = None
+    try:
+        for month, updated_at, pk, values in dataset.rows(deidentify, after=after, until=until,
+                                                          chunk_size=chunk_size):
+            writer.add(month, values)
+            last = (updated_at, pk)
+        files = writer.close()
+    except BaseException:
+        writer.abort()
+        raise
+
+    if last is not None:
+        ExportCursor.objects.update_or_create(
+            dataset=name,
+            destination=destination,
+            defaults={
+                'updated_at': last[0],
+                'last_id': str(last[1]),
+                'rows_exported': (cursor.rows_exported if cursor else 0) + writer.rows,
+            }
+        )
+    return {'rows': writer.rows, 'files': files}
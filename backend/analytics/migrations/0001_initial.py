@@ -0,0 +1,60 @@
+# Generated by Django 4.2.7 on 2026-10-17 19:59
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DirtyDoctorDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('doctor_id', models.BigIntegerField()),
+                ('date', models.DateField()),
+                ('marked_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DoctorDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('specialty', models.CharField(max_length=20)),
+                ('date', models.DateField()),
+                ('total_count', models.PositiveIntegerField(default=0)),
+                ('scheduled_count', models.PositiveIntegerField(default=0)),
+                ('confirmed_count', models.PositiveIntegerField(default=0)),
+                ('in_progress_count', models.PositiveIntegerField(default=0)),
+                ('completed_count', models.PositiveIntegerField(default=0)),
+                ('cancelled_count', models.PositiveIntegerField(default=0)),
+                ('no_show_count', models.PositiveIntegerField(default=0)),
+                ('booked_minutes', models.PositiveIntegerField(default=0)),
+                ('slot_count', models.PositiveIntegerField(default=0)),
+                ('capacity_minutes', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('doctor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='accounts.doctorprofile')),
+            ],
+            options={
+                'ordering': ['date', 'doctor'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='dirtydoctorday',
+            constraint=models.UniqueConstraint(fields=('doctor_id', 'date'), name='dirty_doctor_day_unique'),
+        ),
+        migrations.AddIndex(
+            model_name='doctordailystats',
+            index=models.Index(fields=['date', 'specialty'], name='daily_stats_date_specialty_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='doctordailystats',
+            constraint=models.UniqueConstraint(fields=('doctor', 'date'), name='doctor_daily_stats_unique_day'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-17 20:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExportCursor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dataset', models.CharField(max_length=50)),
+                ('destination', models.CharField(max_length=500)),
+                ('updated_at', models.DateTimeField()),
+                ('last_id', models.CharField(max_length=64)),
+                ('rows_exported', models.PositiveBigIntegerField(default=0)),
+                ('exported_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='exportcursor',
+            constraint=models.UniqueConstraint(fields=('dataset', 'destination'), name='export_cursor_unique_destination'),
+        ),
+    ]
@@ -0,0 +1,66 @@
+from django.db import models
+from accounts.models import DoctorProfile
+
+
+class DoctorDailyStats(models.Model):
+    """Appointment counts and booked time against slot capacity for one doctor on one day"""
+    doctor = models.ForeignKey(DoctorProfile, on_delete=models.CASCADE, related_name='daily_stats')
+    # Copied from the doctor so specialty reports never join back
+    specialty = models.CharField(max_length=20)
+    date = models.DateField()
+    total_count = models.PositiveIntegerField(default=0)
+    scheduled_count = models.PositiveIntegerField(default=0)
+    confirmed_count = models.PositiveIntegerField(default=0)
+    in_progress_count = models.PositiveIntegerField(default=0)
+    completed_count = models.PositiveIntegerField(default=0)
+    cancelled_count = models.PositiveIntegerField(default=0)
+    no_show_count = models.PositiveIntegerField(default=0)
+    booked_minutes = models.PositiveIntegerField(default=0)
+    slot_count = models.PositiveIntegerField(default=0)
+    capacity_minutes = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['date', 'doctor']
+        constraints = [
+            models.UniqueConstraint(fields=['doctor', 'date'], name='doctor_daily_stats_unique_day'),
+        ]
+        indexes = [
+            models.Index(fields=['date', 'specialty'], name='daily_stats_date_specialty_idx'),
+        ]
+    
+    def __str__(self):
+        return f"Dr. {self.doctor.user.get_full_name()} - {self.date}"
+
+
+class DirtyDoctorDay(models.Model):
+    """A doctor and day whose rollup must be recomputed"""
+    doctor_id = models.BigIntegerField()
+    date = models.DateField()
+    marked_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['doctor_id', 'date'], name='dirty_doctor_day_unique'),
+        ]
+    
+    def __str__(self):
+        return f"{self.doctor_id} - {self.date}"
+
+
+class ExportCursor(models.Model):
+    """How far an export destination has read a dataset, by ``(updated_at, id)``"""
+    dataset = models.CharField(max_length=50)
+    destination = models.CharField(max_length=500)
+    updated_at = models.DateTimeField()
+    last_id = models.CharField(max_length=64)
+    rows_exported = models.PositiveBigIntegerField(default=0)
+    exported_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['dataset', 'destination'], name='export_cursor_unique_destination'),
+        ]
+    
+    def __str__(self):
+        return f"{self.dataset} -> {self.destination} @ {self.updated_at}"
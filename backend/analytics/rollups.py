@@ -0,0 +1,148 @@
+from collections import defaultdict
+from datetime import datetime, timedelta
+from functools import reduce
+from operator import or_
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from accounts.models import DoctorProfile
+from appointments.availability import BLOCKING_STATUSES
+from appointments.models import Appointment, AppointmentSlot
+from .models import DirtyDoctorDay, DoctorDailyStats
+
+REFRESH_BATCH_SIZE = 1000
+REBUILD_WINDOW_DAYS = 31
+GROUP_FIELDS = {'doctor': ['doctor_id', 'specialty'], 'specialty': ['specialty'], 'day': ['date']}
+
+STATUS_FIELDS = {status: f'{status}_count' for status, _ in Appointment.STATUS_CHOICES}
+STAT_FIELDS = ['specialty', 'total_count', *STATUS_FIELDS.values(), 'booked_minutes', 'slot_count',
+               'capacity_minutes']
+
+
+def mark_dirty(pairs):
+    """Queue ``(doctor_id, date)`` pairs for the next refresh; repeats collapse into one row"""
+    rows = [DirtyDoctorDay(doctor_id=doctor_id, date=day) for doctor_id, day in set(pairs) if doctor_id and day]
+    if rows:
+        DirtyDoctorDay.objects.bulk_create(rows, ignore_conflicts=True)
+
+
+def compute_stats(start_date, end_date, doctor_ids=None, dates=None):
+    """Aggregate appointments and slots into unsaved rows keyed by ``(doctor_id, date)``.
+
+    Appointments are grouped by the database; slot capacity needs the length
+    of each slot, so only the two time columns are read for those.
+    """
+    appointments = Appointment.objects.filter(scheduled_date__gte=start_date, scheduled_date__lte=end_date)
+    slots = AppointmentSlot.objects.filter(date__gte=start_date, date__lte=end_date)
+    if dates is not None:
+        appointments = appointments.filter(scheduled_date__in=dates)
+        slots = slots.filter(date__in=dates)
+    if doctor_ids is not None:
+        appointments = appointments.filter(doctor_id__in=doctor_ids)
+        slots = slots.filter(doctor_id__in=doctor_ids)
+
+    stats = defaultdict(lambda: defaultdict(int))
+    for row in appointments.values('doctor_id', 'scheduled_date', 'status').annotate(
+        count=Count('id'),
+        minutes=Sum('duration_minutes', filter=Q(status__in=BLOCKING_STATUSES))
+    ).order_by():
+        day = stats[(row['doctor_id'], row['scheduled_date'])]
+        day['total_count'] += row['count']
+        day[STATUS_FIELDS[row['status']]] += row['count']
+        day['booked_minutes'] += row['minutes'] or 0
+
+    for doctor_id, day, start_time, end_time in slots.values_list('doctor_id', 'date', 'start_time', 'end_time').order_by():
+        length = datetime.combine(day, end_time) - datetime.combine(day, start_time)
+        stats[(doctor_id, day)]['slot_count'] += 1
+        stats[(doctor_id, day)]['capacity_minutes'] += int(length.total_seconds() // 60)
+
+    specialties = dict(DoctorProfile.objects.filter(
+        id__in={doctor_id for doctor_id, _ in stats}
+    ).values_list('id', 'specialty'))
+    return {
+        (doctor_id, day): DoctorDailyStats(doctor_id=doctor_id, date=day, specialty=specialties[doctor_id], **values)
+        for (doctor_id, day), values in stats.items()
+        if doctor_id in specialties
+    }
+
+
+def write_stats(rows, stale_pairs=()):
+    """Upsert computed rows and delete the rows for days that no longer have any data"""
+    if rows:
+        DoctorDailyStats.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=['doctor', 'date'],
+            update_fields=STAT_FIELDS + ['updated_at']
+        )
+    stale_pairs = list(stale_pairs)
+    if stale_pairs:
+        DoctorDailyStats.objects.filter(reduce(or_, (
+            Q(doctor_id=doctor_id, date=day) for doctor_id, day in stale_pairs
+        ))).delete()
+
+
+def refresh_dirty(batch_size=REFRESH_BATCH_SIZE):
+    """Recompute one batch of dirty doctor-days; returns the number refreshed.
+
+    The dirty rows are claimed with SKIP LOCKED and deleted in the same
+    transaction as the recompute, so a change that lands meanwhile marks the
+    day dirty again and is picked up by the next run.
+    """
+    with transaction.atomic():
+        dirty = list(DirtyDoctorDay.objects.select_for_update(skip_locked=True).order_by('id')[:batch_size])
+        if not dirty:
+            return 0
+        DirtyDoctorDay.objects.filter(id__in=[row.id for row in dirty]).delete()
+
+        pairs = {(row.doctor_id, row.date) for row in dirty}
+        days = sorted({day for _, day in pairs})
+        computed = compute_stats(days[0], days[-1], doctor_ids={doctor_id for doctor_id, _ in pairs}, dates=days)
+        rows = [computed[pair] for pair in pairs if pair in computed]
+        write_stats(rows, stale_pairs=[pair for pair in pairs if pair not in computed])
+    return len(pairs)
+
+
+def refresh_all_dirty(batch_size=REFRESH_BATCH_SIZE):
+    total = 0
+    while True:
+        refreshed = refresh_dirty(batch_size)
+        if not refreshed:
+            return total
+        total += refreshed
+
+
+def rebuild_range(start_date, end_date, doctor_ids=None, window_days=REBUILD_WINDOW_DAYS):
+    """Recompute every rollup in a date range a window at a time; returns the rows written"""
+    written = 0
+    window_start = start_date
+    while window_start <= end_date:
+        window_end = min(window_start + timedelta(days=window_days - 1), end_date)
+        with transaction.atomic():
+            computed = compute_stats(window_start, window_end, doctor_ids)
+            existing = DoctorDailyStats.objects.filter(date__gte=window_start, date__lte=window_end)
+            if doctor_ids is not None:
+                existing = existing.filter(doctor_id__in=doctor_ids)
+            stale = [pair for pair in existing.values_list('doctor_id', 'date') if pair not in computed]
+            write_stats(list(computed.values()), stale_pairs=stale)
+        written += len(computed)
+        window_start = window_end + timedelta(days=1)
+    return written
+
+
+def summarize(queryset, group_by):
+    """Sum rollup rows into one dict per group, with utilization as booked over capacity minutes"""
+    fields = GROUP_FIELDS[group_by]
+    sums = ['total_count', *STATUS_FIELDS.values(), 'booked_minutes', 'capacity_minutes']
+    totals = queryset.values(*fields).annotate(
+        **{f'sum_{field}': Sum(field) for field in sums}
+    ).order_by(*fields)
+    for row in totals:
+        booked, capacity = row['sum_booked_minutes'], row['sum_capacity_minutes']
+        yield {
+            **{field: row[field] for field in fields},
+            'total': row['sum_total_count'],
+            'statuses': {status: row[f'sum_{field}'] for status, field in STATUS_FIELDS.items()},
+            'booked_minutes': booked,
+            'capacity_minutes': capacity,
+            'utilization': round(booked / capacity, 4) if capacity else None,
+        }
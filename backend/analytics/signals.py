@@ -0,0 +1,24 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from appointments.models import Appointment, AppointmentSlot
+from appointments.signals import schedules_changed
+from .rollups import mark_dirty
+
+
+@receiver([post_save, post_delete], sender=Appointment)
+def appointment_rollup_changed(sender, instance, **kwargs):
+    pairs = [(instance.doctor_id, instance.scheduled_date)]
+    loaded = getattr(instance, '_loaded_schedule', None)
+    if loaded:
+        pairs.append(loaded)
+    mark_dirty(pairs)
+
+
+@receiver([post_save, post_delete], sender=AppointmentSlot)
+def slot_rollup_changed(sender, instance, **kwargs):
+    mark_dirty([(instance.doctor_id, instance.date)])
+
+
+@receiver(schedules_changed)
+def schedules_rollup_changed(sender, pairs, **kwargs):
+    mark_dirty(pairs)
@@ -0,0 +1,28 @@
+import logging
+from celery import shared_task
+from django.conf import settings
+from .export import DATASETS, ExportUnavailable, export_dataset
+from .rollups import refresh_all_dirty
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def refresh_rollups():
+    """Recompute the doctor-days changed since the last run"""
+    return refresh_all_dirty()
+
+
+@shared_task
+def export_analytics(datasets=None, file_format='arrow'):
+    """Append rows changed since the last run to the columnar export under ANALYTICS_EXPORT_ROOT"""
+    exported = {}
+    for name in datasets or DATASETS:
+        try:
+            result = export_dataset(name, settings.ANALYTICS_EXPORT_ROOT,
+                                    deidentify=settings.ANALYTICS_EXPORT_DEIDENTIFY, file_format=file_format)
+        except ExportUnavailable as e:
+            logger.warning('Skipping analytics export: %s', e)
+            return exported
+        exported[name] = result['rows']
+    return exported
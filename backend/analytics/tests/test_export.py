@@ -0,0 +1,104 @@
+import pytest
+import sys
+from datetime import date, time, timedelta
+from unittest import mock
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.utils import timezone
+from analytics.export import export_dataset, pseudonym
+from appointments.models import Appointment
+from medical_records.models import LabResult, MedicalRecord
+
+
+@pytest.fixture
+def later():
+    # Past the settle delay, so rows written by the test are eligible
+    return timezone.now() + timedelta(minutes=5)
+
+
+@pytest.fixture
+def appointments(patient, doctor):
+    return [
+        Appointment.objects.create(patient=patient, doctor=doctor, appointment_type='consultation',
+                                   scheduled_date=day, scheduled_time=time(9, 0), reason_for_visit='Chest pain')
+        for day in (date(2030, 1, 15), date(2030, 1, 20), date(2030, 2, 3))
+    ]
+
+
+def read_arrow(path):
+    pa = pytest.importorskip('pyarrow')
+    with pa.memory_map(str(path)) as source:
+        return pa.ipc.open_file(source).read_all()
+
+
+@pytest.mark.django_db
+def test_export_is_partitioned_by_month_and_memory_mappable(tmp_path, appointments, later):
+    pytest.importorskip('pyarrow')
+    result = export_dataset('appointments', tmp_path, now=later, batch_size=2)
+    assert result['rows'] == 3
+    assert [path.parent.name for path in result['files']] == ['month=2030-01', 'month=2030-02']
+    assert not list(tmp_path.rglob('*.tmp'))
+
+    january = read_arrow(result['files'][0])
+    assert january.num_rows == 2
+    assert january.column('reason_for_visit').to_pylist() == ['Chest pain'] * 2
+    assert january.column('specialty').to_pylist() == ['cardiology'] * 2
+    assert january.column('scheduled_time').to_pylist() == [time(9, 0)] * 2
+
+
+@pytest.mark.django_db
+def test_incremental_runs_only_export_changed_rows(tmp_path, appointments, later):
+    pytest.importorskip('pyarrow')
+    export_dataset('appointments', tmp_path, now=later)
+    assert export_dataset('appointments', tmp_path, now=later)['rows'] == 0
+
+    appointments[2].status = 'confirmed'
+    appointments[2].save()
+    result = export_dataset('appointments', tmp_path, now=later + timedelta(minutes=1))
+    assert result['rows'] == 1
+    assert read_arrow(result['files'][0]).column('status').to_pylist() == ['confirmed']
+
+    # Rows inside the settle window wait for the next run
+    Appointment.objects.filter(pk=appointments[0].pk).update(updated_at=later + timedelta(hours=1))
+    assert export_dataset('appointments', tmp_path, now=later + timedelta(minutes=1))['rows'] == 0
+    assert export_dataset('appointments', tmp_path, full=True, now=later)['rows'] == 2
+
+
+@pytest.mark.django_db
+def test_deidentified_parquet_export(tmp_path, patient, doctor, appointments):
+    pq = pytest.importorskip('pyarrow.parquet')
+    record = MedicalRecord.objects.create(patient=patient, doctor=doctor, record_type='lab_result',
+                                          title='Chest pain workup', description='Troponin ordered')
+    lab = LabResult.objects.create(patient=patient, doctor=doctor, medical_record=record, test_name='Troponin',
+                                   test_type='blood', result_value='0.01', notes='Called the patient at home',
+                                   test_date=timezone.now())
+    an_hour_ago = timezone.now() - timedelta(hours=1)
+    Appointment.objects.update(updated_at=an_hour_ago)
+    LabResult.objects.update(updated_at=an_hour_ago)
+
+    call_command('export_analytics', output=str(tmp_path), deidentify=True, file_format='parquet',
+                 stdout=mock.Mock())
+    assert not (tmp_path / 'appointments').exists()
+
+    labs = pq.read_table(tmp_path / 'lab_results_deidentified')
+    assert 'notes' not in labs.column_names
+    visits = pq.read_table(tmp_path / 'appointments_deidentified')
+    assert 'reason_for_visit' not in visits.column_names
+    # The same pseudonym in both tables, and never the real id
+    assert set(labs.column('patient_id').to_pylist()) == set(visits.column('patient_id').to_pylist()) == {
+        pseudonym(patient.id)
+    }
+    # Row and record ids would link straight back to the live tables
+    assert labs.column('id').to_pylist() == [pseudonym(lab.id)]
+    assert labs.column('medical_record_id').to_pylist() == [pseudonym(record.id)]
+    assert sorted(visits.column('id').to_pylist()) == sorted(pseudonym(visit.id) for visit in appointments)
+    assert sorted(visits.column('appointment_id').to_pylist()) == sorted(
+        pseudonym(visit.appointment_id) for visit in appointments
+    )
+
+
+@pytest.mark.django_db
+def test_command_reports_missing_pyarrow(tmp_path):
+    with mock.patch.dict(sys.modules, {'pyarrow': None}):
+        with pytest.raises(CommandError, match='pyarrow'):
+            call_command('export_analytics', output=str(tmp_path), stdout=mock.Mock())
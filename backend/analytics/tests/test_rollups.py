@@ -0,0 +1,143 @@
+import pytest
+from datetime import time, timedelta
+from django.contrib.admin.sites import AdminSite
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from unittest import mock
+from rest_framework.test import APIClient
+from accounts.models import DoctorProfile, User
+from analytics.models import DirtyDoctorDay, DoctorDailyStats
+from analytics.rollups import refresh_all_dirty
+from appointments.admin import AppointmentAdmin
+from appointments.models import Appointment, AppointmentSlot, DoctorAvailabilityTemplate
+from appointments.scheduling import materialize_slots
+from appointments.services import bulk_change_appointment_status
+
+
+@pytest.fixture
+def day():
+    return timezone.localdate() + timedelta(days=1)
+
+
+@pytest.fixture
+def schedule(patient, doctor, day):
+    booked = []
+    for hour in range(9, 13):
+        AppointmentSlot.objects.create(doctor=doctor, date=day, start_time=time(hour, 0), end_time=time(hour, 30),
+                                       is_available=False)
+        booked.append(Appointment.objects.create(
+            patient=patient, doctor=doctor, appointment_type='consultation', scheduled_date=day,
+            scheduled_time=time(hour, 0), reason_for_visit='Checkup', status='confirmed'
+        ))
+    return booked
+
+
+def stats_for(doctor, day):
+    return DoctorDailyStats.objects.get(doctor=doctor, date=day)
+
+
+def client_for(user):
+    client = APIClient()
+    client.force_authenticate(user)
+    return client
+
+
+@pytest.mark.django_db
+def test_changes_mark_days_dirty_and_refresh_recomputes_them(doctor, schedule, day):
+    assert list(DirtyDoctorDay.objects.values_list('doctor_id', 'date')) == [(doctor.id, day)]
+    assert refresh_all_dirty() == 1
+    assert not DirtyDoctorDay.objects.exists()
+
+    stats = stats_for(doctor, day)
+    assert (stats.total_count, stats.confirmed_count) == (4, 4)
+    assert (stats.booked_minutes, stats.slot_count, stats.capacity_minutes) == (120, 4, 120)
+    assert stats.specialty == 'cardiology'
+
+    # Moving an appointment dirties both the old and the new day
+    moved = schedule[0]
+    moved.scheduled_date = day + timedelta(days=1)
+    moved.save()
+    assert set(DirtyDoctorDay.objects.values_list('date', flat=True)) == {day, day + timedelta(days=1)}
+    refresh_all_dirty()
+    assert stats_for(doctor, day).total_count == 3
+    assert stats_for(doctor, day + timedelta(days=1)).booked_minutes == 30
+
+    moved.delete()
+    refresh_all_dirty()
+    assert not DoctorDailyStats.objects.filter(date=day + timedelta(days=1)).exists()
+
+
+@pytest.mark.django_db
+def test_bulk_paths_mark_days_dirty(doctor, patient, schedule, day):
+    refresh_all_dirty()
+    bulk_change_appointment_status({schedule[0].id: 'completed', schedule[1].id: 'cancelled'}, doctor.user)
+
+    model_admin = AppointmentAdmin(Appointment, AdminSite())
+    with mock.patch.object(model_admin, 'message_user'):
+        model_admin.mark_completed(mock.Mock(), Appointment.objects.filter(pk=schedule[2].pk))
+    refresh_all_dirty()
+
+    stats = stats_for(doctor, day)
+    assert (stats.completed_count, stats.cancelled_count, stats.confirmed_count) == (2, 1, 1)
+    assert stats.booked_minutes == 90
+
+    later = day + timedelta(days=7)
+    DoctorAvailabilityTemplate.objects.create(doctor=doctor, weekday=later.weekday(), start_time=time(9, 0),
+                                              end_time=time(10, 0), slot_minutes=30)
+    materialize_slots(later, later)
+    refresh_all_dirty()
+    assert stats_for(doctor, later).capacity_minutes == 60
+
+
+@pytest.mark.django_db
+def test_rebuild_command_backfills_rows_written_without_signals(doctor, schedule, day):
+    DirtyDoctorDay.objects.all().delete()
+    Appointment.objects.filter(pk=schedule[0].pk).update(status='no_show')
+
+    call_command('rebuild_rollups', start=day.isoformat(), end=day.isoformat(), stdout=mock.Mock())
+    stats = stats_for(doctor, day)
+    assert (stats.no_show_count, stats.confirmed_count, stats.booked_minutes) == (1, 3, 90)
+
+    Appointment.objects.all().delete()
+    AppointmentSlot.objects.all().delete()
+    call_command('rebuild_rollups', start=day.isoformat(), end=day.isoformat(), window=1, stdout=mock.Mock())
+    assert not DoctorDailyStats.objects.exists()
+
+
+@pytest.mark.django_db
+def test_api_reads_only_the_rollups(doctor, schedule, day):
+    other_user = User.objects.create_user(username='other', password='Password123', user_type='doctor')
+    other = DoctorProfile.objects.create(user=other_user, license_number='LIC-2', specialty='neurology')
+    AppointmentSlot.objects.create(doctor=other, date=day, start_time=time(9, 0), end_time=time(10, 0))
+    refresh_all_dirty()
+    staff = User.objects.create_user(username='staff', password='Password123', user_type='staff')
+
+    params = {'from': day.isoformat(), 'to': day.isoformat()}
+    with CaptureQueriesContext(connection) as context:
+        r = client_for(staff).get(reverse('analytics-utilization'), {**params, 'group_by': 'specialty'})
+    assert r.status_code == 200
+    assert not any('appointments_' in q['sql'] for q in context.captured_queries)
+    by_specialty = {row['specialty']: row for row in r.data['results']}
+    assert by_specialty['cardiology']['utilization'] == 1.0
+    assert by_specialty['cardiology']['statuses']['confirmed'] == 4
+    assert by_specialty['neurology']['utilization'] == 0.0
+
+    r = client_for(doctor.user).get(reverse('analytics-utilization'), {**params, 'doctor': other.id})
+    assert [row['doctor_id'] for row in r.data['results']] == [doctor.id]
+
+    day_view = client_for(staff).get(reverse('analytics-utilization'), {**params, 'group_by': 'day'}).data
+    assert day_view['results'][0]['capacity_minutes'] == 180
+
+
+@pytest.mark.django_db
+def test_api_validation_and_permissions(patient, doctor):
+    url = reverse('analytics-utilization')
+    assert client_for(patient).get(url).status_code == 403
+    client = client_for(doctor.user)
+    assert client.get(url, {'group_by': 'week'}).status_code == 400
+    assert client.get(url, {'from': '2030-01-02', 'to': '2030-01-01'}).status_code == 400
+    assert client.get(url, {'from': '2030-01-01', 'to': '2031-06-01'}).status_code == 400
+    assert client.get(url, {'from': 'soon'}).status_code == 400
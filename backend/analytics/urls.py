@@ -0,0 +1,6 @@
+from django.urls import path
+from . import views
+
+urlpatterns = [
+    path('utilization/', views.utilization, name='analytics-utilization'),
+]
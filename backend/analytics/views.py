@@ -0,0 +1,57 @@
+from datetime import date, timedelta
+from django.utils import timezone
+from rest_framework import permissions, status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.response import Response
+from accounts.models import DoctorProfile
+from .models import DoctorDailyStats
+from .rollups import GROUP_FIELDS, summarize
+
+MAX_REPORT_DAYS = 366
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def utilization(request):
+    """Appointment volume, status mix and utilization between ?from= and ?to=, read from the daily rollups"""
+    user = request.user
+    if user.user_type not in ('admin', 'staff', 'doctor'):
+        return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
+    
+    today = timezone.localdate()
+    try:
+        start_date = date.fromisoformat(request.GET.get('from', (today - timedelta(days=29)).isoformat()))
+        end_date = date.fromisoformat(request.GET.get('to', today.isoformat()))
+    except ValueError:
+        return Response({'error': 'Invalid date format. Use YYYY-MM-DD'}, status=status.HTTP_400_BAD_REQUEST)
+    if end_date < start_date:
+        return Response({'error': 'to must not be before from'}, status=status.HTTP_400_BAD_REQUEST)
+    if (end_date - start_date).days >= MAX_REPORT_DAYS:
+        return Response({'error': f'Range is limited to {MAX_REPORT_DAYS} days'},
+                        status=status.HTTP_400_BAD_REQUEST)
+    
+    group_by = request.GET.get('group_by', 'doctor')
+    if group_by not in GROUP_FIELDS:
+        return Response({'error': f'group_by must be one of {", ".join(GROUP_FIELDS)}'},
+                        status=status.HTTP_400_BAD_REQUEST)
+    
+    stats = DoctorDailyStats.objects.filter(date__gte=start_date, date__lte=end_date)
+    if user.user_type == 'doctor':
+        try:
+            stats = stats.filter(doctor_id=user.doctor_profile.id)
+        except DoctorProfile.DoesNotExist:
+            return Response({'error': 'Doctor profile not found'}, status=status.HTTP_404_NOT_FOUND)
+    elif 'doctor' in request.GET:
+        try:
+            stats = stats.filter(doctor_id=int(request.GET['doctor']))
+        except ValueError:
+            return Response({'error': 'doctor must be a doctor profile id'}, status=status.HTTP_400_BAD_REQUEST)
+    if 'specialty' in request.GET:
+        stats = stats.filter(specialty=request.GET['specialty'])
+    
+    return Response({
+        'from': start_date.isoformat(),
+        'to': end_date.isoformat(),
+        'group_by': group_by,
+        'results': list(summarize(stats, group_by)),
+    })
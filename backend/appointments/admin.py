@@ -1,5 +1,8 @@
-from django.contrib import admin
-from .models import Appointment, AppointmentSlot
+from django.contrib import admin, messages
+from django.db import transaction
+from .availability import invalidate_availability
+from .models import Appointment, AppointmentSlot, AvailabilityException, DoctorAvailabilityTemplate, WaitlistEntry
+from .services import StatusChangeRejected, bulk_change_appointment_status
 
 
 @admin.register(Appointment)
@@ -9,7 +12,7 @@ class AppointmentAdmin(admin.ModelAdmin):
     search_fields = ('appointment_id', 'patient__username', 'patient__first_name', 'patient__last_name', 
                     'doctor__user__username', 'doctor__user__first_name', 'doctor__user__last_name')
     ordering = ('-scheduled_date', '-scheduled_time')
-    readonly_fields = ('appointment_id', 'qr_code', 'created_at', 'updated_at')
+    readonly_fields = ('appointment_id', 'qr_code', 'qr_status', 'created_at', 'updated_at')
     
     fieldsets = (
         ('Appointment Details', {
@@ -22,26 +25,42 @@ class AppointmentAdmin(admin.ModelAdmin):
             'fields': ('reason_for_visit', 'notes')
         }),
         ('System Information', {
-            'fields': ('qr_code', 'created_at', 'updated_at'),
+            'fields': ('qr_code', 'qr_status', 'created_at', 'updated_at'),
             'classes': ('collapse',)
         }),
     )
     
     actions = ['confirm_appointments', 'mark_completed', 'mark_cancelled']
     
+    def change_status(self, request, queryset, new_status, verb):
+        """Move the selected appointments the state machine allows through the status service.
+
+        The service releases freed slots to the waitlist, notifies both parties
+        and invalidates cached schedules, none of which a raw update() would do.
+        """
+        changes = {
+            appointment.id: new_status
+            for appointment in queryset.only('id', 'status') if appointment.can_transition_to(new_status)
+        }
+        if changes:
+            try:
+                bulk_change_appointment_status(changes, request.user)
+            except StatusChangeRejected as e:
+                self.message_user(request, f'No appointments were {verb}: {len(e.errors)} changes were refused.',
+                                  level=messages.ERROR)
+                return
+        self.message_user(request, f'{len(changes)} appointments have been {verb}.')
+    
     def confirm_appointments(self, request, queryset):
-        updated = queryset.update(status='confirmed')
-        self.message_user(request, f'{updated} appointments have been confirmed.')
+        self.change_status(request, queryset, 'confirmed', 'confirmed')
     confirm_appointments.short_description = "Confirm selected appointments"
     
     def mark_completed(self, request, queryset):
-        updated = queryset.update(status='completed')
-        self.message_user(request, f'{updated} appointments have been marked as completed.')
+        self.change_status(request, queryset, 'completed', 'marked as completed')
     mark_completed.short_description = "Mark selected appointments as completed"
     
     def mark_cancelled(self, request, queryset):
-        updated = queryset.update(status='cancelled')
-        self.message_user(request, f'{updated} appointments have been cancelled.')
+        self.change_status(request, queryset, 'cancelled', 'cancelled')
     mark_cancelled.short_description = "Cancel selected appointments"
 
 
@@ -60,12 +79,71 @@ class AppointmentSlotAdmin(admin.ModelAdmin):
     
     actions = ['make_available', 'make_unavailable']
     
+    def update_slots(self, queryset, **changes):
+        """Update the slots, then drop their doctors' cached availability again once the change commits"""
+        with transaction.atomic():
+            doctor_ids = list(queryset.values_list('doctor_id', flat=True))
+            updated = queryset.update(**changes)
+            invalidate_availability(doctor_ids)
+        return updated
+    
     def make_available(self, request, queryset):
-        updated = queryset.update(is_available=True)
+        updated = self.update_slots(queryset, is_available=True)
         self.message_user(request, f'{updated} slots have been made available.')
     make_available.short_description = "Make selected slots available"
     
     def make_unavailable(self, request, queryset):
-        updated = queryset.update(is_available=False)
+        updated = self.update_slots(queryset, is_available=False)
         self.message_user(request, f'{updated} slots have been made unavailable.')
     make_unavailable.short_description = "Make selected slots unavailable"
+
+
+@admin.register(DoctorAvailabilityTemplate)
+class DoctorAvailabilityTemplateAdmin(admin.ModelAdmin):
+    list_display = ('doctor', 'weekday', 'start_time', 'end_time', 'slot_minutes', 'is_active')
+    list_filter = ('is_active', 'weekday', 'doctor__specialty')
+    search_fields = ('doctor__user__username', 'doctor__user__first_name', 'doctor__user__last_name')
+    ordering = ('doctor', 'weekday', 'start_time')
+    
+    fieldsets = (
+        ('Rule', {
+            'fields': ('doctor', 'weekday', 'start_time', 'end_time', 'slot_minutes', 'is_active')
+        }),
+        ('Break', {
+            'fields': ('break_start', 'break_end')
+        }),
+        ('Validity', {
+            'fields': ('valid_from', 'valid_until')
+        }),
+    )
+    
+    actions = ['generate_slots']
+    
+    def generate_slots(self, request, queryset):
+        from django.conf import settings
+        from django.utils import timezone
+        from datetime import timedelta
+        from .scheduling import materialize_slots
+        start_date = timezone.localdate()
+        end_date = start_date + timedelta(days=settings.AVAILABILITY_HORIZON_DAYS - 1)
+        doctor_ids = list(queryset.values_list('doctor_id', flat=True).distinct())
+        generated = materialize_slots(start_date, end_date, doctor_ids=doctor_ids)
+        self.message_user(request, f'{generated} slots have been generated for the selected doctors.')
+    generate_slots.short_description = "Generate slots for the scheduling horizon"
+
+
+@admin.register(AvailabilityException)
+class AvailabilityExceptionAdmin(admin.ModelAdmin):
+    list_display = ('date', 'doctor', 'start_time', 'end_time', 'reason')
+    list_filter = ('date',)
+    search_fields = ('reason', 'doctor__user__first_name', 'doctor__user__last_name')
+    ordering = ('-date',)
+
+
+@admin.register(WaitlistEntry)
+class WaitlistEntryAdmin(admin.ModelAdmin):
+    list_display = ('patient', 'doctor', 'specialty', 'earliest_date', 'latest_date', 'priority', 'status', 'hold_expires_at')
+    list_filter = ('status', 'specialty')
+    search_fields = ('patient__username', 'patient__first_name', 'patient__last_name')
+    ordering = ('-priority', 'created_at')
+    readonly_fields = ('offered_slot', 'hold_expires_at', 'appointment', 'created_at', 'updated_at')
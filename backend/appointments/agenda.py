@@ -0,0 +1,78 @@
+from collections import defaultdict
+from datetime import timedelta
+from django.core.cache import cache
+from django.db import transaction
+from .models import Appointment
+
+CACHE_KEY = 'agenda:v1:{}:{}'
+CACHE_TIMEOUT = 60 * 60 * 24
+
+# Longest agenda one request may ask for
+MAX_AGENDA_DAYS = 7
+
+
+def agenda_key(doctor_id, day):
+    return CACHE_KEY.format(doctor_id, day.isoformat())
+
+
+def _days(start_date, end_date):
+    day = start_date
+    while day <= end_date:
+        yield day
+        day += timedelta(days=1)
+
+
+def build_agendas(doctor_ids, start_date, end_date):
+    """Serialize the doctors' appointments per day with one joined query.
+
+    Returns ``{(doctor_id, date): [appointment, ...]}`` with an entry for every
+    requested day, including empty ones, so quiet days are cached too.
+    """
+    from .serializers import AppointmentSerializer
+
+    queryset = AppointmentSerializer.setup_eager_loading(Appointment.objects.filter(
+        doctor_id__in=doctor_ids,
+        scheduled_date__gte=start_date,
+        scheduled_date__lte=end_date
+    )).order_by('scheduled_date', 'scheduled_time')
+
+    grouped = defaultdict(list)
+    for appointment in queryset:
+        grouped[(appointment.doctor_id, appointment.scheduled_date)].append(appointment)
+
+    return {
+        (doctor_id, day): list(AppointmentSerializer(grouped.get((doctor_id, day), []), many=True).data)
+        for doctor_id in doctor_ids
+        for day in _days(start_date, end_date)
+    }
+
+
+def get_agenda(doctor_id, start_date, end_date):
+    """Return ``{date: [appointment, ...]}`` for a doctor, building only the uncached days"""
+    keys = {agenda_key(doctor_id, day): day for day in _days(start_date, end_date)}
+    cached = cache.get_many(keys.keys())
+    agenda = {keys[key]: entries for key, entries in cached.items()}
+
+    missing = [day for day in keys.values() if day not in agenda]
+    if missing:
+        built = build_agendas([doctor_id], min(missing), max(missing))
+        fresh = {day: built[(doctor_id, day)] for day in missing}
+        cache.set_many({agenda_key(doctor_id, day): entries for day, entries in fresh.items()}, CACHE_TIMEOUT)
+        agenda.update(fresh)
+    return dict(sorted(agenda.items()))
+
+
+def prewarm_agendas(doctor_ids, start_date, end_date):
+    """Fill the cache for many doctors at once; returns the number of agenda days written"""
+    built = build_agendas(doctor_ids, start_date, end_date)
+    cache.set_many({agenda_key(doctor_id, day): entries for (doctor_id, day), entries in built.items()},
+                   CACHE_TIMEOUT)
+    return len(built)
+
+
+def invalidate_agenda(pairs):
+    """Drop cached agenda days for ``(doctor_id, date)`` pairs now and once the transaction commits"""
+    keys = [agenda_key(doctor_id, day) for doctor_id, day in set(pairs) if doctor_id and day]
+    if keys:
+        cache.delete_many(keys)
+        transaction.on_commit(lambda: cache.delete_many(keys))
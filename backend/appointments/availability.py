@@ -0,0 +1,176 @@
+import heapq
+from collections import defaultdict
+from itertools import islice
+from datetime import date, timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from .models import Appointment, AppointmentSlot
+
+# Statuses that still occupy the doctor's time
+BLOCKING_STATUSES = ('scheduled', 'confirmed', 'in_progress', 'completed')
+
+# Longest range one lookup may ask for
+MAX_RANGE_DAYS = 60
+
+CACHE_KEY = 'availability:v1:{}'
+CACHE_TIMEOUT = 60 * 60
+
+
+def _minutes(value):
+    return value.hour * 60 + value.minute
+
+
+def format_minutes(minutes):
+    return f'{minutes // 60:02d}:{minutes % 60:02d}'
+
+
+class DoctorAvailability:
+    """Free slots for one doctor over a date window.
+
+    Days are keyed by ordinal and hold sorted ``(start, end)`` tuples in
+    minutes since midnight, which keeps the pickled index small enough to
+    fetch for many doctors in one cache round trip.
+    """
+
+    def __init__(self, doctor_id, start_date, end_date, days):
+        self.doctor_id = doctor_id
+        self.start = start_date.toordinal()
+        self.end = end_date.toordinal()
+        self.days = days
+
+    def covers(self, start_date, end_date):
+        return self.start <= start_date.toordinal() and end_date.toordinal() <= self.end
+
+    def free_slots(self, day):
+        return self.days.get(day.toordinal(), ())
+
+    def free_intervals(self, day):
+        """Free time on a day with back-to-back slots merged"""
+        merged = []
+        for start, end in self.free_slots(day):
+            if merged and merged[-1][1] == start:
+                merged[-1] = (merged[-1][0], end)
+            else:
+                merged.append((start, end))
+        return merged
+
+    def intervals_between(self, start_date, end_date):
+        """Free intervals for every day in the range that has any"""
+        result = {}
+        for ordinal in range(start_date.toordinal(), end_date.toordinal() + 1):
+            if ordinal in self.days:
+                day = date.fromordinal(ordinal)
+                result[day] = self.free_intervals(day)
+        return result
+
+    def openings(self, after):
+        """Yield ``(date, start, end)`` for free slots starting at or after a local datetime"""
+        after_ordinal, after_minutes = after.date().toordinal(), after.hour * 60 + after.minute
+        for ordinal in sorted(self.days):
+            if ordinal < after_ordinal:
+                continue
+            for start, end in self.days[ordinal]:
+                if ordinal == after_ordinal and start < after_minutes:
+                    continue
+                yield date.fromordinal(ordinal), start, end
+
+
+def build_availability(doctor_ids, start_date, end_date):
+    """Build indexes for many doctors with one slot query and one appointment query"""
+    slots = defaultdict(lambda: defaultdict(list))
+    for doctor_id, day, start_time, end_time in AppointmentSlot.objects.filter(
+        doctor_id__in=doctor_ids,
+        date__gte=start_date,
+        date__lte=end_date,
+        is_available=True
+    ).values_list('doctor_id', 'date', 'start_time', 'end_time').order_by():
+        slots[doctor_id][day.toordinal()].append((_minutes(start_time), _minutes(end_time)))
+
+    booked = defaultdict(lambda: defaultdict(list))
+    for doctor_id, day, start_time, duration in Appointment.objects.filter(
+        doctor_id__in=doctor_ids,
+        scheduled_date__gte=start_date,
+        scheduled_date__lte=end_date,
+        status__in=BLOCKING_STATUSES
+    ).values_list('doctor_id', 'scheduled_date', 'scheduled_time', 'duration_minutes').order_by():
+        start = _minutes(start_time)
+        booked[doctor_id][day.toordinal()].append((start, start + duration))
+
+    indexes = {}
+    for doctor_id in doctor_ids:
+        days = {}
+        for ordinal, day_slots in slots.get(doctor_id, {}).items():
+            taken = booked[doctor_id].get(ordinal, ())
+            free = tuple(sorted(
+                slot for slot in day_slots
+                if not any(slot[0] < end and slot[1] > start for start, end in taken)
+            ))
+            if free:
+                days[ordinal] = free
+        indexes[doctor_id] = DoctorAvailability(doctor_id, start_date, end_date, days)
+    return indexes
+
+
+def index_window():
+    """Dates held by a cached index: any full-length range starting inside the slot horizon fits"""
+    start_date = timezone.localdate()
+    return start_date, start_date + timedelta(days=settings.AVAILABILITY_HORIZON_DAYS + MAX_RANGE_DAYS - 1)
+
+
+def get_availability_many(doctor_ids, start_date=None, end_date=None):
+    """Return cached indexes for the doctors, building all misses in one pass.
+
+    Ranges outside the rolling index window are computed directly and not cached.
+    """
+    window_start, window_end = index_window()
+    start_date = start_date or window_start
+    end_date = end_date or window_end
+    if start_date < window_start or end_date > window_end:
+        return build_availability(doctor_ids, start_date, end_date)
+
+    keys = {CACHE_KEY.format(doctor_id): doctor_id for doctor_id in doctor_ids}
+    cached = cache.get_many(keys.keys())
+    indexes = {}
+    for key, index in cached.items():
+        if index.covers(start_date, end_date):
+            indexes[keys[key]] = index
+
+    missing = [doctor_id for doctor_id in doctor_ids if doctor_id not in indexes]
+    if missing:
+        built = build_availability(missing, window_start, window_end)
+        cache.set_many({CACHE_KEY.format(doctor_id): index for doctor_id, index in built.items()}, CACHE_TIMEOUT)
+        indexes.update(built)
+    return indexes
+
+
+def get_availability(doctor_id, start_date=None, end_date=None):
+    return get_availability_many([doctor_id], start_date, end_date)[doctor_id]
+
+
+def invalidate_availability(doctor_ids):
+    """Drop cached indexes now and again once the surrounding transaction commits.
+
+    The second delete covers readers that rebuilt from pre-commit data in between.
+    """
+    keys = [CACHE_KEY.format(doctor_id) for doctor_id in set(doctor_ids)]
+    if keys:
+        cache.delete_many(keys)
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def _doctor_openings(index, after):
+    for day, start, end in index.openings(after):
+        yield day, start, index.doctor_id, end
+
+
+def first_available(doctor_ids, after, limit):
+    """Earliest ``limit`` openings across doctors as ``(date, start, doctor_id, end)``.
+
+    Each doctor's index already yields openings in order, so a heap-based
+    k-way merge only looks at as many openings as it returns plus one per doctor.
+    """
+    indexes = get_availability_many(doctor_ids)
+    streams = [_doctor_openings(index, after) for index in indexes.values()]
+    return list(islice(heapq.merge(*streams), limit))
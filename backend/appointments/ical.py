@@ -0,0 +1,143 @@
+import hashlib
+from datetime import timedelta, timezone as dt_timezone
+from django.core import signing
+from django.db.models import Count, F, Max
+from django.utils import timezone
+from accounts.models import User
+from .models import Appointment
+
+FEED_SALT = 'appointments.calendar_feed'
+FEED_CHUNK_SIZE = 500
+
+# How far back a feed reaches; calendar clients keep older events themselves
+FEED_PAST_DAYS = 90
+
+PRODID = '-//Alturos Health//Appointments//EN'
+
+EVENT_STATUS = {
+    'scheduled': 'TENTATIVE',
+    'confirmed': 'CONFIRMED',
+    'in_progress': 'CONFIRMED',
+    'completed': 'CONFIRMED',
+    'cancelled': 'CANCELLED',
+    'no_show': 'CANCELLED',
+}
+
+
+class InvalidFeedToken(Exception):
+    pass
+
+
+def make_feed_token(user):
+    # No timestamp, so a user's subscription URL stays the same until the feed version is bumped
+    return signing.Signer(salt=FEED_SALT).sign_object([str(user.pk), user.calendar_feed_version])
+
+
+def resolve_feed_token(token):
+    """Return the active user a feed token was issued to, if it has not been revoked since"""
+    try:
+        value = signing.Signer(salt=FEED_SALT).unsign_object(token)
+    except signing.BadSignature:
+        raise InvalidFeedToken('Invalid feed token')
+    # Tokens issued before feed versions existed hold the bare pk and count as version 0
+    user_id, version = value if isinstance(value, list) else (value, 0)
+    user = User.objects.filter(pk=user_id, is_active=True, calendar_feed_version=version).first()
+    if user is None:
+        raise InvalidFeedToken('Invalid feed token')
+    return user
+
+
+def rotate_feed_token(user):
+    """Revoke the user's calendar feed URL and return the token of its replacement"""
+    User.objects.filter(pk=user.pk).update(calendar_feed_version=F('calendar_feed_version') + 1)
+    user.refresh_from_db(fields=['calendar_feed_version'])
+    return make_feed_token(user)
+
+
+def feed_queryset(user):
+    since = timezone.localdate() - timedelta(days=FEED_PAST_DAYS)
+    if user.user_type == 'doctor':
+        queryset = Appointment.objects.filter(doctor__user=user)
+    elif user.user_type == 'patient':
+        queryset = Appointment.objects.filter(patient=user)
+    else:
+        return Appointment.objects.none()
+    return queryset.filter(scheduled_date__gte=since)
+
+
+def feed_validators(user, queryset):
+    """ETag and Last-Modified for a feed from one aggregate query.
+
+    The row count is folded into the ETag so deletions, which leave the
+    newest ``updated_at`` unchanged, still change the validator.
+    """
+    stats = queryset.order_by().aggregate(last_modified=Max('updated_at'), count=Count('id'))
+    last_modified = stats['last_modified']
+    stamp = last_modified.isoformat() if last_modified else ''
+    digest = hashlib.sha256(f'{user.pk}:{stamp}:{stats["count"]}'.encode()).hexdigest()[:32]
+    return f'"{digest}"', last_modified
+
+
+def escape_text(value):
+    return (value.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+            .replace('\r\n', '\\n').replace('\n', '\\n'))
+
+
+def fold(line):
+    """Fold a content line at 75 octets without splitting a UTF-8 character"""
+    encoded = line.encode('utf-8')
+    if len(encoded) <= 75:
+        return line + '\r\n'
+    parts = []
+    limit = 75
+    while encoded:
+        cut = min(limit, len(encoded))
+        while cut < len(encoded) and (encoded[cut] & 0xC0) == 0x80:
+            cut -= 1
+        parts.append(encoded[:cut].decode('utf-8'))
+        encoded = encoded[cut:]
+        limit = 74
+    return '\r\n '.join(parts) + '\r\n'
+
+
+def format_utc(value):
+    return value.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def render_event(appointment, user):
+    if user.user_type == 'doctor':
+        summary = f'{appointment.get_appointment_type_display()}: {appointment.patient.get_full_name()}'
+    else:
+        summary = f'{appointment.get_appointment_type_display()} with Dr. {appointment.doctor.user.get_full_name()}'
+
+    lines = [
+        'BEGIN:VEVENT',
+        f'UID:{appointment.id}@alturos-health',
+        f'DTSTAMP:{format_utc(appointment.updated_at)}',
+        f'LAST-MODIFIED:{format_utc(appointment.updated_at)}',
+        f'DTSTART:{format_utc(appointment.scheduled_start)}',
+        f'DTEND:{format_utc(appointment.scheduled_end)}',
+        f'SUMMARY:{escape_text(summary)}',
+        f'DESCRIPTION:{escape_text(appointment.reason_for_visit)}',
+        f'STATUS:{EVENT_STATUS.get(appointment.status, "CONFIRMED")}',
+        'END:VEVENT',
+    ]
+    return ''.join(fold(line) for line in lines)
+
+
+def iter_feed(user, queryset):
+    """Yield the calendar a chunk of events at a time instead of building it in memory"""
+    yield ''.join(fold(line) for line in [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        f'PRODID:{PRODID}',
+        'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH',
+        f'X-WR-CALNAME:{escape_text(user.get_full_name() or user.username)} appointments',
+    ])
+
+    queryset = queryset.select_related('patient', 'doctor__user').order_by('scheduled_date', 'scheduled_time')
+    for appointment in queryset.iterator(chunk_size=FEED_CHUNK_SIZE):
+        yield render_event(appointment, user)
+
+    yield fold('END:VCALENDAR')
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+from appointments.models import Appointment
+
+
+class Command(BaseCommand):
+    help = 'Delete persisted appointment QR code images now that QR codes are served on demand'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--dry-run', action='store_true', help='Report what would be removed without deleting anything')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        dry_run = options['dry_run']
+        queryset = Appointment.objects.exclude(qr_code='').exclude(qr_code__isnull=True).order_by('pk')
+
+        removed = 0
+        missing = 0
+        last_pk = None
+        while True:
+            batch = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+            batch = list(batch.only('pk', 'qr_code')[:batch_size])
+            if not batch:
+                break
+            last_pk = batch[-1].pk
+
+            for appointment in batch:
+                storage = appointment.qr_code.storage
+                name = appointment.qr_code.name
+                if not storage.exists(name):
+                    missing += 1
+                elif not dry_run:
+                    storage.delete(name)
+                removed += 1
+
+            if not dry_run:
+                Appointment.objects.filter(pk__in=[a.pk for a in batch]).update(qr_code=None)
+
+        verb = 'Would remove' if dry_run else 'Removed'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {removed} QR code references ({missing} files were already missing).'
+        ))
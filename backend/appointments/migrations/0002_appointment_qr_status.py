@@ -0,0 +1,24 @@
+# Generated by Django 4.2.7 on 2026-10-17 19:30
+
+from django.db import migrations, models
+
+
+def mark_existing_qr_codes_ready(apps, schema_editor):
+    Appointment = apps.get_model('appointments', 'Appointment')
+    Appointment.objects.exclude(qr_code='').exclude(qr_code__isnull=True).update(qr_status='ready')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='appointment',
+            name='qr_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('ready', 'Ready'), ('failed', 'Failed')], default='pending', max_length=10),
+        ),
+        migrations.RunPython(mark_existing_qr_codes_ready, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-17 19:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0003_availability_templates'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['doctor', 'scheduled_date', 'scheduled_time'], name='appt_doctor_schedule_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['patient', '-scheduled_date', '-scheduled_time'], name='appt_patient_schedule_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['status', 'scheduled_date', 'scheduled_time'], name='appt_status_schedule_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointmentslot',
+            index=models.Index(fields=['date', 'start_time'], name='slot_date_time_idx'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 4.2.7 on 2026-10-17 19:53
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('appointments', '0004_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WaitlistEntry',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('specialty', models.CharField(blank=True, choices=[('general', 'General Practice'), ('cardiology', 'Cardiology'), ('dermatology', 'Dermatology'), ('neurology', 'Neurology'), ('orthopedics', 'Orthopedics'), ('pediatrics', 'Pediatrics'), ('psychiatry', 'Psychiatry'), ('radiology', 'Radiology')], max_length=20)),
+                ('appointment_type', models.CharField(choices=[('consultation', 'Consultation'), ('follow_up', 'Follow-up'), ('emergency', 'Emergency'), ('routine_checkup', 'Routine Checkup'), ('specialist_referral', 'Specialist Referral')], max_length=20)),
+                ('reason_for_visit', models.TextField()),
+                ('earliest_date', models.DateField()),
+                ('latest_date', models.DateField()),
+                ('preferred_start_time', models.TimeField(blank=True, null=True)),
+                ('preferred_end_time', models.TimeField(blank=True, null=True)),
+                ('priority', models.PositiveSmallIntegerField(default=0)),
+                ('status', models.CharField(choices=[('waiting', 'Waiting'), ('offered', 'Offered'), ('booked', 'Booked'), ('expired', 'Expired'), ('cancelled', 'Cancelled')], default='waiting', max_length=10)),
+                ('hold_expires_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('appointment', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='waitlist_entry', to='appointments.appointment')),
+                ('doctor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='waitlist_entries', to='accounts.doctorprofile')),
+                ('offered_slot', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='waitlist_offers', to='appointments.appointmentslot')),
+                ('patient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='waitlist_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-priority', 'created_at'],
+                'indexes': [models.Index(fields=['status', 'doctor'], name='waitlist_status_doctor_idx'), models.Index(fields=['status', 'specialty'], name='waitlist_status_specialty_idx'), models.Index(condition=models.Q(('status', 'offered')), fields=['hold_expires_at'], name='waitlist_offer_expiry_idx')],
+            },
+        ),
+    ]
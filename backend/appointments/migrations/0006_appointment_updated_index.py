@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-17 20:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0005_waitlist'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['updated_at', 'id'], name='appt_updated_idx'),
+        ),
+    ]
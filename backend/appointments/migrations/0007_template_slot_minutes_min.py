@@ -0,0 +1,19 @@
+# Generated by Django 4.2.7 on 2026-10-17 20:28
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0006_appointment_updated_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='doctoravailabilitytemplate',
+            name='slot_minutes',
+            field=models.PositiveIntegerField(default=30, validators=[django.core.validators.MinValueValidator(1)]),
+        ),
+    ]
@@ -1,11 +1,10 @@
-from django.db import models
+from django.core.exceptions import ValidationError
+from django.core.validators import MinValueValidator
+from django.db import models, transaction
 from django.utils import timezone
+from datetime import datetime, timedelta
 from accounts.models import User, DoctorProfile, PatientProfile
 import uuid
-import qrcode
-from io import BytesIO
-from django.core.files import File
-from PIL import Image
 
 
 class Appointment(models.Model):
@@ -18,6 +17,16 @@ class Appointment(models.Model):
         ('no_show', 'No Show'),
     )
     
+    # Allowed moves between statuses; terminal statuses have none
+    STATUS_TRANSITIONS = {
+        'scheduled': ('confirmed', 'in_progress', 'cancelled', 'no_show'),
+        'confirmed': ('in_progress', 'completed', 'cancelled', 'no_show'),
+        'in_progress': ('completed',),
+        'completed': (),
+        'cancelled': (),
+        'no_show': (),
+    }
+    
     APPOINTMENT_TYPES = (
         ('consultation', 'Consultation'),
         ('follow_up', 'Follow-up'),
@@ -26,6 +35,12 @@ class Appointment(models.Model):
         ('specialist_referral', 'Specialist Referral'),
     )
     
+    QR_STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('ready', 'Ready'),
+        ('failed', 'Failed'),
+    )
+    
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     appointment_id = models.CharField(max_length=10, unique=True, editable=False)
     patient = models.ForeignKey(User, on_delete=models.CASCADE, related_name='patient_appointments')
@@ -37,12 +52,31 @@ class Appointment(models.Model):
     status = models.CharField(max_length=15, choices=STATUS_CHOICES, default='scheduled')
     reason_for_visit = models.TextField()
     notes = models.TextField(blank=True)
+    # Legacy persisted image; QR codes are now served on demand (see purge_qr_code_files)
     qr_code = models.ImageField(upload_to='qr_codes/', blank=True, null=True)
+    qr_status = models.CharField(max_length=10, choices=QR_STATUS_CHOICES, default='pending')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         ordering = ['-scheduled_date', '-scheduled_time']
+        indexes = [
+            # Doctor agenda, availability and booking overlap checks
+            models.Index(fields=['doctor', 'scheduled_date', 'scheduled_time'], name='appt_doctor_schedule_idx'),
+            # Patient timeline, newest first
+            models.Index(fields=['patient', '-scheduled_date', '-scheduled_time'], name='appt_patient_schedule_idx'),
+            # Reminder scans by status and day
+            models.Index(fields=['status', 'scheduled_date', 'scheduled_time'], name='appt_status_schedule_idx'),
+            # Incremental analytics exports
+            models.Index(fields=['updated_at', 'id'], name='appt_updated_idx'),
+        ]
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the loaded doctor and day so a reschedule can invalidate the old agenda too
+        instance._loaded_schedule = (instance.__dict__.get('doctor_id'), instance.__dict__.get('scheduled_date'))
+        return instance
     
     def save(self, *args, **kwargs):
         if not self.appointment_id:
@@ -51,26 +85,26 @@ class Appointment(models.Model):
             import string
             self.appointment_id = ''.join(random.choices(string.ascii_uppercase + string.digits, k=8))
         
+        adding = self._state.adding
         super().save(*args, **kwargs)
+        self._loaded_schedule = (self.doctor_id, self.scheduled_date)
         
-        # Generate QR code
-        if not self.qr_code:
-            qr_data = f"Appointment ID: {self.appointment_id}\nPatient: {self.patient.get_full_name()}\nDoctor: {self.doctor.user.get_full_name()}\nDate: {self.scheduled_date}\nTime: {self.scheduled_time}"
-            qr = qrcode.QRCode(version=1, box_size=10, border=5)
-            qr.add_data(qr_data)
-            qr.make(fit=True)
-            
-            qr_image = qr.make_image(fill_color="black", back_color="white")
-            buffer = BytesIO()
-            qr_image.save(buffer, format='PNG')
-            buffer.seek(0)
-            
-            self.qr_code.save(
-                f'appointment_{self.appointment_id}_qr.png',
-                File(buffer),
-                save=False
-            )
-            super().save(update_fields=['qr_code'])
+        # QR codes are pre-rendered by a Celery worker so booking only pays for the INSERT
+        if adding and self.qr_status == 'pending':
+            from .tasks import enqueue_qr_generation
+            appointment_id = self.id
+            transaction.on_commit(lambda: enqueue_qr_generation([appointment_id]))
+    
+    def can_transition_to(self, new_status):
+        return new_status in self.STATUS_TRANSITIONS.get(self.status, ())
+    
+    @property
+    def scheduled_start(self):
+        return timezone.make_aware(datetime.combine(self.scheduled_date, self.scheduled_time))
+    
+    @property
+    def scheduled_end(self):
+        return self.scheduled_start + timedelta(minutes=self.duration_minutes)
     
     def __str__(self):
         return f"Appointment {self.appointment_id} - {self.patient.get_full_name()} with Dr. {self.doctor.user.get_full_name()}"
@@ -87,6 +121,129 @@ class AppointmentSlot(models.Model):
     class Meta:
         unique_together = ['doctor', 'date', 'start_time']
         ordering = ['date', 'start_time']
+        indexes = [
+            # Horizon-wide scans that are not scoped to one doctor
+            models.Index(fields=['date', 'start_time'], name='slot_date_time_idx'),
+        ]
     
     def __str__(self):
         return f"Dr. {self.doctor.user.get_full_name()} - {self.date} {self.start_time}-{self.end_time}"
+
+
+class DoctorAvailabilityTemplate(models.Model):
+    WEEKDAYS = (
+        (0, 'Monday'),
+        (1, 'Tuesday'),
+        (2, 'Wednesday'),
+        (3, 'Thursday'),
+        (4, 'Friday'),
+        (5, 'Saturday'),
+        (6, 'Sunday'),
+    )
+    
+    doctor = models.ForeignKey(DoctorProfile, on_delete=models.CASCADE, related_name='availability_templates')
+    weekday = models.PositiveSmallIntegerField(choices=WEEKDAYS)
+    start_time = models.TimeField()
+    end_time = models.TimeField()
+    slot_minutes = models.PositiveIntegerField(default=30, validators=[MinValueValidator(1)])
+    break_start = models.TimeField(null=True, blank=True)
+    break_end = models.TimeField(null=True, blank=True)
+    valid_from = models.DateField(null=True, blank=True)
+    valid_until = models.DateField(null=True, blank=True)
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['doctor', 'weekday', 'start_time']
+    
+    def __str__(self):
+        return f"Dr. {self.doctor.user.get_full_name()} - {self.get_weekday_display()} {self.start_time}-{self.end_time}"
+    
+    def clean(self):
+        super().clean()
+        if self.start_time and self.end_time and self.end_time <= self.start_time:
+            raise ValidationError({'end_time': 'End time must be after the start time.'})
+        if (self.break_start is None) != (self.break_end is None):
+            raise ValidationError('Set both ends of the break, or neither.')
+        if self.break_start is not None and self.start_time and self.end_time:
+            if not self.start_time <= self.break_start < self.break_end <= self.end_time:
+                raise ValidationError({'break_start': 'The break must fall inside the working hours.'})
+
+
+class AvailabilityException(models.Model):
+    """A day or part of a day with no slots; without a doctor it applies clinic-wide"""
+    doctor = models.ForeignKey(DoctorProfile, on_delete=models.CASCADE, related_name='availability_exceptions',
+                               null=True, blank=True)
+    date = models.DateField()
+    start_time = models.TimeField(null=True, blank=True)
+    end_time = models.TimeField(null=True, blank=True)
+    reason = models.CharField(max_length=200, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['date', 'start_time']
+    
+    def __str__(self):
+        who = f"Dr. {self.doctor.user.get_full_name()}" if self.doctor else "All doctors"
+        return f"{who} - {self.date} {self.reason}".strip()
+
+
+class WaitlistEntry(models.Model):
+    """A patient waiting for an earlier slot with one doctor, or any doctor of a specialty"""
+    STATUS_CHOICES = (
+        ('waiting', 'Waiting'),
+        ('offered', 'Offered'),
+        ('booked', 'Booked'),
+        ('expired', 'Expired'),
+        ('cancelled', 'Cancelled'),
+    )
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    patient = models.ForeignKey(User, on_delete=models.CASCADE, related_name='waitlist_entries')
+    doctor = models.ForeignKey(DoctorProfile, on_delete=models.CASCADE, related_name='waitlist_entries',
+                               null=True, blank=True)
+    specialty = models.CharField(max_length=20, choices=DoctorProfile.SPECIALTIES, blank=True)
+    appointment_type = models.CharField(max_length=20, choices=Appointment.APPOINTMENT_TYPES)
+    reason_for_visit = models.TextField()
+    earliest_date = models.DateField()
+    latest_date = models.DateField()
+    preferred_start_time = models.TimeField(null=True, blank=True)
+    preferred_end_time = models.TimeField(null=True, blank=True)
+    # Raised by staff for urgent cases; higher is offered first, then first come first served
+    priority = models.PositiveSmallIntegerField(default=0)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='waiting')
+    offered_slot = models.ForeignKey(AppointmentSlot, on_delete=models.SET_NULL, null=True, blank=True,
+                                     related_name='waitlist_offers')
+    hold_expires_at = models.DateTimeField(null=True, blank=True)
+    appointment = models.OneToOneField(Appointment, on_delete=models.SET_NULL, null=True, blank=True,
+                                       related_name='waitlist_entry')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['-priority', 'created_at']
+        indexes = [
+            models.Index(fields=['status', 'doctor'], name='waitlist_status_doctor_idx'),
+            models.Index(fields=['status', 'specialty'], name='waitlist_status_specialty_idx'),
+            # Expiry sweep over outstanding offers
+            models.Index(fields=['hold_expires_at'], condition=models.Q(status='offered'),
+                         name='waitlist_offer_expiry_idx'),
+        ]
+    
+    @property
+    def rank(self):
+        return (-self.priority, self.created_at, self.id)
+    
+    def fits(self, slot):
+        if not self.earliest_date <= slot.date <= self.latest_date:
+            return False
+        if self.preferred_start_time and slot.start_time < self.preferred_start_time:
+            return False
+        if self.preferred_end_time and slot.end_time > self.preferred_end_time:
+            return False
+        return True
+    
+    def __str__(self):
+        wanted = f"Dr. {self.doctor.user.get_full_name()}" if self.doctor else self.get_specialty_display()
+        return f"{self.patient.get_full_name()} waiting for {wanted} ({self.status})"
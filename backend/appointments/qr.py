@@ -0,0 +1,123 @@
+import hashlib
+import threading
+import qrcode
+import qrcode.image.svg
+from collections import OrderedDict
+from io import BytesIO
+from django.conf import settings
+from django.core.cache import cache
+from .tokens import make_check_in_token
+
+# Bump when the rendering parameters change so cached images and ETags roll over
+QR_RENDER_VERSION = 1
+
+QR_FORMATS = {
+    'png': 'image/png',
+    'svg': 'image/svg+xml',
+}
+
+
+class LRUCache:
+    """Small thread-safe bounded LRU used to keep rendered QR images in process"""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            try:
+                self._data.move_to_end(key)
+            except KeyError:
+                return None
+            return self._data[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+qr_image_cache = LRUCache(settings.QR_CODE_CACHE_SIZE)
+
+
+def build_qr_payload(appointment):
+    """Build the text encoded in an appointment's QR code.
+
+    Only the signed check-in token is encoded so the image carries no PHI.
+    """
+    return make_check_in_token(appointment)
+
+
+def qr_content_hash(payload, fmt):
+    """Hash of everything that determines the rendered bytes; doubles as the ETag"""
+    digest = hashlib.sha256(f'{QR_RENDER_VERSION}:{fmt}:{payload}'.encode())
+    return digest.hexdigest()[:32]
+
+
+def _make_qr(data, **kwargs):
+    qr = qrcode.QRCode(version=1, box_size=10, border=5, **kwargs)
+    qr.add_data(data)
+    qr.make(fit=True)
+    return qr
+
+
+def render_qr_png(data):
+    """Render QR code data to PNG bytes"""
+    qr_image = _make_qr(data).make_image(fill_color="black", back_color="white")
+    buffer = BytesIO()
+    qr_image.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def render_qr_svg(data):
+    """Render QR code data to SVG bytes"""
+    qr_image = _make_qr(data, image_factory=qrcode.image.svg.SvgPathImage).make_image()
+    buffer = BytesIO()
+    qr_image.save(buffer)
+    return buffer.getvalue()
+
+
+RENDERERS = {
+    'png': render_qr_png,
+    'svg': render_qr_svg,
+}
+
+
+def get_qr_image(payload, fmt, content_hash=None):
+    """Return rendered QR bytes, checking the process LRU, then the shared cache.
+
+    Rendering is deterministic, so any process can fill either tier and the
+    content hash stays valid as a strong validator.
+    """
+    content_hash = content_hash or qr_content_hash(payload, fmt)
+
+    image = qr_image_cache.get(content_hash)
+    if image is not None:
+        return image
+
+    cache_key = f'qr:{content_hash}'
+    image = cache.get(cache_key)
+    if image is None:
+        image = RENDERERS[fmt](payload)
+        cache.set(cache_key, image, settings.QR_CODE_CACHE_TIMEOUT)
+
+    qr_image_cache.set(content_hash, image)
+    return image
+
+
+def prerender_qr_code(appointment):
+    """Warm the shared cache with the appointment's PNG so the first scan is a cache hit"""
+    get_qr_image(build_qr_payload(appointment), 'png')
+    appointment.qr_status = 'ready'
+    return appointment
@@ -0,0 +1,150 @@
+from collections import defaultdict
+from datetime import time, timedelta
+from django.db.models import Q
+from .availability import invalidate_availability
+from .models import AppointmentSlot, AvailabilityException, DoctorAvailabilityTemplate
+from .signals import schedules_changed
+
+SLOT_BATCH_SIZE = 5000
+SLOT_WINDOW_DAYS = 7
+
+
+def _minutes(value):
+    return value.hour * 60 + value.minute
+
+
+def _time(minutes):
+    return time(minutes // 60, minutes % 60)
+
+
+def template_slot_times(template):
+    """Return the (start, end) minute pairs one template produces on any matching day"""
+    start, end = _minutes(template.start_time), _minutes(template.end_time)
+    length = template.slot_minutes
+    if length < 1:
+        # A zero-length slot would never advance the cursor
+        return []
+    break_start = _minutes(template.break_start) if template.break_start else None
+    break_end = _minutes(template.break_end) if template.break_end else None
+
+    slots = []
+    cursor = start
+    while cursor + length <= end:
+        slot_end = cursor + length
+        if break_start is not None and break_end is not None and cursor < break_end and slot_end > break_start:
+            # Slots restart at the end of the break
+            cursor = break_end
+            continue
+        slots.append((cursor, slot_end))
+        cursor = slot_end
+    return slots
+
+
+def _load_exceptions(start_date, end_date, doctor_ids):
+    """Map (doctor_id or None, date) to blocked minute ranges; None means the whole day"""
+    queryset = AvailabilityException.objects.filter(date__gte=start_date, date__lte=end_date)
+    if doctor_ids is not None:
+        queryset = queryset.filter(Q(doctor__isnull=True) | Q(doctor_id__in=doctor_ids))
+
+    blocked = defaultdict(list)
+    for exception in queryset:
+        if exception.start_time is None or exception.end_time is None:
+            blocked[(exception.doctor_id, exception.date)].append(None)
+        else:
+            blocked[(exception.doctor_id, exception.date)].append(
+                (_minutes(exception.start_time), _minutes(exception.end_time))
+            )
+    return blocked
+
+
+def _is_blocked(slot, ranges):
+    for blocked in ranges:
+        if blocked is None or (slot[0] < blocked[1] and slot[1] > blocked[0]):
+            return True
+    return False
+
+
+def iter_template_slots(start_date, end_date, doctor_ids=None):
+    """Yield unsaved AppointmentSlot rows for every active template between two dates inclusive"""
+    templates = DoctorAvailabilityTemplate.objects.filter(is_active=True).filter(
+        Q(valid_from__isnull=True) | Q(valid_from__lte=end_date),
+        Q(valid_until__isnull=True) | Q(valid_until__gte=start_date),
+    )
+    if doctor_ids is not None:
+        templates = templates.filter(doctor_id__in=doctor_ids)
+
+    by_weekday = defaultdict(list)
+    for template in templates:
+        # Slot times only depend on the template, so they are computed once per rule
+        by_weekday[template.weekday].append((template, template_slot_times(template)))
+
+    blocked = _load_exceptions(start_date, end_date, doctor_ids)
+
+    day = start_date
+    while day <= end_date:
+        clinic_blocked = blocked.get((None, day), [])
+        for template, slot_times in by_weekday.get(day.weekday(), []):
+            if template.valid_from and day < template.valid_from:
+                continue
+            if template.valid_until and day > template.valid_until:
+                continue
+
+            ranges = clinic_blocked + blocked.get((template.doctor_id, day), [])
+            if None in ranges:
+                continue
+            for slot in slot_times:
+                if ranges and _is_blocked(slot, ranges):
+                    continue
+                yield AppointmentSlot(
+                    doctor_id=template.doctor_id,
+                    date=day,
+                    start_time=_time(slot[0]),
+                    end_time=_time(slot[1]),
+                )
+        day += timedelta(days=1)
+
+
+def _existing_slot_keys(start_date, end_date, doctor_ids):
+    queryset = AppointmentSlot.objects.filter(date__gte=start_date, date__lte=end_date)
+    if doctor_ids is not None:
+        queryset = queryset.filter(doctor_id__in=doctor_ids)
+    return set(queryset.values_list('doctor_id', 'date', 'start_time'))
+
+
+def materialize_slots(start_date, end_date, doctor_ids=None, batch_size=SLOT_BATCH_SIZE):
+    """Expand availability templates into AppointmentSlot rows.
+
+    The horizon is processed a week at a time and slots that already exist are
+    skipped, so the nightly rolling run only inserts the newly reached days.
+    Rows are written with ``bulk_create(ignore_conflicts=True)`` so a slot
+    created concurrently is never duplicated or reset. Returns the number of
+    slots written.
+    """
+    created = 0
+    touched = set()
+    batch = []
+    window_start = start_date
+    while window_start <= end_date:
+        window_end = min(window_start + timedelta(days=SLOT_WINDOW_DAYS - 1), end_date)
+        existing = _existing_slot_keys(window_start, window_end, doctor_ids)
+
+        for slot in iter_template_slots(window_start, window_end, doctor_ids):
+            if (slot.doctor_id, slot.date, slot.start_time) in existing:
+                continue
+            batch.append(slot)
+            touched.add((slot.doctor_id, slot.date))
+            if len(batch) >= batch_size:
+                AppointmentSlot.objects.bulk_create(batch, ignore_conflicts=True)
+                created += len(batch)
+                batch = []
+
+        window_start = window_end + timedelta(days=1)
+
+    if batch:
+        AppointmentSlot.objects.bulk_create(batch, ignore_conflicts=True)
+        created += len(batch)
+
+    # bulk_create sends no model signals, so dependents are told here
+    invalidate_availability(doctor_id for doctor_id, _ in touched)
+    schedules_changed.send(sender=AppointmentSlot, pairs=touched)
+    return created
@@ -1,17 +1,28 @@
 from rest_framework import serializers
-from .models import Appointment, AppointmentSlot
+from django.urls import reverse
+from .models import Appointment, AppointmentSlot, WaitlistEntry
+from .services import BULK_STATUS_MAX, SlotNotFound, book_appointment
+from accounts.models import DoctorProfile
 from accounts.serializers import UserSerializer, DoctorProfileSerializer
+from alturos_health.eager_loading import EagerLoadingMixin
 
 
-class AppointmentSerializer(serializers.ModelSerializer):
+class AppointmentSerializer(EagerLoadingMixin, serializers.ModelSerializer):
     patient = UserSerializer(read_only=True)
     doctor = DoctorProfileSerializer(read_only=True)
     doctor_id = serializers.UUIDField(write_only=True)
+    qr_code_url = serializers.SerializerMethodField()
+    select_related_fields = ('patient', 'doctor')
     
     class Meta:
         model = Appointment
         fields = '__all__'
-        read_only_fields = ['id', 'appointment_id', 'qr_code', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'appointment_id', 'qr_code', 'qr_status', 'created_at', 'updated_at']
+    
+    def get_qr_code_url(self, obj):
+        url = reverse('appointment_qr_png', args=[obj.id])
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
     
     def create(self, validated_data):
         doctor_id = validated_data.pop('doctor_id')
@@ -21,8 +32,9 @@ class AppointmentSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 
-class AppointmentSlotSerializer(serializers.ModelSerializer):
+class AppointmentSlotSerializer(EagerLoadingMixin, serializers.ModelSerializer):
     doctor = DoctorProfileSerializer(read_only=True)
+    select_related_fields = ('doctor',)
     
     class Meta:
         model = AppointmentSlot
@@ -30,17 +42,66 @@ class AppointmentSlotSerializer(serializers.ModelSerializer):
 
 
 class CreateAppointmentSerializer(serializers.ModelSerializer):
-    doctor_id = serializers.UUIDField()
+    doctor_id = serializers.IntegerField()
     
     class Meta:
         model = Appointment
         fields = ['doctor_id', 'appointment_type', 'scheduled_date', 'scheduled_time', 
                  'reason_for_visit', 'notes']
     
+    def validate_doctor_id(self, value):
+        if not DoctorProfile.objects.filter(id=value).exists():
+            raise serializers.ValidationError('Doctor not found')
+        return value
+    
     def create(self, validated_data):
-        doctor_id = validated_data.pop('doctor_id')
-        from accounts.models import DoctorProfile
-        doctor = DoctorProfile.objects.get(id=doctor_id)
-        validated_data['doctor'] = doctor
-        validated_data['patient'] = self.context['request'].user
-        return super().create(validated_data)
+        doctor = DoctorProfile(id=validated_data.pop('doctor_id'))
+        try:
+            return book_appointment(self.context['request'].user, doctor, **validated_data)
+        except SlotNotFound as e:
+            raise serializers.ValidationError({'scheduled_time': [str(e)]})
+
+
+class StatusChangeSerializer(serializers.Serializer):
+    id = serializers.UUIDField()
+    status = serializers.ChoiceField(choices=Appointment.STATUS_CHOICES)
+
+
+class BulkStatusChangeSerializer(serializers.Serializer):
+    updates = StatusChangeSerializer(many=True, allow_empty=False)
+    
+    def validate_updates(self, value):
+        if len(value) > BULK_STATUS_MAX:
+            raise serializers.ValidationError(f'At most {BULK_STATUS_MAX} appointments can be updated at once')
+        ids = [update['id'] for update in value]
+        if len(set(ids)) != len(ids):
+            raise serializers.ValidationError('Each appointment may only appear once')
+        return value
+
+
+class WaitlistEntrySerializer(EagerLoadingMixin, serializers.ModelSerializer):
+    doctor_id = serializers.IntegerField(required=False, allow_null=True)
+    offered_slot = AppointmentSlotSerializer(read_only=True)
+    select_related_fields = ('offered_slot',)
+    
+    class Meta:
+        model = WaitlistEntry
+        fields = ['id', 'doctor_id', 'specialty', 'appointment_type', 'reason_for_visit', 'earliest_date',
+                  'latest_date', 'preferred_start_time', 'preferred_end_time', 'priority', 'status',
+                  'offered_slot', 'hold_expires_at', 'appointment', 'created_at']
+        read_only_fields = ['id', 'priority', 'status', 'offered_slot', 'hold_expires_at', 'appointment', 'created_at']
+    
+    def validate_doctor_id(self, value):
+        if value is not None and not DoctorProfile.objects.filter(id=value).exists():
+            raise serializers.ValidationError('Doctor not found')
+        return value
+    
+    def validate(self, data):
+        if not data.get('doctor_id') and not data.get('specialty'):
+            raise serializers.ValidationError('Choose a doctor or a specialty')
+        if data['earliest_date'] > data['latest_date']:
+            raise serializers.ValidationError('earliest_date must not be after latest_date')
+        start, end = data.get('preferred_start_time'), data.get('preferred_end_time')
+        if start and end and start >= end:
+            raise serializers.ValidationError('preferred_start_time must be before preferred_end_time')
+        return data
@@ -0,0 +1,210 @@
+from datetime import datetime, timedelta
+from functools import reduce
+from operator import or_
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from .agenda import invalidate_agenda
+from .availability import BLOCKING_STATUSES, invalidate_availability
+from .models import Appointment, AppointmentSlot
+from .signals import schedules_changed
+from .waitlist import offer_matching_events, queue_offer_matching
+
+# Most appointments one bulk status request may touch
+BULK_STATUS_MAX = 200
+
+
+class SlotNotFound(Exception):
+    pass
+
+
+class SlotUnavailable(Exception):
+    pass
+
+
+class StatusChangeRejected(Exception):
+    """Raised with ``errors`` mapping appointment ids to the reason each change was refused"""
+
+    def __init__(self, errors):
+        super().__init__('Some status changes were rejected')
+        self.errors = errors
+
+
+def _overlaps_existing(doctor, slot):
+    """Check the doctor's other bookings that day, e.g. ones made before slots were claimed"""
+    start = datetime.combine(slot.date, slot.start_time)
+    end = datetime.combine(slot.date, slot.end_time)
+    for scheduled_time, duration in Appointment.objects.filter(
+        doctor=doctor,
+        scheduled_date=slot.date,
+        status__in=BLOCKING_STATUSES
+    ).values_list('scheduled_time', 'duration_minutes').order_by():
+        other_start = datetime.combine(slot.date, scheduled_time)
+        if other_start < end and other_start + timedelta(minutes=duration) > start:
+            return True
+    return False
+
+
+def book_appointment(patient, doctor, scheduled_date, scheduled_time, **fields):
+    """Claim the doctor's slot and create the appointment in one short transaction.
+
+    The claim is a single conditional UPDATE on ``is_available``; whichever
+    request flips it first wins and every other concurrent attempt sees a row
+    count of zero and gets ``SlotUnavailable`` instead of a double booking.
+    """
+    slot = AppointmentSlot.objects.filter(
+        doctor=doctor,
+        date=scheduled_date,
+        start_time=scheduled_time
+    ).only('id', 'date', 'start_time', 'end_time').first()
+    if slot is None:
+        raise SlotNotFound('The doctor has no slot at that time')
+
+    with transaction.atomic():
+        claimed = AppointmentSlot.objects.filter(id=slot.id, is_available=True).update(is_available=False)
+        if claimed != 1 or _overlaps_existing(doctor, slot):
+            raise SlotUnavailable('That time is no longer available')
+
+        duration = datetime.combine(slot.date, slot.end_time) - datetime.combine(slot.date, slot.start_time)
+        return Appointment.objects.create(
+            patient=patient,
+            doctor=doctor,
+            scheduled_date=scheduled_date,
+            scheduled_time=scheduled_time,
+            duration_minutes=int(duration.total_seconds() // 60),
+            **fields
+        )
+
+
+def release_slots(appointments):
+    """Give cancelled appointments' slots back to the pool and return the freed slot ids"""
+    appointments = list(appointments)
+    if not appointments:
+        return []
+    slots = AppointmentSlot.objects.filter(reduce(or_, (
+        Q(doctor_id=a.doctor_id, date=a.scheduled_date, start_time=a.scheduled_time) for a in appointments
+    )), is_available=False)
+    slot_ids = list(slots.values_list('id', flat=True))
+    if slot_ids:
+        AppointmentSlot.objects.filter(id__in=slot_ids).update(is_available=True)
+    return slot_ids
+
+
+def status_notification(appointment, updated_by):
+    """Build the unsaved notification telling the other party about a status change"""
+    from notifications.models import Notification
+
+    if updated_by.user_type == 'doctor':
+        recipient_id = appointment.patient_id
+        message = f"Your appointment status has been updated to {appointment.get_status_display()}"
+    else:
+        recipient_id = appointment.doctor.user_id
+        message = f"Appointment with {appointment.patient.get_full_name()} status updated to {appointment.get_status_display()}"
+
+    return Notification(
+        recipient_id=recipient_id,
+        notification_type='appointment_confirmed',
+        title='Appointment Status Update',
+        message=message
+    )
+
+
+def change_appointment_status(appointment, new_status, updated_by):
+    """Apply a status change and notify the other party of the appointment.
+
+    The real-time events are written to the outbox in the same transaction,
+    so they are published if and only if the change commits.
+    """
+    from notifications.outbox import enqueue
+    from notifications.tasks import appointment_status_events, notification_events
+
+    with transaction.atomic():
+        freed = new_status == 'cancelled' and appointment.status in BLOCKING_STATUSES
+        appointment.status = new_status
+        appointment.save()
+        if freed:
+            # Freed time is offered to the waitlist once this commits
+            queue_offer_matching(release_slots([appointment]))
+
+        notification = status_notification(appointment, updated_by)
+        notification.save()
+        enqueue(notification_events([notification]) + appointment_status_events([appointment], updated_by.id))
+    return notification
+
+
+def can_change_status(appointment, user, new_status):
+    # Django staff accounts are privileged whatever their user_type; createsuperuser leaves it at 'patient'
+    if user.user_type in ('admin', 'staff') or user.is_staff or user.is_superuser:
+        return True
+    if user.user_type == 'doctor':
+        return appointment.doctor.user_id == user.id
+    # Patients may only call their own appointments off
+    return appointment.patient_id == user.id and new_status == 'cancelled'
+
+
+def bulk_change_appointment_status(changes, updated_by):
+    """Apply ``{appointment_id: new_status}`` in one transaction with batched side effects.
+
+    Every change is validated against the state machine first and nothing is
+    written unless all of them are allowed. Rows are then moved with one UPDATE
+    per target status, freed slots are released and offered to the waitlist, notifications
+    are written with one INSERT, and the real-time fan-out is written to the
+    outbox with one more. Returns the changed appointments.
+    """
+    from notifications.counters import notifications_created
+    from notifications.models import Notification
+    from notifications.outbox import enqueue
+    from notifications.tasks import appointment_status_events, notification_events
+
+    with transaction.atomic():
+        appointments = {
+            appointment.id: appointment
+            for appointment in Appointment.objects.select_for_update(of=('self',))
+            .select_related('patient', 'doctor')
+            .filter(id__in=list(changes))
+        }
+
+        errors = {}
+        for appointment_id, new_status in changes.items():
+            appointment = appointments.get(appointment_id)
+            if appointment is None:
+                errors[appointment_id] = 'Appointment not found'
+            elif not can_change_status(appointment, updated_by, new_status):
+                errors[appointment_id] = 'Permission denied'
+            elif not appointment.can_transition_to(new_status):
+                errors[appointment_id] = f'Cannot change status from {appointment.status} to {new_status}'
+        if errors:
+            raise StatusChangeRejected(errors)
+
+        by_status = {}
+        freed = []
+        for appointment_id, new_status in changes.items():
+            appointment = appointments[appointment_id]
+            if new_status == 'cancelled' and appointment.status in BLOCKING_STATUSES:
+                freed.append(appointment)
+            appointment.status = new_status
+            by_status.setdefault(new_status, []).append(appointment_id)
+
+        now = timezone.now()
+        for new_status, ids in by_status.items():
+            Appointment.objects.filter(id__in=ids).update(status=new_status, updated_at=now)
+        for appointment in appointments.values():
+            appointment.updated_at = now
+
+        # Freed time is offered to the waitlist once this commits
+        events = offer_matching_events(release_slots(freed))
+
+        changed = [appointments[appointment_id] for appointment_id in changes]
+        notifications = Notification.objects.bulk_create(
+            [status_notification(appointment, updated_by) for appointment in changed]
+        )
+        notifications_created(notifications)
+
+        # update() sends no model signals, so dependents are told here
+        schedules = {(appointment.doctor_id, appointment.scheduled_date) for appointment in changed}
+        invalidate_availability(doctor_id for doctor_id, _ in schedules)
+        invalidate_agenda(schedules)
+        schedules_changed.send(sender=Appointment, pairs=schedules)
+
+        enqueue(events + notification_events(notifications) + appointment_status_events(changed, updated_by.id))
+    return changed
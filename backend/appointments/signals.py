@@ -0,0 +1,23 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
+from .agenda import invalidate_agenda
+from .availability import invalidate_availability
+from .models import Appointment, AppointmentSlot
+
+# Sent with ``pairs=[(doctor_id, date), ...]`` after bulk writes that bypass the model signals
+schedules_changed = Signal()
+
+
+@receiver([post_save, post_delete], sender=AppointmentSlot)
+@receiver([post_save, post_delete], sender=Appointment)
+def appointment_schedule_changed(sender, instance, **kwargs):
+    invalidate_availability([instance.doctor_id])
+
+
+@receiver([post_save, post_delete], sender=Appointment)
+def appointment_agenda_changed(sender, instance, **kwargs):
+    pairs = [(instance.doctor_id, instance.scheduled_date)]
+    loaded = getattr(instance, '_loaded_schedule', None)
+    if loaded:
+        pairs.append(loaded)
+    invalidate_agenda(pairs)
@@ -0,0 +1,134 @@
+from celery import shared_task
+from django.conf import settings
+from django.utils import timezone
+from datetime import timedelta
+from kombu.exceptions import OperationalError
+import logging
+
+from accounts.models import User
+from .agenda import prewarm_agendas
+from .models import Appointment
+from .qr import prerender_qr_code
+from .scheduling import materialize_slots
+from .services import change_appointment_status
+from .waitlist import expire_offers, offer_freed_slots
+
+logger = logging.getLogger(__name__)
+
+QR_BATCH_SIZE = 200
+AGENDA_BATCH_SIZE = 200
+
+
+def enqueue_qr_generation(appointment_ids):
+    """Queue QR rendering for new appointments.
+
+    A broker outage must not fail a booking that has already committed, so the
+    error is logged and the row is left ``pending`` for the periodic sweep.
+    """
+    try:
+        generate_qr_codes.delay([str(appointment_id) for appointment_id in appointment_ids])
+    except OperationalError:
+        logger.warning('Could not queue QR generation for %s; leaving for the sweep', appointment_ids)
+
+
+def render_qr_batch(appointments):
+    """Pre-render QR codes for a batch of appointments and record them with one UPDATE"""
+    rendered = []
+    for appointment in appointments:
+        try:
+            prerender_qr_code(appointment)
+        except Exception:
+            logger.exception('QR generation failed for appointment %s', appointment.id)
+            appointment.qr_status = 'failed'
+        rendered.append(appointment)
+
+    Appointment.objects.bulk_update(rendered, ['qr_status'])
+    return len(rendered)
+
+
+@shared_task
+def generate_qr_codes(appointment_ids):
+    """Render QR codes for the given appointments"""
+    appointments = Appointment.objects.filter(
+        id__in=appointment_ids,
+        qr_status='pending'
+    ).select_related('patient', 'doctor__user')
+    return render_qr_batch(appointments)
+
+
+@shared_task
+def generate_pending_qr_codes(batch_size=QR_BATCH_SIZE):
+    """Sweep appointments whose QR code is still pending, one batch per query"""
+    total = 0
+    while True:
+        batch = list(
+            Appointment.objects.filter(qr_status='pending')
+            .select_related('patient', 'doctor__user')
+            .order_by('created_at')[:batch_size]
+        )
+        if not batch:
+            break
+        total += render_qr_batch(batch)
+    return total
+
+
+def queue_check_in(appointment_id, checked_in_by_id):
+    """Queue a check-in, applying it inline if the broker is unavailable"""
+    try:
+        check_in_appointment.delay(str(appointment_id), str(checked_in_by_id))
+    except OperationalError:
+        logger.warning('Could not queue check-in for %s; applying inline', appointment_id)
+        check_in_appointment(str(appointment_id), str(checked_in_by_id))
+
+
+@shared_task
+def check_in_appointment(appointment_id, checked_in_by_id):
+    """Move a scanned appointment to in_progress through the regular status flow"""
+    try:
+        appointment = Appointment.objects.select_related('patient', 'doctor__user').get(id=appointment_id)
+        checked_in_by = User.objects.get(id=checked_in_by_id)
+    except (Appointment.DoesNotExist, User.DoesNotExist):
+        return False
+
+    # Repeated scans of the same code are harmless
+    if appointment.status not in ('scheduled', 'confirmed'):
+        return False
+
+    change_appointment_status(appointment, 'in_progress', checked_in_by)
+    return True
+
+
+@shared_task
+def materialize_availability(days=None, doctor_ids=None):
+    """Keep a rolling horizon of slots generated from availability templates"""
+    start_date = timezone.localdate()
+    end_date = start_date + timedelta(days=(days or settings.AVAILABILITY_HORIZON_DAYS) - 1)
+    return materialize_slots(start_date, end_date, doctor_ids=doctor_ids)
+
+
+@shared_task
+def prewarm_doctor_agendas(days=1):
+    """Cache the coming days' agendas for every doctor with bookings before the clinic opens"""
+    start_date = timezone.localdate()
+    end_date = start_date + timedelta(days=days - 1)
+    doctor_ids = list(Appointment.objects.filter(
+        scheduled_date__gte=start_date,
+        scheduled_date__lte=end_date
+    ).order_by().values_list('doctor_id', flat=True).distinct())
+
+    warmed = 0
+    for i in range(0, len(doctor_ids), AGENDA_BATCH_SIZE):
+        warmed += prewarm_agendas(doctor_ids[i:i + AGENDA_BATCH_SIZE], start_date, end_date)
+    return warmed
+
+
+@shared_task
+def match_waitlist(slot_ids):
+    """Offer freed slots to the waitlist; slots already taken are skipped, so redelivery is harmless"""
+    return len(offer_freed_slots(slot_ids))
+
+
+@shared_task
+def expire_waitlist_offers():
+    """Pass slots whose hold lapsed on to the next waiting patient"""
+    return expire_offers()
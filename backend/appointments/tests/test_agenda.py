@@ -0,0 +1,129 @@
+import pytest
+from datetime import time, timedelta
+from unittest import mock
+from django.contrib.admin.sites import AdminSite
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse_lazy
+from django.utils import timezone
+from rest_framework.test import APIClient
+from appointments.admin import AppointmentAdmin
+from appointments.agenda import agenda_key
+from appointments.models import Appointment
+from appointments.services import change_appointment_status
+from appointments.tasks import prewarm_doctor_agendas
+from notifications.models import Notification, OutboxEvent
+
+URL = reverse_lazy('doctor_today_appointments')
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+
+
+@pytest.fixture
+def day():
+    return timezone.localdate()
+
+
+@pytest.fixture
+def client(doctor):
+    client = APIClient()
+    client.force_authenticate(doctor.user)
+    return client
+
+
+def book(patient, doctor, day, at):
+    return Appointment.objects.create(patient=patient, doctor=doctor, appointment_type='consultation',
+                                      scheduled_date=day, scheduled_time=at, reason_for_visit='Checkup')
+
+
+def appointment_queries(context):
+    return [q['sql'] for q in context.captured_queries if 'appointments_appointment' in q['sql']]
+
+
+@pytest.mark.django_db
+def test_day_agenda_is_ordered_and_served_from_cache(client, patient, doctor, day):
+    late = book(patient, doctor, day, time(15, 0))
+    early = book(patient, doctor, day, time(9, 0))
+    book(patient, doctor, day + timedelta(days=1), time(9, 0))
+
+    with CaptureQueriesContext(connection) as context:
+        r = client.get(URL, {'date': day.isoformat()})
+    assert r.status_code == 200
+    assert [row['id'] for row in r.data] == [str(early.id), str(late.id)]
+    assert r.data[0]['patient']['username'] == 'patient'
+    assert r.data[0]['qr_code_url'].startswith('http://testserver/')
+    assert len(appointment_queries(context)) == 1
+
+    with CaptureQueriesContext(connection) as context:
+        again = client.get(URL, {'date': day.isoformat()})
+    assert again.data == r.data
+    assert appointment_queries(context) == []
+
+
+@pytest.mark.django_db
+def test_week_view_groups_by_day(client, patient, doctor, day):
+    book(patient, doctor, day + timedelta(days=2), time(9, 0))
+    r = client.get(URL, {'date': day.isoformat(), 'view': 'week'})
+    assert r.status_code == 200
+    assert list(r.data) == [(day + timedelta(days=n)).isoformat() for n in range(7)]
+    assert len(r.data[(day + timedelta(days=2)).isoformat()]) == 1
+    assert r.data[day.isoformat()] == []
+
+
+@pytest.mark.django_db
+def test_patients_and_bad_params_are_rejected(client, patient, day):
+    other = APIClient()
+    other.force_authenticate(patient)
+    assert other.get(URL).status_code == 403
+    assert client.get(URL, {'date': 'soon'}).status_code == 400
+    assert client.get(URL, {'view': 'month'}).status_code == 400
+
+
+@pytest.mark.django_db
+def test_status_change_and_reschedule_invalidate(client, patient, doctor, day):
+    appointment = book(patient, doctor, day, time(9, 0))
+    client.get(URL, {'date': day.isoformat()})
+
+    change_appointment_status(Appointment.objects.get(pk=appointment.pk), 'confirmed', doctor.user)
+    r = client.get(URL, {'date': day.isoformat()})
+    assert r.data[0]['status'] == 'confirmed'
+
+    moved = Appointment.objects.get(pk=appointment.pk)
+    moved.scheduled_date = day + timedelta(days=1)
+    moved.save()
+    assert client.get(URL, {'date': day.isoformat()}).data == []
+
+
+@pytest.mark.django_db
+def test_admin_bulk_action_invalidates(client, patient, doctor, day, django_capture_on_commit_callbacks):
+    booked = book(patient, doctor, day, time(9, 0))
+    cancelled = book(patient, doctor, day, time(10, 0))
+    change_appointment_status(cancelled, 'cancelled', patient)
+    client.get(URL, {'date': day.isoformat()})
+
+    model_admin = AppointmentAdmin(Appointment, AdminSite())
+    with django_capture_on_commit_callbacks(execute=True):
+        with mock.patch.object(model_admin, 'message_user') as message_user:
+            model_admin.confirm_appointments(mock.Mock(user=doctor.user), Appointment.objects.all())
+        # A read racing the update must not outlive the commit
+        cache.set(agenda_key(doctor.id, day), 'stale')
+    assert cache.get(agenda_key(doctor.id, day)) is None
+    assert message_user.call_args.args[1] == '1 appointments have been confirmed.'
+
+    r = client.get(URL, {'date': day.isoformat()})
+    assert [entry['status'] for entry in r.data] == ['confirmed', 'cancelled']
+    # Through the status service, so the patient is told and a cancelled booking is not revived
+    assert Notification.objects.filter(recipient=patient, notification_type='appointment_confirmed').count() == 1
+    assert OutboxEvent.objects.filter(idempotency_key__startswith=f'status:{booked.id}:').count() == 2
+
+
+@pytest.mark.django_db
+def test_prewarm_task_fills_cache_for_booked_doctors(patient, doctor, day):
+    book(patient, doctor, day, time(9, 0))
+    assert prewarm_doctor_agendas(days=2) == 2
+    assert len(cache.get(agenda_key(doctor.id, day))) == 1
+    assert cache.get(agenda_key(doctor.id, day + timedelta(days=1))) == []
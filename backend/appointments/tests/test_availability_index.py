@@ -0,0 +1,110 @@
+import pytest
+from datetime import time, timedelta
+from unittest import mock
+from django.contrib.admin.sites import AdminSite
+from django.core.cache import cache
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from appointments.admin import AppointmentSlotAdmin
+from appointments.availability import CACHE_KEY, get_availability
+from appointments.models import Appointment, AppointmentSlot
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+
+
+@pytest.fixture
+def day():
+    return timezone.localdate() + timedelta(days=3)
+
+
+@pytest.fixture
+def slots(doctor, day):
+    return [
+        AppointmentSlot.objects.create(doctor=doctor, date=day, start_time=time(h, m), end_time=time(h + (m + 30) // 60, (m + 30) % 60))
+        for h, m in [(9, 0), (9, 30), (10, 0), (11, 0)]
+    ]
+
+
+@pytest.fixture
+def client(patient):
+    client = APIClient()
+    client.force_authenticate(patient)
+    return client
+
+
+@pytest.mark.django_db
+def test_index_merges_free_slots_and_excludes_bookings(patient, doctor, day, slots):
+    Appointment.objects.create(patient=patient, doctor=doctor, appointment_type='consultation',
+                               scheduled_date=day, scheduled_time=time(9, 30), reason_for_visit='Checkup')
+
+    index = get_availability(doctor.id)
+
+    assert index.free_intervals(day) == [(540, 570), (600, 630), (660, 690)]
+
+
+@pytest.mark.django_db
+def test_range_endpoint_is_served_from_cache(client, doctor, day, slots, django_assert_num_queries):
+    url = reverse('available_slots', args=[doctor.id])
+    params = {'from': day.isoformat(), 'to': (day + timedelta(days=59)).isoformat()}
+
+    first = client.get(url, params)
+    with django_assert_num_queries(1):  # Only the doctor lookup
+        second = client.get(url, params)
+
+    assert first.status_code == 200
+    assert first.data == second.data
+    assert first.data['days'] == {day.isoformat(): [['09:00', '10:30'], ['11:00', '11:30']]}
+
+
+@pytest.mark.django_db
+def test_bookings_invalidate_the_index(client, patient, doctor, day, slots, django_capture_on_commit_callbacks):
+    url = reverse('available_slots', args=[doctor.id])
+    params = {'from': day.isoformat(), 'to': day.isoformat()}
+    client.get(url, params)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        Appointment.objects.create(patient=patient, doctor=doctor, appointment_type='consultation',
+                                   scheduled_date=day, scheduled_time=time(11, 0), reason_for_visit='Checkup')
+
+    r = client.get(url, params)
+    assert r.data['days'] == {day.isoformat(): [['09:00', '10:30']]}
+
+
+@pytest.mark.django_db
+def test_admin_slot_actions_invalidate_after_the_update(doctor, slots, django_capture_on_commit_callbacks):
+    model_admin = AppointmentSlotAdmin(AppointmentSlot, AdminSite())
+    seen = []
+
+    def record(doctor_ids):
+        seen.append(set(AppointmentSlot.objects.values_list('is_available', flat=True)))
+
+    with mock.patch('appointments.admin.invalidate_availability', side_effect=record):
+        with mock.patch.object(model_admin, 'message_user'):
+            model_admin.make_unavailable(mock.Mock(), AppointmentSlot.objects.all())
+    # Invalidated only once the rows hold the new state
+    assert seen == [{False}]
+
+    with django_capture_on_commit_callbacks(execute=True):
+        with mock.patch.object(model_admin, 'message_user'):
+            model_admin.make_available(mock.Mock(), AppointmentSlot.objects.all())
+        # A read racing the update must not outlive the commit
+        cache.set(CACHE_KEY.format(doctor.id), 'stale')
+    assert cache.get(CACHE_KEY.format(doctor.id)) is None
+
+
+@pytest.mark.django_db
+def test_range_is_limited_to_sixty_days(client, doctor, day):
+    url = reverse('available_slots', args=[doctor.id])
+    r = client.get(url, {'from': day.isoformat(), 'to': (day + timedelta(days=60)).isoformat()})
+    assert r.status_code == 400
+
+
+@pytest.mark.django_db
+def test_single_date_mode_is_unchanged(client, doctor, day, slots):
+    r = client.get(reverse('available_slots', args=[doctor.id]), {'date': day.isoformat()})
+    assert r.status_code == 200
+    assert [slot['start_time'] for slot in r.data] == ['09:00:00', '09:30:00', '10:00:00', '11:00:00']
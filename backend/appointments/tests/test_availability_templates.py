@@ -0,0 +1,86 @@
+import pytest
+from datetime import date, time
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from appointments.models import AppointmentSlot, AvailabilityException, DoctorAvailabilityTemplate
+from appointments.scheduling import materialize_slots
+
+MONDAY = date(2030, 1, 7)
+SUNDAY = date(2030, 1, 13)
+
+
+@pytest.fixture
+def monday_template(doctor):
+    return DoctorAvailabilityTemplate.objects.create(
+        doctor=doctor, weekday=0, start_time=time(9, 0), end_time=time(12, 0), slot_minutes=30,
+        break_start=time(10, 0), break_end=time(10, 30)
+    )
+
+
+@pytest.mark.django_db
+def test_templates_expand_into_slots_around_breaks(monday_template):
+    assert materialize_slots(MONDAY, SUNDAY) == 5
+    assert materialize_slots(MONDAY, SUNDAY) == 0
+
+    starts = list(AppointmentSlot.objects.values_list('start_time', flat=True))
+    assert starts == [time(9, 0), time(9, 30), time(10, 30), time(11, 0), time(11, 30)]
+    assert set(AppointmentSlot.objects.values_list('date', flat=True)) == {MONDAY}
+
+
+@pytest.mark.django_db
+def test_rerunning_does_not_duplicate_or_reset_slots(monday_template):
+    materialize_slots(MONDAY, SUNDAY)
+    AppointmentSlot.objects.filter(start_time=time(9, 0)).update(is_available=False)
+
+    materialize_slots(MONDAY, SUNDAY)
+
+    assert AppointmentSlot.objects.count() == 5
+    assert not AppointmentSlot.objects.get(start_time=time(9, 0)).is_available
+
+
+@pytest.mark.django_db
+def test_exceptions_remove_whole_or_partial_days(doctor, monday_template):
+    next_monday = date(2030, 1, 14)
+    AvailabilityException.objects.create(date=MONDAY, reason='Clinic holiday')
+    AvailabilityException.objects.create(doctor=doctor, date=next_monday,
+                                         start_time=time(11, 0), end_time=time(12, 0))
+
+    materialize_slots(MONDAY, date(2030, 1, 20))
+
+    assert not AppointmentSlot.objects.filter(date=MONDAY).exists()
+    assert AppointmentSlot.objects.filter(date=next_monday).count() == 3
+
+
+@pytest.mark.django_db
+def test_validity_window_and_inactive_templates(doctor, monday_template):
+    monday_template.valid_from = date(2030, 1, 14)
+    monday_template.save()
+    DoctorAvailabilityTemplate.objects.create(
+        doctor=doctor, weekday=1, start_time=time(9, 0), end_time=time(10, 0), is_active=False
+    )
+
+    materialize_slots(MONDAY, date(2030, 1, 20))
+
+    assert set(AppointmentSlot.objects.values_list('date', flat=True)) == {date(2030, 1, 14)}
+
+
+@pytest.mark.django_db
+def test_management_command(monday_template):
+    call_command('materialize_slots', '--start', '2030-01-07', '--days', '14')
+    assert AppointmentSlot.objects.count() == 10
+
+
+@pytest.mark.django_db
+def test_invalid_templates_are_rejected(doctor, monday_template):
+    DoctorAvailabilityTemplate.objects.filter(pk=monday_template.pk).update(slot_minutes=0)
+    # A bad row left in the table yields no slots instead of looping forever
+    assert materialize_slots(MONDAY, SUNDAY) == 0
+
+    for changes in ({'slot_minutes': 0}, {'end_time': time(9, 0)}, {'break_end': None},
+                    {'break_start': time(8, 0)}, {'break_end': time(12, 30)}):
+        template = DoctorAvailabilityTemplate.objects.get(pk=monday_template.pk)
+        template.slot_minutes = 30
+        for field, value in changes.items():
+            setattr(template, field, value)
+        with pytest.raises(ValidationError):
+            template.full_clean()
@@ -0,0 +1,126 @@
+import threading
+import time as clock
+import pytest
+from datetime import date, time
+from django.db import OperationalError, close_old_connections, connection
+from django.urls import reverse
+from rest_framework.test import APIClient
+from accounts.models import User
+from appointments.models import Appointment, AppointmentSlot
+from appointments.services import SlotUnavailable, book_appointment, change_appointment_status
+
+DAY = date(2030, 1, 7)
+BOOKING = {
+    'appointment_type': 'consultation',
+    'scheduled_date': '2030-01-07',
+    'scheduled_time': '09:00',
+    'reason_for_visit': 'Checkup',
+}
+
+
+@pytest.fixture
+def slot(doctor):
+    return AppointmentSlot.objects.create(doctor=doctor, date=DAY, start_time=time(9, 0), end_time=time(9, 45))
+
+
+def post_booking(user, doctor):
+    client = APIClient()
+    client.force_authenticate(user)
+    return client.post(reverse('appointment_list_create'), dict(BOOKING, doctor_id=doctor.id), format='json')
+
+
+@pytest.mark.django_db
+def test_booking_claims_the_slot(patient, doctor, slot):
+    r = post_booking(patient, doctor)
+
+    assert r.status_code == 201
+    slot.refresh_from_db()
+    assert not slot.is_available
+    assert Appointment.objects.get().duration_minutes == 45
+
+
+@pytest.mark.django_db
+def test_second_booking_gets_409(patient, doctor, slot):
+    other = User.objects.create_user(username='other', password='Password123', user_type='patient')
+    assert post_booking(patient, doctor).status_code == 201
+
+    r = post_booking(other, doctor)
+
+    assert r.status_code == 409
+    assert Appointment.objects.count() == 1
+
+
+@pytest.mark.django_db
+def test_booking_without_slot_is_rejected(patient, doctor):
+    r = post_booking(patient, doctor)
+    assert r.status_code == 400
+    assert 'scheduled_time' in r.data
+
+
+@pytest.mark.django_db
+def test_legacy_overlapping_appointment_blocks_claim(patient, doctor, slot):
+    Appointment.objects.create(patient=patient, doctor=doctor, appointment_type='consultation',
+                               scheduled_date=DAY, scheduled_time=time(8, 45), reason_for_visit='Legacy')
+
+    with pytest.raises(SlotUnavailable):
+        book_appointment(patient, doctor, DAY, time(9, 0), appointment_type='consultation', reason_for_visit='x')
+
+    slot.refresh_from_db()
+    assert slot.is_available
+
+
+@pytest.mark.django_db
+def test_cancelling_releases_the_slot(patient, doctor, slot):
+    appointment = book_appointment(patient, doctor, DAY, time(9, 0), appointment_type='consultation',
+                                   reason_for_visit='Checkup')
+
+    change_appointment_status(appointment, 'cancelled', patient)
+
+    slot.refresh_from_db()
+    assert slot.is_available
+
+
+@pytest.mark.django_db(transaction=True)
+def test_parallel_bookings_never_double_book(doctor, slot):
+    attempts = 200
+    patients = [
+        User.objects.create_user(username=f'p{n}', password='Password123', user_type='patient')
+        for n in range(attempts)
+    ]
+    start = threading.Barrier(attempts)
+    outcomes = []
+    lock = threading.Lock()
+
+    def attempt(patient):
+        start.wait()
+        try:
+            book_appointment(patient, doctor, DAY, time(9, 0), appointment_type='consultation',
+                             reason_for_visit='Checkup')
+            outcome = 'booked'
+        except SlotUnavailable:
+            outcome = 'conflict'
+        except OperationalError:
+            # SQLite serializes writers and may refuse a lock outright; that is a lost race too
+            outcome = 'locked'
+        finally:
+            close_old_connections()
+            connection.close()
+        with lock:
+            outcomes.append(outcome)
+
+    started = clock.monotonic()
+    threads = [threading.Thread(target=attempt, args=(patient,)) for patient in patients]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = clock.monotonic() - started
+
+    assert len(outcomes) == attempts
+    assert outcomes.count('booked') == 1
+    if connection.vendor == 'postgresql':
+        # Row locks queue the losers behind the winner, so every one of them sees the claimed slot
+        assert outcomes.count('conflict') == attempts - 1
+    assert Appointment.objects.filter(doctor=doctor, scheduled_date=DAY, scheduled_time=time(9, 0)).count() == 1
+    assert not AppointmentSlot.objects.get(id=slot.id).is_available
+    assert elapsed < 30
@@ -0,0 +1,139 @@
+import pytest
+from datetime import time, timedelta
+from unittest import mock
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from appointments.models import Appointment, AppointmentSlot
+from notifications.models import Notification, OutboxEvent
+
+URL = '/api/appointments/status/bulk/'
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+
+
+@pytest.fixture
+def day():
+    return timezone.localdate() + timedelta(days=1)
+
+
+@pytest.fixture
+def appointments(patient, doctor, day):
+    booked = []
+    for hour in range(8, 18):
+        AppointmentSlot.objects.create(doctor=doctor, date=day, start_time=time(hour, 0), end_time=time(hour, 30),
+                                       is_available=False)
+        booked.append(Appointment.objects.create(
+            patient=patient, doctor=doctor, appointment_type='consultation', scheduled_date=day,
+            scheduled_time=time(hour, 0), reason_for_visit='Checkup', status='confirmed'
+        ))
+    return booked
+
+
+def client_for(user):
+    client = APIClient()
+    client.force_authenticate(user)
+    return client
+
+
+@pytest.mark.django_db
+def test_url_is_registered():
+    assert reverse('bulk_update_appointment_status') == URL
+
+
+@pytest.mark.django_db
+def test_doctor_closes_out_day_with_batched_writes(doctor, patient, appointments, django_capture_on_commit_callbacks):
+    updates = [{'id': str(a.id), 'status': 'completed'} for a in appointments[:6]]
+    updates += [{'id': str(a.id), 'status': 'cancelled'} for a in appointments[6:]]
+
+    with mock.patch('notifications.tasks.relay_outbox.delay') as wake:
+        with django_capture_on_commit_callbacks(execute=True):
+            with CaptureQueriesContext(connection) as context:
+                r = client_for(doctor.user).post(URL, {'updates': updates}, format='json')
+
+    assert r.status_code == 200
+    assert r.data['updated'] == 10
+    statuses = dict(Appointment.objects.values_list('id', 'status'))
+    assert [statuses[a.id] for a in appointments] == ['completed'] * 6 + ['cancelled'] * 4
+
+    # One UPDATE per target status, one for the slots, and one INSERT each for notifications, the outbox
+    # and the dirty rollup days
+    writes = [q['sql'] for q in context.captured_queries if q['sql'].startswith(('UPDATE', 'INSERT'))]
+    assert len(writes) == 6
+    assert len(context.captured_queries) < 12
+
+    assert AppointmentSlot.objects.filter(is_available=True).count() == 4
+    assert Notification.objects.filter(recipient=patient).count() == 10
+
+    wake.assert_called_once()
+    events = OutboxEvent.objects.filter(kind='channel')
+    assert events.count() == 30
+    matcher = OutboxEvent.objects.get(kind='task')
+    assert matcher.destination == 'appointments.tasks.match_waitlist'
+    assert len(matcher.payload['args'][0]) == 4
+    assert set(events.values_list('destination', flat=True)) == {f'user_{patient.id}', f'user_{doctor.user.id}'}
+
+
+@pytest.mark.django_db
+def test_any_invalid_transition_rejects_the_whole_batch(doctor, appointments):
+    Appointment.objects.filter(pk=appointments[0].pk).update(status='completed')
+    updates = [{'id': str(appointments[0].id), 'status': 'confirmed'},
+               {'id': str(appointments[1].id), 'status': 'completed'}]
+
+    r = client_for(doctor.user).post(URL, {'updates': updates}, format='json')
+    assert r.status_code == 400
+    assert list(r.data['errors']) == [str(appointments[0].id)]
+    assert Appointment.objects.get(pk=appointments[1].pk).status == 'confirmed'
+    assert not Notification.objects.exists()
+
+
+@pytest.mark.django_db
+def test_other_doctors_and_patients_are_limited(doctor, patient, appointments):
+    from accounts.models import User, DoctorProfile
+    other_user = User.objects.create_user(username='other', password='Password123', user_type='doctor')
+    DoctorProfile.objects.create(user=other_user, license_number='LIC-2', specialty='cardiology')
+
+    updates = [{'id': str(appointments[0].id), 'status': 'completed'}]
+    r = client_for(other_user).post(URL, {'updates': updates}, format='json')
+    assert r.data['errors'][str(appointments[0].id)] == 'Permission denied'
+
+    assert client_for(patient).post(URL, {'updates': updates}, format='json').status_code == 400
+    cancel = [{'id': str(appointments[0].id), 'status': 'cancelled'}]
+    assert client_for(patient).post(URL, {'updates': cancel}, format='json').status_code == 200
+
+
+@pytest.mark.django_db
+def test_payload_validation(doctor, appointments):
+    client = client_for(doctor.user)
+    assert client.post(URL, {'updates': []}, format='json').status_code == 400
+    duplicate = [{'id': str(appointments[0].id), 'status': 'completed'}] * 2
+    assert client.post(URL, {'updates': duplicate}, format='json').status_code == 400
+    missing = [{'id': '00000000-0000-0000-0000-000000000000', 'status': 'completed'}]
+    assert client.post(URL, {'updates': missing}, format='json').data['errors'] == {
+        '00000000-0000-0000-0000-000000000000': 'Appointment not found'
+    }
+
+
+@pytest.mark.django_db
+def test_cached_agenda_is_invalidated(doctor, appointments, day):
+    client = client_for(doctor.user)
+    client.get(reverse('doctor_today_appointments'), {'date': day.isoformat()})
+    client.post(URL, {'updates': [{'id': str(appointments[0].id), 'status': 'completed'}]}, format='json')
+    agenda = client.get(reverse('doctor_today_appointments'), {'date': day.isoformat()}).data
+    assert agenda[0]['status'] == 'completed'
+
+
+@pytest.mark.django_db
+def test_single_endpoint_enforces_state_machine(doctor, appointments):
+    Appointment.objects.filter(pk=appointments[0].pk).update(status='cancelled')
+    r = client_for(doctor.user).post(
+        reverse('update_appointment_status', args=[appointments[0].id]), {'status': 'confirmed'}, format='json'
+    )
+    assert r.status_code == 400
+
@@ -0,0 +1,131 @@
+import pytest
+from datetime import time, timedelta
+from django.core import signing
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from appointments.ical import FEED_SALT, fold, make_feed_token
+from appointments.models import Appointment
+
+
+def book(patient, doctor, day, at, reason='Checkup'):
+    return Appointment.objects.create(patient=patient, doctor=doctor, appointment_type='consultation',
+                                      scheduled_date=day, scheduled_time=at, reason_for_visit=reason)
+
+
+def feed_url(user):
+    return reverse('appointment_calendar_feed', args=[make_feed_token(user)])
+
+
+def body(response):
+    return b''.join(response.streaming_content).decode('utf-8')
+
+
+@pytest.mark.django_db
+def test_doctor_feed_streams_events(patient, doctor):
+    day = timezone.localdate() + timedelta(days=1)
+    book(patient, doctor, day, time(9, 0), reason='Chest pain; follow-up, urgent')
+    book(patient, doctor, day, time(10, 0))
+
+    r = Client().get(feed_url(doctor.user))
+    assert r.status_code == 200
+    assert r.streaming
+    assert r['Content-Type'].startswith('text/calendar')
+    text = body(r)
+    assert text.startswith('BEGIN:VCALENDAR\r\n') and text.endswith('END:VCALENDAR\r\n')
+    assert text.count('BEGIN:VEVENT') == 2
+    assert 'SUMMARY:Consultation: Pat Ient' in text
+    assert 'DESCRIPTION:Chest pain\\; follow-up\\, urgent' in text
+    assert f'DTSTART:{day:%Y%m%d}T090000Z' in text
+
+
+@pytest.mark.django_db
+def test_patient_feed_only_has_own_appointments(patient, doctor):
+    from accounts.models import User
+    other = User.objects.create_user(username='other', password='Password123', user_type='patient')
+    day = timezone.localdate() + timedelta(days=1)
+    book(patient, doctor, day, time(9, 0))
+    book(other, doctor, day, time(10, 0))
+
+    text = body(Client().get(feed_url(patient)))
+    assert text.count('BEGIN:VEVENT') == 1
+    assert 'with Dr. Doc Tor' in text
+
+
+@pytest.mark.django_db
+def test_unchanged_feed_answers_304_without_events_query(patient, doctor):
+    appointment = book(patient, doctor, timezone.localdate() + timedelta(days=1), time(9, 0))
+    client = Client()
+    first = client.get(feed_url(doctor.user))
+    body(first)
+    etag, last_modified = first['ETag'], first['Last-Modified']
+
+    with CaptureQueriesContext(connection) as context:
+        r = client.get(feed_url(doctor.user), HTTP_IF_NONE_MATCH=etag)
+    assert r.status_code == 304
+    assert not any('"appointments_appointment"."reason_for_visit"' in q['sql'] for q in context.captured_queries)
+
+    assert client.get(feed_url(doctor.user), HTTP_IF_MODIFIED_SINCE=last_modified).status_code == 304
+
+    Appointment.objects.filter(pk=appointment.pk).update(status='confirmed',
+                                                         updated_at=timezone.now() + timedelta(seconds=5))
+    changed = client.get(feed_url(doctor.user), HTTP_IF_NONE_MATCH=etag)
+    assert changed.status_code == 200
+    assert changed['ETag'] != etag
+
+
+@pytest.mark.django_db
+def test_deleting_an_event_changes_the_etag(patient, doctor):
+    day = timezone.localdate() + timedelta(days=1)
+    book(patient, doctor, day, time(9, 0))
+    old = book(patient, doctor, day, time(8, 0))
+    etag = Client().get(feed_url(doctor.user))['ETag']
+    old.delete()
+    assert Client().get(feed_url(doctor.user), HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+
+@pytest.mark.django_db
+def test_bad_token_is_404(patient):
+    assert Client().get(reverse('appointment_calendar_feed', args=['nope'])).status_code == 404
+    patient.is_active = False
+    patient.save()
+    assert Client().get(feed_url(patient)).status_code == 404
+
+
+@pytest.mark.django_db
+def test_link_endpoint_returns_subscription_url(patient):
+    client = APIClient()
+    client.force_authenticate(patient)
+    r = client.get(reverse('appointment_calendar_link'))
+    assert r.status_code == 200
+    assert r.data['url'] == f'http://testserver{feed_url(patient)}'
+
+
+@pytest.mark.django_db
+def test_rotating_the_link_revokes_the_old_url(patient):
+    old = feed_url(patient)
+    # Links issued before feed versions existed keep working until the first rotation
+    legacy = reverse('appointment_calendar_feed', args=[signing.Signer(salt=FEED_SALT).sign_object(str(patient.pk))])
+    assert Client().get(legacy).status_code == 200
+
+    client = APIClient()
+    client.force_authenticate(patient)
+    r = client.post(reverse('appointment_calendar_link'))
+    assert r.status_code == 200
+    patient.refresh_from_db()
+    assert r.data['url'] == f'http://testserver{feed_url(patient)}'
+    assert r.data['url'] != f'http://testserver{old}'
+    assert Client().get(old).status_code == 404
+    assert Client().get(legacy).status_code == 404
+    assert Client().get(feed_url(patient)).status_code == 200
+
+
+def test_long_lines_are_folded_on_character_boundaries():
+    line = 'DESCRIPTION:' + 'é' * 60
+    folded = fold(line)
+    parts = folded[:-2].split('\r\n ')
+    assert ''.join(parts) == line
+    assert all(len(part.encode('utf-8')) <= 75 for part in parts)
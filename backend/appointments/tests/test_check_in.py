@@ -0,0 +1,94 @@
+import pytest
+from datetime import date, time, timedelta
+from unittest import mock
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from accounts.models import User
+from appointments.models import Appointment
+from appointments.qr import build_qr_payload
+from appointments.tasks import check_in_appointment
+from appointments.tokens import InvalidCheckInToken, make_check_in_token, verify_check_in_token
+from notifications.models import Notification
+
+
+@pytest.fixture
+def appointment(patient, doctor):
+    start = timezone.now() + timedelta(minutes=30)
+    return Appointment.objects.create(
+        patient=patient, doctor=doctor, appointment_type='consultation',
+        scheduled_date=start.date(), scheduled_time=start.time().replace(microsecond=0),
+        reason_for_visit='Checkup', status='confirmed'
+    )
+
+
+@pytest.fixture
+def front_desk(db):
+    return User.objects.create_user(username='desk', password='Password123', user_type='staff')
+
+
+@pytest.mark.django_db
+def test_token_round_trip_carries_schedule_without_phi(appointment, patient):
+    token = make_check_in_token(appointment)
+
+    assert build_qr_payload(appointment) == token
+    assert patient.last_name not in token and len(token) < 80
+
+    claims = verify_check_in_token(token)
+    assert claims.appointment_id == appointment.id
+    assert claims.doctor_id == appointment.doctor_id
+    assert claims.starts_at == appointment.scheduled_start.replace(microsecond=0)
+    assert claims.duration_minutes == 30
+
+
+@pytest.mark.django_db
+def test_tampered_token_is_rejected(appointment):
+    token = make_check_in_token(appointment)
+    tampered = token[:10] + ('A' if token[10] != 'A' else 'B') + token[11:]
+
+    with pytest.raises(InvalidCheckInToken):
+        verify_check_in_token(tampered)
+    with pytest.raises(InvalidCheckInToken):
+        verify_check_in_token('not-a-token')
+
+
+@pytest.mark.django_db
+def test_token_outside_window_is_rejected(appointment):
+    token = make_check_in_token(appointment)
+
+    with pytest.raises(InvalidCheckInToken, match='expired'):
+        verify_check_in_token(token, now=appointment.scheduled_end + timedelta(days=1))
+    with pytest.raises(InvalidCheckInToken, match='not open'):
+        verify_check_in_token(token, now=appointment.scheduled_start - timedelta(days=1))
+
+
+@pytest.mark.django_db
+def test_check_in_endpoint_validates_without_queries(appointment, front_desk, django_assert_num_queries):
+    token = make_check_in_token(appointment)
+    client = APIClient()
+    client.force_authenticate(front_desk)
+
+    with mock.patch('appointments.views.queue_check_in') as queue:
+        with django_assert_num_queries(0):
+            r = client.post(reverse('appointment_check_in'), {'token': token}, format='json')
+
+    assert r.status_code == 202
+    queue.assert_called_once_with(appointment.id, front_desk.id)
+
+
+@pytest.mark.django_db
+def test_patients_cannot_use_check_in_endpoint(appointment, patient):
+    client = APIClient()
+    client.force_authenticate(patient)
+    r = client.post(reverse('appointment_check_in'), {'token': make_check_in_token(appointment)}, format='json')
+    assert r.status_code == 403
+
+
+@pytest.mark.django_db
+def test_check_in_task_moves_to_in_progress_once(appointment, front_desk, doctor):
+    assert check_in_appointment(str(appointment.id), str(front_desk.id)) is True
+    assert check_in_appointment(str(appointment.id), str(front_desk.id)) is False
+
+    appointment.refresh_from_db()
+    assert appointment.status == 'in_progress'
+    assert Notification.objects.filter(recipient=doctor.user).count() == 1
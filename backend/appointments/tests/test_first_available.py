@@ -0,0 +1,78 @@
+import pytest
+from datetime import time, timedelta
+from django.core.cache import cache
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from accounts.models import User, DoctorProfile
+from appointments.models import AppointmentSlot
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+
+
+def make_doctor(n, specialty, **kwargs):
+    user = User.objects.create_user(username=f'dr{n}', password='Password123', user_type='doctor',
+                                    first_name='Doc', last_name=str(n))
+    return DoctorProfile.objects.create(user=user, license_number=f'LIC-{n}', specialty=specialty, **kwargs)
+
+
+def add_slot(doctor, day, hour, minute=0):
+    end = hour * 60 + minute + 30
+    AppointmentSlot.objects.create(doctor=doctor, date=day, start_time=time(hour, minute),
+                                   end_time=time(end // 60, end % 60))
+
+
+@pytest.fixture
+def client(patient):
+    client = APIClient()
+    client.force_authenticate(patient)
+    return client
+
+
+@pytest.mark.django_db
+def test_merges_openings_across_doctors_in_time_order(client):
+    tomorrow = timezone.localdate() + timedelta(days=1)
+    a, b = make_doctor(1, 'cardiology'), make_doctor(2, 'cardiology')
+    add_slot(a, tomorrow, 11)
+    add_slot(b, tomorrow, 9)
+    add_slot(a, tomorrow, 9, 30)
+    add_slot(b, tomorrow + timedelta(days=1), 8)
+
+    r = client.get(reverse('first_available_appointments'), {'specialty': 'cardiology', 'limit': 3})
+
+    assert r.status_code == 200
+    assert [(o['start_time'], o['doctor']['id']) for o in r.data] == [('09:00', b.id), ('09:30', a.id), ('11:00', a.id)]
+    assert r.data[0]['doctor']['name'] == 'Doc 2'
+
+
+@pytest.mark.django_db
+def test_filters_specialty_availability_and_after(client):
+    tomorrow = timezone.localdate() + timedelta(days=1)
+    cardio, derm, away = make_doctor(1, 'cardiology'), make_doctor(2, 'dermatology'), make_doctor(3, 'cardiology', is_available=False)
+    for doctor in (cardio, derm, away):
+        add_slot(doctor, tomorrow, 9)
+    add_slot(cardio, tomorrow, 14)
+
+    r = client.get(reverse('first_available_appointments'), {
+        'specialty': 'cardiology', 'after': f'{tomorrow.isoformat()}T12:00:00'
+    })
+
+    assert [(o['date'], o['start_time'], o['doctor']['id']) for o in r.data] == [(tomorrow.isoformat(), '14:00', cardio.id)]
+
+
+@pytest.mark.django_db
+def test_query_count_does_not_grow_with_doctors(client, django_assert_num_queries):
+    tomorrow = timezone.localdate() + timedelta(days=1)
+    for n in range(30):
+        add_slot(make_doctor(n, 'general'), tomorrow, 9 + n % 8)
+
+    url = reverse('first_available_appointments')
+    with django_assert_num_queries(3):  # Doctors, then slots and appointments for every cache miss at once
+        client.get(url)
+    with django_assert_num_queries(1):
+        r = client.get(url, {'limit': 5})
+
+    assert [o['start_time'] for o in r.data] == ['09:00'] * 4 + ['10:00']
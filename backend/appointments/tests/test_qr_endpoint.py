@@ -0,0 +1,92 @@
+import pytest
+from datetime import date, time
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.urls import reverse
+from rest_framework.test import APIClient
+from accounts.models import User
+from appointments.models import Appointment
+from appointments.qr import qr_image_cache
+
+
+@pytest.fixture(autouse=True)
+def clear_qr_caches():
+    qr_image_cache.clear()
+    cache.clear()
+
+
+@pytest.fixture
+def appointment(patient, doctor):
+    return Appointment.objects.create(
+        patient=patient, doctor=doctor, appointment_type='consultation',
+        scheduled_date=date(2030, 1, 7), scheduled_time=time(9, 0), reason_for_visit='Checkup'
+    )
+
+
+@pytest.fixture
+def client(patient):
+    client = APIClient()
+    client.force_authenticate(patient)
+    return client
+
+
+@pytest.mark.django_db
+def test_png_is_rendered_on_demand_with_validators(client, appointment):
+    r = client.get(reverse('appointment_qr_png', args=[appointment.id]), HTTP_ACCEPT='image/png')
+
+    assert r.status_code == 200
+    assert r['Content-Type'] == 'image/png'
+    assert r.content.startswith(b'\x89PNG')
+    assert r['ETag'].startswith('"')
+    assert 'private' in r['Cache-Control'] and 'max-age' in r['Cache-Control']
+    assert len(qr_image_cache) == 1
+
+
+@pytest.mark.django_db
+def test_rendering_is_deterministic_and_conditional(client, appointment):
+    url = reverse('appointment_qr_svg', args=[appointment.id])
+    first = client.get(url)
+    qr_image_cache.clear()
+    cache.clear()
+    second = client.get(url)
+
+    assert first['Content-Type'] == 'image/svg+xml'
+    assert first.content == second.content
+    assert first['ETag'] == second['ETag']
+
+    r = client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+    assert r.status_code == 304
+    assert r.content == b''
+
+
+@pytest.mark.django_db
+def test_png_and_svg_have_distinct_etags(client, appointment):
+    png = client.get(reverse('appointment_qr_png', args=[appointment.id]))
+    svg = client.get(reverse('appointment_qr_svg', args=[appointment.id]))
+    assert png['ETag'] != svg['ETag']
+
+
+@pytest.mark.django_db
+def test_other_patients_cannot_fetch_qr_code(appointment):
+    stranger = User.objects.create_user(username='stranger', password='Password123', user_type='patient')
+    client = APIClient()
+    client.force_authenticate(stranger)
+
+    r = client.get(reverse('appointment_qr_png', args=[appointment.id]))
+    assert r.status_code == 404
+
+
+@pytest.mark.django_db
+def test_purge_command_removes_persisted_files(appointment):
+    appointment.qr_code.save('appointment_legacy_qr.png', ContentFile(b'png'), save=True)
+    storage, name = appointment.qr_code.storage, appointment.qr_code.name
+    assert storage.exists(name)
+
+    call_command('purge_qr_code_files', '--dry-run')
+    assert storage.exists(name)
+
+    call_command('purge_qr_code_files')
+    appointment.refresh_from_db()
+    assert not appointment.qr_code
+    assert not storage.exists(name)
@@ -0,0 +1,59 @@
+import pytest
+from datetime import date, time
+from unittest import mock
+from django.urls import reverse
+from rest_framework.test import APIClient
+from appointments.models import Appointment, AppointmentSlot
+from appointments.tasks import generate_qr_codes, generate_pending_qr_codes
+
+
+def make_appointment(patient, doctor, **kwargs):
+    defaults = {
+        'appointment_type': 'consultation',
+        'scheduled_date': date(2030, 1, 7),
+        'scheduled_time': time(9, 0),
+        'reason_for_visit': 'Checkup',
+    }
+    defaults.update(kwargs)
+    return Appointment.objects.create(patient=patient, doctor=doctor, **defaults)
+
+
+@pytest.mark.django_db
+def test_booking_only_inserts_and_queues_qr_generation(patient, doctor, django_capture_on_commit_callbacks):
+    AppointmentSlot.objects.create(doctor=doctor, date=date(2030, 1, 7), start_time=time(9, 0), end_time=time(9, 30))
+    client = APIClient()
+    client.force_authenticate(patient)
+
+    with mock.patch('appointments.tasks.generate_qr_codes.delay') as delay:
+        with django_capture_on_commit_callbacks(execute=True):
+            r = client.post(reverse('appointment_list_create'), {
+                'doctor_id': doctor.id,
+                'appointment_type': 'consultation',
+                'scheduled_date': '2030-01-07',
+                'scheduled_time': '09:00',
+                'reason_for_visit': 'Checkup',
+            }, format='json')
+
+    assert r.status_code == 201
+    appointment = Appointment.objects.get()
+    assert appointment.qr_status == 'pending'
+    assert not appointment.qr_code
+    delay.assert_called_once_with([str(appointment.id)])
+
+
+@pytest.mark.django_db
+def test_generate_qr_codes_renders_batch(patient, doctor):
+    appointments = [make_appointment(patient, doctor, scheduled_time=time(9 + i, 0)) for i in range(3)]
+
+    assert generate_qr_codes([str(a.id) for a in appointments]) == 3
+
+    for appointment in Appointment.objects.all():
+        assert appointment.qr_status == 'ready'
+        assert not appointment.qr_code
+
+
+@pytest.mark.django_db
+def test_pending_sweep_skips_ready_rows(patient, doctor):
+    make_appointment(patient, doctor)
+    assert generate_pending_qr_codes(batch_size=1) == 1
+    assert generate_pending_qr_codes() == 0
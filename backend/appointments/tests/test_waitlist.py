@@ -0,0 +1,234 @@
+import pytest
+import random
+import time as clock
+import uuid
+from datetime import date, datetime, time, timedelta
+from unittest import mock
+from asgiref.sync import async_to_sync
+from django.contrib import messages
+from django.contrib.admin.sites import AdminSite
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from accounts.models import User
+from appointments.admin import AppointmentAdmin
+from appointments.models import Appointment, AppointmentSlot, WaitlistEntry
+from appointments.services import change_appointment_status
+from appointments.tasks import expire_waitlist_offers, match_waitlist
+from appointments.waitlist import OfferUnavailable, WaitlistIndex, accept_offer, decline_offer
+from notifications.models import Notification, OutboxEvent
+
+
+@pytest.fixture
+def day():
+    return timezone.localdate() + timedelta(days=2)
+
+
+@pytest.fixture
+def booked(patient, doctor, day):
+    AppointmentSlot.objects.create(doctor=doctor, date=day, start_time=time(10, 0), end_time=time(10, 30),
+                                   is_available=False)
+    return Appointment.objects.create(patient=patient, doctor=doctor, appointment_type='consultation',
+                                      scheduled_date=day, scheduled_time=time(10, 0), reason_for_visit='Checkup',
+                                      status='confirmed')
+
+
+def waiting(username, day, **kwargs):
+    user = User.objects.create_user(username=username, password='Password123', user_type='patient')
+    defaults = {'appointment_type': 'consultation', 'reason_for_visit': 'Earlier please',
+                'earliest_date': day - timedelta(days=1), 'latest_date': day + timedelta(days=1)}
+    defaults.update(kwargs)
+    return WaitlistEntry.objects.create(patient=user, **defaults)
+
+
+def run_matcher():
+    """Run the matcher the outbox would have dispatched"""
+    event = OutboxEvent.objects.get(destination='appointments.tasks.match_waitlist')
+    return match_waitlist(*event.payload['args'])
+
+
+@pytest.mark.django_db
+def test_cancellation_offers_slot_to_best_ranked_fitting_entry(patient, doctor, booked, day):
+    first_specialty = waiting('a', day, specialty='cardiology')
+    waiting('b', day, doctor=doctor)
+    urgent = waiting('c', day, doctor=doctor, priority=5)
+    waiting('d', day, doctor=doctor, priority=9, preferred_start_time=time(14, 0))
+    waiting('e', day, specialty='neurology', priority=9)
+
+    change_appointment_status(booked, 'cancelled', patient)
+    assert run_matcher() == 1
+
+    urgent.refresh_from_db()
+    assert urgent.status == 'offered'
+    assert urgent.offered_slot.start_time == time(10, 0)
+    assert urgent.hold_expires_at > timezone.now()
+    assert not AppointmentSlot.objects.get().is_available
+    first_specialty.refresh_from_db()
+    assert first_specialty.status == 'waiting'
+    assert OutboxEvent.objects.filter(destination=f'user_{urgent.patient_id}').exists()
+    assert Notification.objects.get(recipient_id=urgent.patient_id).notification_type == 'waitlist_offer'
+
+
+@pytest.mark.django_db
+def test_accepting_an_offer_books_the_held_slot(patient, doctor, booked, day):
+    entry = waiting('a', day, doctor=doctor)
+    change_appointment_status(booked, 'cancelled', patient)
+    run_matcher()
+
+    appointment = accept_offer(entry.id, entry.patient)
+    assert appointment.patient == entry.patient
+    assert (appointment.scheduled_date, appointment.scheduled_time) == (day, time(10, 0))
+    entry.refresh_from_db()
+    assert entry.status == 'booked' and entry.appointment == appointment
+    with pytest.raises(OfferUnavailable):
+        accept_offer(entry.id, entry.patient)
+
+
+@pytest.mark.django_db
+def test_declined_and_lapsed_offers_move_down_the_list(patient, doctor, booked, day):
+    first = waiting('a', day, doctor=doctor)
+    second = waiting('b', day, doctor=doctor)
+    third = waiting('c', day, doctor=doctor)
+    change_appointment_status(booked, 'cancelled', patient)
+    run_matcher()
+
+    decline_offer(first.id, first.patient)
+    first.refresh_from_db()
+    second.refresh_from_db()
+    assert first.status == 'waiting' and second.status == 'offered'
+
+    WaitlistEntry.objects.filter(pk=second.pk).update(hold_expires_at=timezone.now() - timedelta(seconds=1))
+    with pytest.raises(OfferUnavailable):
+        accept_offer(second.id, second.patient)
+    assert expire_waitlist_offers() == 1
+
+    second.refresh_from_db()
+    assert second.status == 'expired'
+    # The decliner is back in line ahead of the third patient
+    first.refresh_from_db()
+    third.refresh_from_db()
+    assert first.status == 'offered' and third.status == 'waiting'
+
+
+@pytest.mark.django_db
+def test_direct_booking_beats_the_matcher(patient, doctor, booked, day):
+    waiting('a', day, doctor=doctor)
+    change_appointment_status(booked, 'cancelled', patient)
+    AppointmentSlot.objects.update(is_available=False)
+    assert run_matcher() == 0
+
+
+@pytest.mark.django_db
+def test_admin_and_websocket_cancellations_reach_the_matcher(patient, doctor, booked, day):
+    from notifications.consumers import AppointmentConsumer
+
+    model_admin = AppointmentAdmin(Appointment, AdminSite())
+    admin_user = User.objects.create_user(username='admin', password='Password123', user_type='admin')
+    with mock.patch.object(model_admin, 'message_user'):
+        model_admin.mark_cancelled(mock.Mock(user=admin_user), Appointment.objects.all())
+    assert Appointment.objects.get().status == 'cancelled'
+    assert OutboxEvent.objects.filter(destination='appointments.tasks.match_waitlist').count() == 1
+
+    AppointmentSlot.objects.create(doctor=doctor, date=day, start_time=time(11, 0), end_time=time(11, 30),
+                                   is_available=False)
+    other = Appointment.objects.create(patient=patient, doctor=doctor, appointment_type='consultation',
+                                       scheduled_date=day, scheduled_time=time(11, 0), reason_for_visit='Checkup')
+    consumer = AppointmentConsumer()
+    consumer.user = patient
+    assert async_to_sync(consumer.update_appointment_status)(str(other.id), 'cancelled') is True
+    assert async_to_sync(consumer.update_appointment_status)(str(other.id), 'confirmed') is False
+    assert OutboxEvent.objects.filter(destination='appointments.tasks.match_waitlist').count() == 2
+
+
+@pytest.mark.django_db
+def test_admin_cancellation_by_superusers_and_refusals(patient, doctor, booked):
+    model_admin = AppointmentAdmin(Appointment, AdminSite())
+    # Neither privileged nor a party to the appointment: refused with a message, not a server error
+    outsider = User.objects.create_user(username='outsider', password='Password123', user_type='patient')
+    with mock.patch.object(model_admin, 'message_user') as message_user:
+        model_admin.mark_cancelled(mock.Mock(user=outsider), Appointment.objects.all())
+    assert message_user.call_args.kwargs['level'] == messages.ERROR
+    assert Appointment.objects.get().status == 'confirmed'
+
+    superuser = User.objects.create_superuser(username='root', password='Password123')
+    assert superuser.user_type == 'patient'
+    with mock.patch.object(model_admin, 'message_user'):
+        model_admin.mark_cancelled(mock.Mock(user=superuser), Appointment.objects.all())
+    assert Appointment.objects.get().status == 'cancelled'
+
+
+@pytest.mark.django_db
+def test_patients_join_and_leave_through_the_api(patient, doctor, day):
+    client = APIClient()
+    client.force_authenticate(patient)
+    r = client.post(reverse('waitlist_list_create'), {
+        'doctor_id': doctor.id, 'appointment_type': 'consultation', 'reason_for_visit': 'Sooner',
+        'earliest_date': day.isoformat(), 'latest_date': (day + timedelta(days=5)).isoformat(),
+    }, format='json')
+    assert r.status_code == 201
+    assert r.data['status'] == 'waiting'
+
+    bad = client.post(reverse('waitlist_list_create'), {
+        'appointment_type': 'consultation', 'reason_for_visit': 'Sooner',
+        'earliest_date': day.isoformat(), 'latest_date': day.isoformat(),
+    }, format='json')
+    assert bad.status_code == 400
+
+    assert client.delete(reverse('waitlist_entry_detail', args=[r.data['id']])).status_code == 204
+    assert WaitlistEntry.objects.get().status == 'cancelled'
+
+
+def synthetic_waitlist(entry_count, slot_count):
+    """Unsaved entries and freed slots over 200 doctors, and each doctor's specialty"""
+    rng = random.Random(7)
+    start = date(2030, 1, 1)
+    created = datetime(2029, 1, 1)
+    specialties = ['cardiology', 'neurology', 'pediatrics', 'dermatology']
+    doctor_specialty = {doctor_id: specialties[doctor_id % 4] for doctor_id in range(200)}
+
+    entries = []
+    for n in range(entry_count):
+        earliest = start + timedelta(days=rng.randrange(30))
+        entry = WaitlistEntry(
+            id=uuid.UUID(int=n), priority=rng.choice([0, 0, 0, 1, 5]),
+            earliest_date=earliest, latest_date=earliest + timedelta(days=rng.randrange(1, 14)),
+            created_at=created + timedelta(seconds=n),
+            preferred_start_time=rng.choice([None, time(8, 0), time(13, 0)]),
+        )
+        if n % 3:
+            entry.doctor_id = rng.randrange(200)
+        else:
+            entry.specialty = rng.choice(specialties)
+        entries.append(entry)
+
+    slots = []
+    for n in range(slot_count):
+        hour = 8 + rng.randrange(9)
+        slots.append(AppointmentSlot(id=n, doctor_id=rng.randrange(200), date=start + timedelta(days=rng.randrange(40)),
+                                     start_time=time(hour, 0), end_time=time(hour, 30)))
+    return entries, slots, doctor_specialty
+
+
+def test_matcher_offers_each_entry_at_most_once_and_only_fitting_slots():
+    entries, slots, doctor_specialty = synthetic_waitlist(2000, 500)
+    index = WaitlistIndex(entries)
+    matched = [index.match(slot, doctor_specialty[slot.doctor_id]) for slot in slots]
+
+    offered = [entry for entry in matched if entry is not None]
+    assert offered
+    assert len({entry.id for entry in offered}) == len(offered)
+    assert all(entry.fits(slot) for slot, entry in zip(slots, matched) if entry is not None)
+
+
+@pytest.mark.benchmark
+def test_matcher_keeps_up_with_thousands_of_cancellations():
+    entries, slots, doctor_specialty = synthetic_waitlist(20000, 5000)
+
+    began = clock.perf_counter()
+    index = WaitlistIndex(entries)
+    matched = [index.match(slot, doctor_specialty[slot.doctor_id]) for slot in slots]
+    elapsed = clock.perf_counter() - began
+
+    assert all(entry.fits(slot) for slot, entry in zip(slots, matched) if entry is not None)
+    # 5,000 cancellations must clear well inside a minute's budget
+    assert len(slots) / elapsed * 60 > 10000, f'{len(slots) / elapsed * 60:.0f} matches per minute'
@@ -0,0 +1,87 @@
+import base64
+import binascii
+import struct
+import uuid
+from collections import namedtuple
+from datetime import datetime, timezone as dt_timezone
+from django.conf import settings
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare, salted_hmac
+
+TOKEN_VERSION = 1
+TOKEN_SALT = 'appointments.check_in'
+SIGNATURE_BYTES = 16
+
+# version, appointment UUID, doctor id, start (epoch seconds), duration (minutes), expiry (epoch seconds)
+_BODY = struct.Struct('>B16sQIHI')
+
+CheckInClaims = namedtuple('CheckInClaims', ['appointment_id', 'doctor_id', 'starts_at', 'duration_minutes', 'expires_at'])
+
+
+class InvalidCheckInToken(Exception):
+    pass
+
+
+def _sign(body):
+    return salted_hmac(TOKEN_SALT, body, algorithm='sha256').digest()[:SIGNATURE_BYTES]
+
+
+def _b64encode(raw):
+    return base64.urlsafe_b64encode(raw).rstrip(b'=').decode('ascii')
+
+
+def _b64decode(text):
+    return base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+
+
+def make_check_in_token(appointment):
+    """Build the signed token encoded in an appointment's QR code.
+
+    The token is derived only from the appointment, so it is stable across
+    renders and the QR image can be cached by content hash.
+    """
+    starts_at = appointment.scheduled_start
+    expires_at = appointment.scheduled_end + settings.CHECK_IN_TOKEN_GRACE
+    body = _BODY.pack(
+        TOKEN_VERSION,
+        appointment.id.bytes,
+        appointment.doctor_id,
+        int(starts_at.timestamp()),
+        appointment.duration_minutes,
+        int(expires_at.timestamp()),
+    )
+    return _b64encode(body + _sign(body))
+
+
+def verify_check_in_token(token, now=None):
+    """Validate a check-in token without touching the database"""
+    try:
+        raw = _b64decode(token)
+    except (binascii.Error, ValueError, TypeError):
+        raise InvalidCheckInToken('Malformed token')
+
+    if len(raw) != _BODY.size + SIGNATURE_BYTES:
+        raise InvalidCheckInToken('Malformed token')
+
+    body, signature = raw[:_BODY.size], raw[_BODY.size:]
+    if not constant_time_compare(signature, _sign(body)):
+        raise InvalidCheckInToken('Invalid signature')
+
+    version, appointment_uuid, doctor_id, start, duration, expiry = _BODY.unpack(body)
+    if version != TOKEN_VERSION:
+        raise InvalidCheckInToken('Unsupported token version')
+
+    claims = CheckInClaims(
+        appointment_id=uuid.UUID(bytes=appointment_uuid),
+        doctor_id=doctor_id,
+        starts_at=datetime.fromtimestamp(start, tz=dt_timezone.utc),
+        duration_minutes=duration,
+        expires_at=datetime.fromtimestamp(expiry, tz=dt_timezone.utc),
+    )
+
+    now = now or timezone.now()
+    if now >= claims.expires_at:
+        raise InvalidCheckInToken('Token has expired')
+    if now < claims.starts_at - settings.CHECK_IN_EARLIEST:
+        raise InvalidCheckInToken('Check-in is not open yet')
+    return claims
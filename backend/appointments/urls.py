@@ -4,7 +4,18 @@ from . import views
 urlpatterns = [
     path('', views.AppointmentListCreateView.as_view(), name='appointment_list_create'),
     path('<uuid:pk>/', views.AppointmentDetailView.as_view(), name='appointment_detail'),
-    path('slots/<uuid:doctor_id>/', views.available_slots, name='available_slots'),
+    path('<uuid:pk>/qr.png', views.AppointmentQRCodeView.as_view(), {'fmt': 'png'}, name='appointment_qr_png'),
+    path('<uuid:pk>/qr.svg', views.AppointmentQRCodeView.as_view(), {'fmt': 'svg'}, name='appointment_qr_svg'),
+    path('first-available/', views.first_available_appointments, name='first_available_appointments'),
+    path('slots/<int:doctor_id>/', views.available_slots, name='available_slots'),
     path('<uuid:appointment_id>/status/', views.update_appointment_status, name='update_appointment_status'),
+    path('status/bulk/', views.bulk_update_appointment_status, name='bulk_update_appointment_status'),
+    path('check-in/', views.check_in, name='appointment_check_in'),
+    path('calendar/', views.calendar_feed_link, name='appointment_calendar_link'),
+    path('calendar/<str:token>.ics', views.calendar_feed, name='appointment_calendar_feed'),
+    path('waitlist/', views.WaitlistListCreateView.as_view(), name='waitlist_list_create'),
+    path('waitlist/<uuid:pk>/', views.WaitlistEntryDetailView.as_view(), name='waitlist_entry_detail'),
+    path('waitlist/<uuid:pk>/accept/', views.accept_waitlist_offer, name='waitlist_accept_offer'),
+    path('waitlist/<uuid:pk>/decline/', views.decline_waitlist_offer, name='waitlist_decline_offer'),
     path('doctor/today/', views.doctor_today_appointments, name='doctor_today_appointments'),
 ]
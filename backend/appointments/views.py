@@ -1,15 +1,41 @@
 from rest_framework import generics, status, permissions
+from rest_framework.exceptions import PermissionDenied
 from rest_framework.decorators import api_view, permission_classes
+from rest_framework.negotiation import BaseContentNegotiation
 from rest_framework.response import Response
+from rest_framework.views import APIView
+from django.conf import settings
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
 from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
 from datetime import datetime, timedelta, date
-from .models import Appointment, AppointmentSlot
-from .serializers import AppointmentSerializer, AppointmentSlotSerializer, CreateAppointmentSerializer
+from .agenda import MAX_AGENDA_DAYS, get_agenda
+from .ical import (
+    InvalidFeedToken, feed_queryset, feed_validators, iter_feed, make_feed_token, resolve_feed_token, rotate_feed_token
+)
+from .availability import MAX_RANGE_DAYS, first_available, format_minutes, get_availability
+from .models import Appointment, AppointmentSlot, WaitlistEntry
+from .qr import QR_FORMATS, build_qr_payload, get_qr_image, qr_content_hash
+from .services import SlotUnavailable, StatusChangeRejected, bulk_change_appointment_status, change_appointment_status
+from .tasks import queue_check_in
+from .tokens import InvalidCheckInToken, verify_check_in_token
+from .serializers import (AppointmentSerializer, AppointmentSlotSerializer, BulkStatusChangeSerializer,
+                          CreateAppointmentSerializer, WaitlistEntrySerializer)
+from .waitlist import OfferUnavailable, accept_offer, decline_offer, leave_waitlist
 from accounts.models import DoctorProfile
+from accounts.serializers import DoctorSummarySerializer
+from alturos_health.eager_loading import EagerLoadingViewMixin
+from alturos_health.pagination import KeysetPagination
 
 
-class AppointmentListCreateView(generics.ListCreateAPIView):
+class AppointmentListCreateView(EagerLoadingViewMixin, generics.ListCreateAPIView):
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
+    keyset_ordering = ('-scheduled_date', '-scheduled_time', '-id')
     
     def get_serializer_class(self):
         if self.request.method == 'POST':
@@ -23,9 +49,15 @@ class AppointmentListCreateView(generics.ListCreateAPIView):
         elif user.user_type == 'doctor':
             return Appointment.objects.filter(doctor__user=user)
         return Appointment.objects.none()
+    
+    def create(self, request, *args, **kwargs):
+        try:
+            return super().create(request, *args, **kwargs)
+        except SlotUnavailable as e:
+            return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
 
 
-class AppointmentDetailView(generics.RetrieveUpdateDestroyAPIView):
+class AppointmentDetailView(EagerLoadingViewMixin, generics.RetrieveUpdateDestroyAPIView):
     serializer_class = AppointmentSerializer
     permission_classes = [permissions.IsAuthenticated]
     
@@ -38,11 +70,56 @@ class AppointmentDetailView(generics.RetrieveUpdateDestroyAPIView):
         return Appointment.objects.none()
 
 
+class IgnoreClientContentNegotiation(BaseContentNegotiation):
+    """Serve binary responses regardless of Accept; errors still render as JSON"""
+    
+    def select_parser(self, request, parsers):
+        return parsers[0]
+    
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return (renderers[0], renderers[0].media_type)
+
+
+class AppointmentQRCodeView(APIView):
+    """Render an appointment's QR code on demand with strong HTTP validators"""
+    permission_classes = [permissions.IsAuthenticated]
+    content_negotiation_class = IgnoreClientContentNegotiation
+    
+    def get_queryset(self):
+        user = self.request.user
+        if user.user_type == 'patient':
+            return Appointment.objects.filter(patient=user)
+        elif user.user_type == 'doctor':
+            return Appointment.objects.filter(doctor__user=user)
+        return Appointment.objects.none()
+    
+    def get(self, request, pk, fmt):
+        appointment = get_object_or_404(self.get_queryset().select_related('patient', 'doctor__user'), pk=pk)
+        
+        payload = build_qr_payload(appointment)
+        content_hash = qr_content_hash(payload, fmt)
+        etag = f'"{content_hash}"'
+        
+        # Unchanged images are answered before anything is rendered
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            image = get_qr_image(payload, fmt, content_hash=content_hash)
+            response = HttpResponse(image, content_type=QR_FORMATS[fmt])
+        response['ETag'] = etag
+        patch_cache_control(response, private=True, max_age=settings.QR_CODE_MAX_AGE)
+        return response
+
+
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
 def available_slots(request, doctor_id):
     try:
         doctor = DoctorProfile.objects.get(id=doctor_id)
+        
+        # Range mode answers from the per-doctor availability index
+        if 'from' in request.query_params or 'to' in request.query_params:
+            return availability_range(request, doctor)
+        
         date_str = request.query_params.get('date')
         
         if date_str:
@@ -51,11 +128,11 @@ def available_slots(request, doctor_id):
             date = timezone.now().date()
         
         # Get available slots for the doctor on the specified date
-        slots = AppointmentSlot.objects.filter(
+        slots = AppointmentSlotSerializer.setup_eager_loading(AppointmentSlot.objects.filter(
             doctor=doctor,
             date=date,
             is_available=True
-        )
+        ))
         
         serializer = AppointmentSlotSerializer(slots, many=True)
         return Response(serializer.data)
@@ -66,6 +143,68 @@ def available_slots(request, doctor_id):
         return Response({'error': 'Invalid date format'}, status=status.HTTP_400_BAD_REQUEST)
 
 
+def availability_range(request, doctor):
+    """Free intervals per day between ?from= and ?to= (inclusive)"""
+    today = timezone.localdate()
+    start_date = datetime.strptime(request.query_params.get('from', today.isoformat()), '%Y-%m-%d').date()
+    end_date = datetime.strptime(
+        request.query_params.get('to', (start_date + timedelta(days=6)).isoformat()), '%Y-%m-%d'
+    ).date()
+    
+    if end_date < start_date:
+        return Response({'error': 'to must not be before from'}, status=status.HTTP_400_BAD_REQUEST)
+    if (end_date - start_date).days >= MAX_RANGE_DAYS:
+        return Response({'error': f'Range is limited to {MAX_RANGE_DAYS} days'},
+                        status=status.HTTP_400_BAD_REQUEST)
+    
+    index = get_availability(doctor.id, start_date, end_date)
+    return Response({
+        'doctor_id': doctor.id,
+        'from': start_date.isoformat(),
+        'to': end_date.isoformat(),
+        'days': {
+            day.isoformat(): [[format_minutes(start), format_minutes(end)] for start, end in intervals]
+            for day, intervals in index.intervals_between(start_date, end_date).items()
+        },
+    })
+
+
+FIRST_AVAILABLE_MAX_LIMIT = 50
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def first_available_appointments(request):
+    """Earliest open slots across all available doctors, optionally for one specialty"""
+    now = timezone.localtime().replace(tzinfo=None)
+    after_str = request.query_params.get('after')
+    try:
+        if after_str:
+            after = datetime.fromisoformat(after_str)
+            if timezone.is_aware(after):
+                after = timezone.localtime(after).replace(tzinfo=None)
+            after = max(after, now)
+        else:
+            after = now
+        limit = min(int(request.query_params.get('limit', 10)), FIRST_AVAILABLE_MAX_LIMIT)
+    except ValueError:
+        return Response({'error': 'Invalid after or limit'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    doctors = DoctorProfile.objects.filter(is_available=True).select_related('user')
+    specialty = request.query_params.get('specialty')
+    if specialty:
+        doctors = doctors.filter(specialty=specialty)
+    doctors = {doctor.id: doctor for doctor in doctors}
+    
+    openings = first_available(list(doctors), after, max(limit, 0)) if doctors else []
+    return Response([{
+        'date': day.isoformat(),
+        'start_time': format_minutes(start),
+        'end_time': format_minutes(end),
+        'doctor': DoctorSummarySerializer(doctors[doctor_id]).data,
+    } for day, start, doctor_id, end in openings])
+
+
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
 def update_appointment_status(request, appointment_id):
@@ -79,50 +218,183 @@ def update_appointment_status(request, appointment_id):
             return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
         
         new_status = request.data.get('status')
-        if new_status in dict(Appointment.STATUS_CHOICES):
-            appointment.status = new_status
-            appointment.save()
-            
-            # Create notification for status change
-            from notifications.models import Notification
-            if request.user.user_type == 'doctor':
-                recipient = appointment.patient
-                message = f"Your appointment status has been updated to {appointment.get_status_display()}"
-            else:
-                recipient = appointment.doctor.user
-                message = f"Appointment with {appointment.patient.get_full_name()} status updated to {appointment.get_status_display()}"
-            
-            Notification.objects.create(
-                recipient=recipient,
-                notification_type='appointment_confirmed',
-                title='Appointment Status Update',
-                message=message
-            )
-            
-            return Response({'message': 'Status updated successfully'})
-        else:
+        if new_status not in dict(Appointment.STATUS_CHOICES):
             return Response({'error': 'Invalid status'}, status=status.HTTP_400_BAD_REQUEST)
+        if not appointment.can_transition_to(new_status):
+            return Response({'error': f'Cannot change status from {appointment.status} to {new_status}'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        
+        change_appointment_status(appointment, new_status, request.user)
+        return Response({'message': 'Status updated successfully'})
     
     except Appointment.DoesNotExist:
         return Response({'error': 'Appointment not found'}, status=status.HTTP_404_NOT_FOUND)
 
 
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def bulk_update_appointment_status(request):
+    """Change the status of many appointments at once; nothing is applied if any change is rejected"""
+    serializer = BulkStatusChangeSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    changes = {update['id']: update['status'] for update in serializer.validated_data['updates']}
+    try:
+        changed = bulk_change_appointment_status(changes, request.user)
+    except StatusChangeRejected as e:
+        return Response({
+            'error': str(e),
+            'errors': {str(appointment_id): reason for appointment_id, reason in e.errors.items()}
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    return Response({
+        'updated': len(changed),
+        'appointments': [{'id': str(appointment.id), 'status': appointment.status} for appointment in changed]
+    })
+
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def check_in(request):
+    """Check a patient in from a scanned QR token; the status change happens asynchronously"""
+    if request.user.user_type not in ('staff', 'admin'):
+        return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
+    
+    token = request.data.get('token')
+    if not token:
+        return Response({'error': 'token is required'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        claims = verify_check_in_token(token)
+    except InvalidCheckInToken as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    queue_check_in(claims.appointment_id, request.user.id)
+    return Response({
+        'message': 'Check-in accepted',
+        'appointment': str(claims.appointment_id),
+        'doctor': claims.doctor_id,
+        'scheduled_start': claims.starts_at.isoformat(),
+        'duration_minutes': claims.duration_minutes,
+    }, status=status.HTTP_202_ACCEPTED)
+
+
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
 def doctor_today_appointments(request):
-    """Get today's appointments for a specific doctor"""
+    """Get a doctor's agenda for a day, or the week starting that day with ?view=week"""
+    if request.user.user_type != 'doctor':
+        return Response({'error': 'Only doctors have an agenda'}, status=status.HTTP_403_FORBIDDEN)
+    
     try:
-        # Get date from query params or use today
-        selected_date = request.GET.get('date', date.today().isoformat())
-        
-        # Get appointments for the specified date
-        appointments = Appointment.objects.filter(
-            doctor=request.user,
-            appointment_date=selected_date
-        ).order_by('appointment_time')
-        
-        serializer = AppointmentSerializer(appointments, many=True)
-        return Response(serializer.data)
-        
-    except Exception as e:
-        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        doctor = request.user.doctor_profile
+    except DoctorProfile.DoesNotExist:
+        return Response({'error': 'Doctor profile not found'}, status=status.HTTP_404_NOT_FOUND)
+    
+    try:
+        selected_date = date.fromisoformat(request.GET['date']) if 'date' in request.GET else timezone.localdate()
+    except ValueError:
+        return Response({'error': 'Invalid date format. Use YYYY-MM-DD'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    view = request.GET.get('view', 'day')
+    if view not in ('day', 'week'):
+        return Response({'error': 'view must be day or week'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    end_date = selected_date + timedelta(days=MAX_AGENDA_DAYS - 1 if view == 'week' else 0)
+    agenda = get_agenda(doctor.id, selected_date, end_date)
+    
+    for entries in agenda.values():
+        for entry in entries:
+            entry['qr_code_url'] = request.build_absolute_uri(entry['qr_code_url'])
+    
+    if view == 'day':
+        return Response(agenda[selected_date])
+    return Response({day.isoformat(): entries for day, entries in agenda.items()})
+
+
+@require_safe
+def calendar_feed(request, token):
+    """Stream the user's appointments as an iCalendar feed authenticated by its signed token"""
+    try:
+        user = resolve_feed_token(token)
+    except InvalidFeedToken:
+        raise Http404('Calendar feed not found')
+    
+    queryset = feed_queryset(user)
+    etag, last_modified = feed_validators(user, queryset)
+    last_modified_stamp = int(last_modified.timestamp()) if last_modified else None
+    
+    # Polling clients with an up to date copy get a 304 without the events query
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified_stamp)
+    if response is None:
+        response = StreamingHttpResponse(iter_feed(user, queryset), content_type='text/calendar; charset=utf-8')
+        response['Content-Disposition'] = 'inline; filename="appointments.ics"'
+    response['ETag'] = etag
+    if last_modified_stamp is not None:
+        response['Last-Modified'] = http_date(last_modified_stamp)
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+@api_view(['GET', 'POST'])
+@permission_classes([permissions.IsAuthenticated])
+def calendar_feed_link(request):
+    """Get the subscription URL of the current user's calendar feed; POST replaces a leaked one"""
+    if request.user.user_type not in ('doctor', 'patient'):
+        return Response({'error': 'Only doctors and patients have a calendar feed'}, status=status.HTTP_403_FORBIDDEN)
+    
+    if request.method == 'POST':
+        token = rotate_feed_token(request.user)
+    else:
+        token = make_feed_token(request.user)
+    url = reverse('appointment_calendar_feed', args=[token])
+    return Response({'url': request.build_absolute_uri(url)})
+
+
+class WaitlistListCreateView(EagerLoadingViewMixin, generics.ListCreateAPIView):
+    serializer_class = WaitlistEntrySerializer
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get_queryset(self):
+        return WaitlistEntry.objects.filter(patient=self.request.user)
+    
+    def perform_create(self, serializer):
+        if self.request.user.user_type != 'patient':
+            raise PermissionDenied('Only patients can join the waitlist')
+        serializer.save(patient=self.request.user)
+
+
+class WaitlistEntryDetailView(EagerLoadingViewMixin, generics.RetrieveDestroyAPIView):
+    serializer_class = WaitlistEntrySerializer
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get_queryset(self):
+        return WaitlistEntry.objects.filter(patient=self.request.user, status__in=('waiting', 'offered'))
+    
+    def perform_destroy(self, instance):
+        # Entries are kept for history; leaving releases any slot held for the patient
+        leave_waitlist(instance)
+
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def accept_waitlist_offer(request, pk):
+    """Book the slot currently held for this waitlist entry"""
+    try:
+        appointment = accept_offer(pk, request.user)
+    except OfferUnavailable as e:
+        return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
+    return Response(AppointmentSerializer(appointment, context={'request': request}).data,
+                    status=status.HTTP_201_CREATED)
+
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def decline_waitlist_offer(request, pk):
+    """Pass the held slot on and keep waiting for another one"""
+    try:
+        decline_offer(pk, request.user)
+    except OfferUnavailable as e:
+        return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
+    return Response({'message': 'Offer declined'})
@@ -0,0 +1,203 @@
+import heapq
+from collections import defaultdict
+from datetime import datetime
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from .availability import invalidate_availability
+from .models import Appointment, AppointmentSlot, WaitlistEntry
+
+
+class OfferUnavailable(Exception):
+    pass
+
+
+class WaitlistIndex:
+    """Waiting entries bucketed by doctor and by specialty, each bucket kept in rank order.
+
+    A freed slot can go to someone waiting for that doctor or for any doctor
+    of the specialty, so matching lazily merges the two buckets and takes the
+    best-ranked entry whose window fits. Entries matched earlier in the same
+    batch are skipped, which lets one index serve a whole burst of cancellations.
+    """
+
+    def __init__(self, entries):
+        self.buckets = defaultdict(list)
+        for entry in entries:
+            key = ('doctor', entry.doctor_id) if entry.doctor_id else ('specialty', entry.specialty)
+            self.buckets[key].append((entry.rank, entry))
+        for bucket in self.buckets.values():
+            bucket.sort(key=lambda item: item[0])
+        self.taken = set()
+
+    def candidates(self, doctor_id, specialty):
+        return heapq.merge(
+            self.buckets.get(('doctor', doctor_id), ()),
+            self.buckets.get(('specialty', specialty), ()),
+            key=lambda item: item[0]
+        )
+
+    def match(self, slot, specialty):
+        for _, entry in self.candidates(slot.doctor_id, specialty):
+            if entry.id not in self.taken and entry.fits(slot):
+                self.taken.add(entry.id)
+                return entry
+        return None
+
+
+def load_index(doctor_specialties, exclude_ids=()):
+    """One query for every waiting entry that could take a slot from these doctors"""
+    doctor_ids = list(doctor_specialties)
+    specialties = set(doctor_specialties.values())
+    entries = WaitlistEntry.objects.filter(status='waiting').filter(
+        Q(doctor_id__in=doctor_ids) | Q(doctor__isnull=True, specialty__in=specialties)
+    ).exclude(id__in=list(exclude_ids))
+    return WaitlistIndex(entries)
+
+
+def offer_freed_slots(slot_ids, exclude_ids=()):
+    """Hold each freed slot for the best-ranked waiting patient it fits.
+
+    A slot is only held if it can still be claimed with the same conditional
+    UPDATE that booking uses, so a patient booking it directly in the meantime
+    wins. Returns the entries that received an offer.
+    """
+    from notifications.counters import notifications_created
+    from notifications.models import Notification
+    from notifications.outbox import enqueue
+    from notifications.tasks import notification_events
+
+    slots = list(
+        AppointmentSlot.objects.filter(id__in=list(slot_ids), is_available=True, date__gte=timezone.localdate())
+        .select_related('doctor').order_by('date', 'start_time')
+    )
+    if not slots:
+        return []
+
+    index = load_index({slot.doctor_id: slot.doctor.specialty for slot in slots}, exclude_ids)
+    matches = [(slot, index.match(slot, slot.doctor.specialty)) for slot in slots]
+    matches = [(slot, entry) for slot, entry in matches if entry is not None]
+    if not matches:
+        return []
+
+    expires_at = timezone.now() + settings.WAITLIST_OFFER_HOLD
+    offered = []
+    with transaction.atomic():
+        for slot, entry in matches:
+            if AppointmentSlot.objects.filter(id=slot.id, is_available=True).update(is_available=False) != 1:
+                continue
+            entry.status = 'offered'
+            entry.offered_slot = slot
+            entry.hold_expires_at = expires_at
+            offered.append(entry)
+        if not offered:
+            return []
+
+        WaitlistEntry.objects.bulk_update(offered, ['status', 'offered_slot', 'hold_expires_at'])
+        notifications = Notification.objects.bulk_create([
+            Notification(
+                recipient_id=entry.patient_id,
+                notification_type='waitlist_offer',
+                title='An earlier appointment is available',
+                message=f'A slot on {entry.offered_slot.date} at {entry.offered_slot.start_time:%H:%M} is held '
+                        f'for you until {timezone.localtime(expires_at):%H:%M}.',
+                delivery_method='push'
+            )
+            for entry in offered
+        ])
+        notifications_created(notifications)
+        enqueue(notification_events(notifications))
+
+    # Holds are claimed with update(), so the cached availability is dropped here
+    invalidate_availability(entry.offered_slot.doctor_id for entry in offered)
+    return offered
+
+
+def offer_matching_events(slot_ids):
+    """Outbox events that run the matcher for freed slots"""
+    from notifications.outbox import task_event
+
+    slot_ids = sorted(set(slot_ids))
+    return [task_event('appointments.tasks.match_waitlist', args=[slot_ids])] if slot_ids else []
+
+
+def queue_offer_matching(slot_ids):
+    """Record a matcher run for freed slots in the caller's transaction"""
+    from notifications.outbox import enqueue
+
+    enqueue(offer_matching_events(slot_ids))
+
+
+def _release_offer(entry, new_status):
+    """Free an offered slot and return its id, or None if there was no hold"""
+    slot = entry.offered_slot
+    entry.status = new_status
+    entry.offered_slot = None
+    entry.hold_expires_at = None
+    entry.save(update_fields=['status', 'offered_slot', 'hold_expires_at', 'updated_at'])
+    if slot is None:
+        return None
+    AppointmentSlot.objects.filter(id=slot.id).update(is_available=True)
+    invalidate_availability([slot.doctor_id])
+    return slot.id
+
+
+def accept_offer(entry_id, patient):
+    """Book the held slot for the patient it was offered to"""
+    with transaction.atomic():
+        entry = WaitlistEntry.objects.select_for_update(of=('self',)).select_related('offered_slot').filter(
+            id=entry_id, patient=patient
+        ).first()
+        if entry is None or entry.status != 'offered' or entry.offered_slot is None:
+            raise OfferUnavailable('There is no open offer for this waitlist entry')
+        if entry.hold_expires_at <= timezone.now():
+            raise OfferUnavailable('The offer has expired')
+
+        slot = entry.offered_slot
+        duration = datetime.combine(slot.date, slot.end_time) - datetime.combine(slot.date, slot.start_time)
+        appointment = Appointment.objects.create(
+            patient=patient,
+            doctor_id=slot.doctor_id,
+            appointment_type=entry.appointment_type,
+            scheduled_date=slot.date,
+            scheduled_time=slot.start_time,
+            duration_minutes=int(duration.total_seconds() // 60),
+            reason_for_visit=entry.reason_for_visit
+        )
+        entry.status = 'booked'
+        entry.appointment = appointment
+        entry.hold_expires_at = None
+        entry.save(update_fields=['status', 'appointment', 'hold_expires_at', 'updated_at'])
+    return appointment
+
+
+def decline_offer(entry_id, patient):
+    """Give the held slot to the next patient; the decliner keeps their place for later slots"""
+    with transaction.atomic():
+        entry = WaitlistEntry.objects.select_for_update(of=('self',)).select_related('offered_slot').filter(
+            id=entry_id, patient=patient, status='offered'
+        ).first()
+        if entry is None:
+            raise OfferUnavailable('There is no open offer for this waitlist entry')
+        slot_id = _release_offer(entry, 'waiting')
+    return offer_freed_slots([slot_id], exclude_ids=[entry.id]) if slot_id else []
+
+
+def leave_waitlist(entry):
+    with transaction.atomic():
+        slot_id = _release_offer(entry, 'cancelled')
+        if slot_id:
+            queue_offer_matching([slot_id])
+
+
+def expire_offers(now=None):
+    """Expire lapsed holds and pass their slots on; returns the number expired"""
+    now = now or timezone.now()
+    with transaction.atomic():
+        lapsed = list(WaitlistEntry.objects.select_for_update(skip_locked=True, of=('self',))
+                      .select_related('offered_slot').filter(status='offered', hold_expires_at__lte=now))
+        slot_ids = [_release_offer(entry, 'expired') for entry in lapsed]
+    if lapsed:
+        offer_freed_slots([slot_id for slot_id in slot_ids if slot_id])
+    return len(lapsed)
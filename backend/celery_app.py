@@ -18,7 +18,43 @@ app.autodiscover_tasks()
 app.conf.beat_schedule = {
     'send-appointment-reminders': {
         'task': 'notifications.tasks.send_appointment_reminders',
-        'schedule': crontab(minute=0),  # Run every hour
+        'schedule': crontab(minute=0),  # Every hour; each run covers the hour-long window its leads point at
+    },
+    'generate-pending-qr-codes': {
+        'task': 'appointments.tasks.generate_pending_qr_codes',
+        'schedule': crontab(minute='*/5'),  # Catch anything the booking-time enqueue missed
+    },
+    'materialize-availability': {
+        'task': 'appointments.tasks.materialize_availability',
+        'schedule': crontab(hour=1, minute=0),  # Extend the slot horizon nightly
+    },
+    'expire-waitlist-offers': {
+        'task': 'appointments.tasks.expire_waitlist_offers',
+        'schedule': crontab(),  # Every minute; holds last WAITLIST_OFFER_HOLD
+    },
+    'relay-outbox': {
+        'task': 'notifications.tasks.relay_outbox',
+        'schedule': 10.0,  # Safety net for events whose wake-up was lost
+    },
+    'purge-outbox': {
+        'task': 'notifications.tasks.purge_outbox',
+        'schedule': crontab(hour=3, minute=0),
+    },
+    'refresh-analytics-rollups': {
+        'task': 'analytics.tasks.refresh_rollups',
+        'schedule': crontab(),  # Every minute; dashboards lag changes by at most this
+    },
+    'export-analytics': {
+        'task': 'analytics.tasks.export_analytics',
+        'schedule': crontab(hour=2, minute=30),  # Incremental; only rows changed since the last run
+    },
+    'reconcile-unread-counts': {
+        'task': 'notifications.tasks.reconcile_unread_counts',
+        'schedule': crontab(minute='*/15'),
+    },
+    'prewarm-doctor-agendas': {
+        'task': 'appointments.tasks.prewarm_doctor_agendas',
+        'schedule': crontab(hour=6, minute=0),  # Ahead of clinic opening hours
     },
 }
 
@@ -0,0 +1,41 @@
+import os
+import pytest
+from accounts.models import User, DoctorProfile
+
+
+def pytest_collection_modifyitems(config, items):
+    # Timings depend on the machine, so shared CI runners only run them on request
+    if os.environ.get('RUN_BENCHMARKS') == '1':
+        return
+    skip = pytest.mark.skip(reason='benchmark; set RUN_BENCHMARKS=1 to run')
+    for item in items:
+        if 'benchmark' in item.keywords:
+            item.add_marker(skip)
+
+
+@pytest.fixture(autouse=True)
+def media_root(settings, tmp_path):
+    settings.MEDIA_ROOT = str(tmp_path / 'media')
+    return settings.MEDIA_ROOT
+
+
+@pytest.fixture(autouse=True)
+def fast_password_hasher(settings):
+    settings.PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+
+@pytest.fixture
+def patient(db):
+    return User.objects.create_user(
+        username='patient', password='Password123', user_type='patient',
+        first_name='Pat', last_name='Ient'
+    )
+
+
+@pytest.fixture
+def doctor(db):
+    user = User.objects.create_user(
+        username='doctor', password='Password123', user_type='doctor',
+        first_name='Doc', last_name='Tor'
+    )
+    return DoctorProfile.objects.create(user=user, license_number='LIC-1', specialty='cardiology')
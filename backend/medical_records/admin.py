@@ -1,4 +1,5 @@
 from django.contrib import admin
+from django.utils import timezone
 from .models import MedicalRecord, Prescription, LabResult
 
 
@@ -76,7 +77,7 @@ class LabResultAdmin(admin.ModelAdmin):
     search_fields = ('test_name', 'patient__username', 'patient__first_name', 'patient__last_name', 
                     'doctor__user__username', 'doctor__user__first_name', 'doctor__user__last_name')
     ordering = ('-test_date',)
-    readonly_fields = ('created_at',)
+    readonly_fields = ('created_at', 'updated_at')
     
     fieldsets = (
         ('Test Information', {
@@ -92,7 +93,7 @@ class LabResultAdmin(admin.ModelAdmin):
             'fields': ('test_date', 'result_date')
         }),
         ('System Information', {
-            'fields': ('created_at',),
+            'fields': ('created_at', 'updated_at'),
             'classes': ('collapse',)
         }),
     )
@@ -100,16 +101,16 @@ class LabResultAdmin(admin.ModelAdmin):
     actions = ['mark_completed', 'mark_abnormal', 'mark_critical']
     
     def mark_completed(self, request, queryset):
-        updated = queryset.update(status='completed')
+        updated = queryset.update(status='completed', updated_at=timezone.now())
         self.message_user(request, f'{updated} lab results have been marked as completed.')
     mark_completed.short_description = "Mark selected lab results as completed"
     
     def mark_abnormal(self, request, queryset):
-        updated = queryset.update(status='abnormal')
+        updated = queryset.update(status='abnormal', updated_at=timezone.now())
         self.message_user(request, f'{updated} lab results have been marked as abnormal.')
     mark_abnormal.short_description = "Mark selected lab results as abnormal"
     
     def mark_critical(self, request, queryset):
-        updated = queryset.update(status='critical')
+        updated = queryset.update(status='critical', updated_at=timezone.now())
         self.message_user(request, f'{updated} lab results have been marked as critical.')
     mark_critical.short_description = "Mark selected lab results as critical"
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-17 19:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medical_records', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='medicalrecord',
+            index=models.Index(fields=['doctor', '-created_at'], name='record_doctor_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='medicalrecord',
+            index=models.Index(fields=['patient', '-created_at', '-id'], name='record_patient_created_idx'),
+        ),
+    ]
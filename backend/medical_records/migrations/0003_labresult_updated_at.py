@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-17 20:10
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medical_records', '0002_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='labresult',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='labresult',
+            index=models.Index(fields=['updated_at', 'id'], name='lab_updated_idx'),
+        ),
+    ]
@@ -29,6 +29,11 @@ class MedicalRecord(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Doctor's recent notes and the patient's record timeline
+            models.Index(fields=['doctor', '-created_at'], name='record_doctor_created_idx'),
+            models.Index(fields=['patient', '-created_at', '-id'], name='record_patient_created_idx'),
+        ]
     
     def __str__(self):
         return f"{self.title} - {self.patient.get_full_name()}"
@@ -73,6 +78,13 @@ class LabResult(models.Model):
     test_date = models.DateTimeField()
     result_date = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        indexes = [
+            # Incremental analytics exports
+            models.Index(fields=['updated_at', 'id'], name='lab_updated_idx'),
+        ]
     
     def __str__(self):
         return f"{self.test_name} - {self.patient.get_full_name()}"
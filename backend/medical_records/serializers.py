@@ -1,29 +1,33 @@
 from rest_framework import serializers
 from .models import MedicalRecord, Prescription, LabResult
 from accounts.serializers import UserSerializer, DoctorProfileSerializer
+from alturos_health.eager_loading import EagerLoadingMixin
 
 
-class MedicalRecordSerializer(serializers.ModelSerializer):
+class MedicalRecordSerializer(EagerLoadingMixin, serializers.ModelSerializer):
     patient = UserSerializer(read_only=True)
     doctor = DoctorProfileSerializer(read_only=True)
+    select_related_fields = ('patient', 'doctor')
     
     class Meta:
         model = MedicalRecord
         fields = '__all__'
 
 
-class PrescriptionSerializer(serializers.ModelSerializer):
+class PrescriptionSerializer(EagerLoadingMixin, serializers.ModelSerializer):
     patient = UserSerializer(read_only=True)
     doctor = DoctorProfileSerializer(read_only=True)
+    select_related_fields = ('patient', 'doctor')
     
     class Meta:
         model = Prescription
         fields = '__all__'
 
 
-class LabResultSerializer(serializers.ModelSerializer):
+class LabResultSerializer(EagerLoadingMixin, serializers.ModelSerializer):
     patient = UserSerializer(read_only=True)
     doctor = DoctorProfileSerializer(read_only=True)
+    select_related_fields = ('patient', 'doctor')
     
     class Meta:
         model = LabResult
@@ -9,13 +9,17 @@ from django.shortcuts import get_object_or_404
 from .models import MedicalRecord
 from .serializers import MedicalRecordSerializer
 from accounts.models import DoctorProfile
+from alturos_health.eager_loading import EagerLoadingViewMixin
+from alturos_health.pagination import KeysetPagination
 from django.utils import timezone
 from datetime import timedelta
 
 
-class MedicalRecordListView(generics.ListCreateAPIView):
+class MedicalRecordListView(EagerLoadingViewMixin, generics.ListCreateAPIView):
     serializer_class = MedicalRecordSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
+    keyset_ordering = ('-created_at', '-id')
     
     def get_queryset(self):
         user = self.request.user
@@ -30,7 +34,7 @@ class MedicalRecordListView(generics.ListCreateAPIView):
             serializer.save(doctor=self.request.user.doctor_profile)
 
 
-class MedicalRecordDetailView(generics.RetrieveUpdateDestroyAPIView):
+class MedicalRecordDetailView(EagerLoadingViewMixin, generics.RetrieveUpdateDestroyAPIView):
     serializer_class = MedicalRecordSerializer
     permission_classes = [permissions.IsAuthenticated]
     
@@ -43,7 +47,7 @@ class MedicalRecordDetailView(generics.RetrieveUpdateDestroyAPIView):
         return MedicalRecord.objects.none()
 
 
-class PrescriptionListView(generics.ListCreateAPIView):
+class PrescriptionListView(EagerLoadingViewMixin, generics.ListCreateAPIView):
     serializer_class = PrescriptionSerializer
     permission_classes = [permissions.IsAuthenticated]
     
@@ -60,7 +64,7 @@ class PrescriptionListView(generics.ListCreateAPIView):
             serializer.save(doctor=self.request.user.doctor_profile)
 
 
-class PrescriptionDetailView(generics.RetrieveUpdateDestroyAPIView):
+class PrescriptionDetailView(EagerLoadingViewMixin, generics.RetrieveUpdateDestroyAPIView):
     serializer_class = PrescriptionSerializer
     permission_classes = [permissions.IsAuthenticated]
     
@@ -73,7 +77,7 @@ class PrescriptionDetailView(generics.RetrieveUpdateDestroyAPIView):
         return Prescription.objects.none()
 
 
-class LabResultListView(generics.ListCreateAPIView):
+class LabResultListView(EagerLoadingViewMixin, generics.ListCreateAPIView):
     serializer_class = LabResultSerializer
     permission_classes = [permissions.IsAuthenticated]
     
@@ -90,7 +94,7 @@ class LabResultListView(generics.ListCreateAPIView):
             serializer.save(doctor=self.request.user.doctor_profile)
 
 
-class LabResultDetailView(generics.RetrieveUpdateDestroyAPIView):
+class LabResultDetailView(EagerLoadingViewMixin, generics.RetrieveUpdateDestroyAPIView):
     serializer_class = LabResultSerializer
     permission_classes = [permissions.IsAuthenticated]
     
@@ -121,7 +125,7 @@ def recent_notes(request):
         recent_records = MedicalRecord.objects.filter(
             doctor=doctor,
             created_at__gte=thirty_days_ago
-        ).order_by('-created_at')[:10]  # Limit to 10 most recent
+        ).select_related('patient').order_by('-created_at')[:10]  # Limit to 10 most recent
         
         # Format the data for frontend
         notes_data = []
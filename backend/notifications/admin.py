@@ -1,5 +1,7 @@
 from django.contrib import admin
-from .models import Notification, NotificationPreference
+from django.utils import timezone
+from .counters import reset_unread
+from .models import AppointmentReminder, Notification, NotificationPreference, OutboxEvent
 
 
 @admin.register(Notification)
@@ -8,7 +10,7 @@ class NotificationAdmin(admin.ModelAdmin):
     list_filter = ('notification_type', 'delivery_method', 'is_read', 'is_sent', 'created_at')
     search_fields = ('title', 'message', 'recipient__username', 'recipient__first_name', 'recipient__last_name')
     ordering = ('-created_at',)
-    readonly_fields = ('created_at', 'sent_at')
+    readonly_fields = ('created_at', 'updated_at', 'sent_at')
     
     fieldsets = (
         ('Notification Content', {
@@ -21,7 +23,7 @@ class NotificationAdmin(admin.ModelAdmin):
             'fields': ('is_read', 'is_sent', 'sent_at')
         }),
         ('System Information', {
-            'fields': ('created_at',),
+            'fields': ('created_at', 'updated_at'),
             'classes': ('collapse',)
         }),
     )
@@ -29,12 +31,16 @@ class NotificationAdmin(admin.ModelAdmin):
     actions = ['mark_as_read', 'mark_as_unread', 'mark_as_sent', 'mark_as_unsent']
     
     def mark_as_read(self, request, queryset):
-        updated = queryset.update(is_read=True)
+        recipients = list(queryset.order_by().values_list('recipient_id', flat=True).distinct())
+        updated = queryset.update(is_read=True, updated_at=timezone.now())
+        reset_unread(recipients)
         self.message_user(request, f'{updated} notifications have been marked as read.')
     mark_as_read.short_description = "Mark selected notifications as read"
     
     def mark_as_unread(self, request, queryset):
-        updated = queryset.update(is_read=False)
+        recipients = list(queryset.order_by().values_list('recipient_id', flat=True).distinct())
+        updated = queryset.update(is_read=False, updated_at=timezone.now())
+        reset_unread(recipients)
         self.message_user(request, f'{updated} notifications have been marked as unread.')
     mark_as_unread.short_description = "Mark selected notifications as unread"
     
@@ -73,3 +79,21 @@ class NotificationPreferenceAdmin(admin.ModelAdmin):
             'fields': ('marketing_emails',)
         }),
     )
+
+
+@admin.register(OutboxEvent)
+class OutboxEventAdmin(admin.ModelAdmin):
+    list_display = ('idempotency_key', 'kind', 'destination', 'attempts', 'available_at', 'published_at', 'created_at')
+    list_filter = ('kind', 'published_at')
+    search_fields = ('idempotency_key', 'destination')
+    ordering = ('-id',)
+    readonly_fields = ('idempotency_key', 'kind', 'destination', 'payload', 'created_at', 'published_at')
+
+
+@admin.register(AppointmentReminder)
+class AppointmentReminderAdmin(admin.ModelAdmin):
+    list_display = ('appointment', 'kind', 'notification', 'run_token', 'created_at')
+    list_filter = ('kind', 'created_at')
+    search_fields = ('appointment__appointment_id', 'run_token')
+    ordering = ('-created_at',)
+    raw_id_fields = ('appointment', 'notification')
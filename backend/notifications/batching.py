@@ -0,0 +1,76 @@
+import asyncio
+import itertools
+import json
+from collections import OrderedDict
+from urllib.parse import parse_qs
+
+BATCH_INTERVAL = 0.05  # Seconds an event may wait for others to share its frame
+BATCH_MAX_EVENTS = 50  # Events per frame; a full buffer is flushed without waiting
+BATCH_MAX_BUFFER = 500  # Events held for a slow client before the oldest are dropped
+
+
+class BatchedSendMixin:
+    """Optional batched protocol for WebSocket consumers.
+
+    A client that connects with ``?protocol=batch`` receives JSON arrays of
+    events instead of one frame per event. Events are buffered and flushed by
+    a single background task, so while a send to a slow client is in flight
+    new events pile up in the buffer rather than in the server's write queue.
+    Events sharing a coalesce key replace each other in the buffer, and once
+    the buffer is full the oldest events are dropped and the next frame
+    starts with an ``events_dropped`` marker so the client can resync.
+    """
+    batch_interval = BATCH_INTERVAL
+    batch_max_events = BATCH_MAX_EVENTS
+    batch_max_buffer = BATCH_MAX_BUFFER
+
+    def setup_batching(self, enabled=None):
+        if enabled is None:
+            query = parse_qs(self.scope.get('query_string', b'').decode())
+            enabled = query.get('protocol') == ['batch']
+        self.batching = enabled
+        self.event_buffer = OrderedDict()
+        self.dropped_events = 0
+        self.flush_task = None
+        self.buffer_full = asyncio.Event()
+        self._event_ids = itertools.count()
+
+    async def send_event(self, payload, coalesce_key=None):
+        if not getattr(self, 'batching', False):
+            await self.send(text_data=json.dumps(payload))
+            return
+
+        key = coalesce_key if coalesce_key is not None else next(self._event_ids)
+        if key in self.event_buffer:
+            # The newer event supersedes the buffered one and takes its place at the back
+            del self.event_buffer[key]
+        self.event_buffer[key] = payload
+        while len(self.event_buffer) > self.batch_max_buffer:
+            self.event_buffer.popitem(last=False)
+            self.dropped_events += 1
+
+        if len(self.event_buffer) >= self.batch_max_events:
+            self.buffer_full.set()
+        if self.flush_task is None or self.flush_task.done():
+            self.flush_task = asyncio.ensure_future(self.flush_events())
+
+    async def flush_events(self):
+        """Wait out the batch interval, or until a frame's worth is buffered, then drain the buffer"""
+        try:
+            await asyncio.wait_for(self.buffer_full.wait(), timeout=self.batch_interval)
+        except asyncio.TimeoutError:
+            pass
+        self.buffer_full.clear()
+        while self.event_buffer or self.dropped_events:
+            frame = []
+            if self.dropped_events:
+                frame.append({'type': 'events_dropped', 'count': self.dropped_events})
+                self.dropped_events = 0
+            while self.event_buffer and len(frame) < self.batch_max_events:
+                frame.append(self.event_buffer.popitem(last=False)[1])
+            await self.send(text_data=json.dumps(frame))
+        self.buffer_full.clear()
+
+    async def stop_batching(self):
+        if getattr(self, 'flush_task', None) is not None:
+            self.flush_task.cancel()
@@ -1,112 +1,138 @@
 import json
+from urllib.parse import parse_qs
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
 from django.contrib.auth import get_user_model
-from .models import Notification
+from django.core.exceptions import ValidationError
+from .batching import BatchedSendMixin
+from .counters import mark_read, unread_count
+from .sync import sync_notifications
 
 User = get_user_model()
 
 
-class NotificationConsumer(AsyncWebsocketConsumer):
-    async def connect(self):
-        self.user = self.scope["user"]
-        
-        if self.user.is_anonymous:
-            await self.close()
-            return
-        
-        self.user_group_name = f"user_{self.user.id}"
-        
-        # Join user-specific group
-        await self.channel_layer.group_add(
-            self.user_group_name,
-            self.channel_name
-        )
-        
-        await self.accept()
-        
-        # Send unread notification count on connect
+class NotificationStreamMixin:
+    """Handlers of the ``notifications`` stream"""
+    
+    async def open_notifications(self, since=None):
+        # Send unread notification count on subscribe
         unread_count = await self.get_unread_count()
-        await self.send(text_data=json.dumps({
+        await self.stream_event('notifications', {
             'type': 'unread_count',
             'count': unread_count
-        }))
+        }, coalesce_key='unread_count')
+        
+        # A reconnecting client passes its last cursor and is only sent what it missed
+        if since is not None:
+            await self.send_notifications(since)
     
-    async def disconnect(self, close_code):
-        if hasattr(self, 'user_group_name'):
-            await self.channel_layer.group_discard(
-                self.user_group_name,
-                self.channel_name
-            )
+    async def receive_notifications(self, content):
+        message_type = content.get('type')
+        
+        if message_type == 'mark_read':
+            notification_id = content.get('notification_id')
+            await self.mark_notification_read(notification_id)
+        elif message_type == 'get_notifications':
+            await self.send_notifications(content.get('since'))
     
-    async def receive(self, text_data):
-        try:
-            text_data_json = json.loads(text_data)
-            message_type = text_data_json.get('type')
-            
-            if message_type == 'mark_read':
-                notification_id = text_data_json.get('notification_id')
-                await self.mark_notification_read(notification_id)
-            elif message_type == 'get_notifications':
-                notifications = await self.get_recent_notifications()
-                await self.send(text_data=json.dumps({
-                    'type': 'notifications_list',
-                    'notifications': notifications
-                }))
-        except json.JSONDecodeError:
-            pass
+    async def send_notifications(self, since=None):
+        sync = await self.get_notifications_since(since)
+        await self.stream_event('notifications', {'type': 'notifications_list', **sync})
     
     async def notification_message(self, event):
         """Handle notification messages sent to the group"""
-        await self.send(text_data=json.dumps({
+        # A redelivered outbox event carries the same id and replaces the buffered copy
+        await self.stream_event('notifications', {
             'type': 'new_notification',
             'notification': event['notification']
-        }))
+        }, coalesce_key=event.get('event_id'))
     
     async def appointment_update(self, event):
         """Handle appointment status updates"""
-        await self.send(text_data=json.dumps({
+        await self.stream_event('notifications', {
             'type': 'appointment_update',
             'appointment': event['appointment']
-        }))
+        })
     
     @database_sync_to_async
     def get_unread_count(self):
-        return Notification.objects.filter(
-            recipient=self.user,
-            is_read=False
-        ).count()
+        return unread_count(self.user.id)
     
     @database_sync_to_async
     def mark_notification_read(self, notification_id):
         try:
-            notification = Notification.objects.get(
-                id=notification_id,
-                recipient=self.user
-            )
-            notification.is_read = True
-            notification.save()
-            return True
-        except Notification.DoesNotExist:
+            return mark_read(self.user.id, notification_id)
+        except ValidationError:
             return False
     
     @database_sync_to_async
-    def get_recent_notifications(self):
-        notifications = Notification.objects.filter(
-            recipient=self.user
-        ).order_by('-created_at')[:20]
+    def get_notifications_since(self, since):
+        return sync_notifications(self.user.id, since)
+
+
+class AppointmentStreamMixin:
+    """Handlers of the ``appointments`` stream"""
+    
+    async def open_appointments(self, since=None):
+        pass
+    
+    async def receive_appointments(self, content):
+        message_type = content.get('type')
+        
+        if message_type == 'update_status':
+            appointment_id = content.get('appointment_id')
+            new_status = content.get('status')
+            await self.update_appointment_status(appointment_id, new_status)
+    
+    async def appointment_status_update(self, event):
+        """Handle appointment status updates"""
+        # Only the latest status of an appointment matters to a client that is behind
+        await self.stream_event('appointments', {
+            'type': 'status_update',
+            'appointment_id': event['appointment_id'],
+            'status': event['status'],
+            'updated_by': event['updated_by']
+        }, coalesce_key=('status_update', event['appointment_id']))
+    
+    async def appointment_reminder(self, event):
+        """Handle appointment reminders"""
+        await self.stream_event('appointments', {
+            'type': 'reminder',
+            'appointment': event['appointment'],
+            'message': event['message']
+        })
+    
+    @database_sync_to_async
+    def update_appointment_status(self, appointment_id, new_status):
+        from appointments.models import Appointment
+        from appointments.services import change_appointment_status
+        try:
+            appointment = Appointment.objects.select_related('patient', 'doctor').get(id=appointment_id)
+        except (Appointment.DoesNotExist, ValidationError):
+            return False
         
-        return [{
-            'id': str(notification.id),
-            'title': notification.title,
-            'message': notification.message,
-            'notification_type': notification.notification_type,
-            'is_read': notification.is_read,
-            'created_at': notification.created_at.isoformat(),
-        } for notification in notifications]
+        # Check permissions
+        if (self.user.user_type == 'doctor' and appointment.doctor.user_id == self.user.id) or \
+           (self.user.user_type == 'patient' and appointment.patient_id == self.user.id):
+            if not appointment.can_transition_to(new_status):
+                return False
+            # Same path as the REST endpoint, so slots are freed and the waitlist is offered them
+            change_appointment_status(appointment, new_status, self.user)
+            return True
+        return False
 
 
-class AppointmentConsumer(AsyncWebsocketConsumer):
+class StreamConsumer(NotificationStreamMixin, AppointmentStreamMixin, BatchedSendMixin, AsyncWebsocketConsumer):
+    """Socket carrying one or more named streams of the user's events.
+    
+    Every event for a user is sent to the single ``user_<id>`` group, so a
+    socket joins one group however many streams it carries, and events of
+    streams it is not subscribed to are dropped here.
+    """
+    stream_names = ('notifications', 'appointments')
+    # Streams subscribed on connect
+    default_streams = ()
+    
     async def connect(self):
         self.user = self.scope["user"]
         
@@ -114,64 +140,96 @@ class AppointmentConsumer(AsyncWebsocketConsumer):
             await self.close()
             return
         
-        # Join appointment updates group
-        self.appointments_group_name = f"appointments_{self.user.id}"
+        self.user_group_name = f"user_{self.user.id}"
+        self.streams = set()
+        self.setup_batching()
         
+        # Join user-specific group
         await self.channel_layer.group_add(
-            self.appointments_group_name,
+            self.user_group_name,
             self.channel_name
         )
         
         await self.accept()
+        
+        query = parse_qs(self.scope.get('query_string', b'').decode())
+        since = query['since'][0] if 'since' in query else None
+        for stream in self.initial_streams(query):
+            await self.subscribe(stream, since)
+    
+    def initial_streams(self, query):
+        return self.default_streams
     
     async def disconnect(self, close_code):
-        if hasattr(self, 'appointments_group_name'):
+        await self.stop_batching()
+        if hasattr(self, 'user_group_name'):
             await self.channel_layer.group_discard(
-                self.appointments_group_name,
+                self.user_group_name,
                 self.channel_name
             )
     
+    async def subscribe(self, stream, since=None):
+        if stream in self.stream_names and stream not in self.streams:
+            self.streams.add(stream)
+            await getattr(self, f'open_{stream}')(since)
+    
+    async def unsubscribe(self, stream):
+        self.streams.discard(stream)
+    
     async def receive(self, text_data):
         try:
-            text_data_json = json.loads(text_data)
-            message_type = text_data_json.get('type')
-            
-            if message_type == 'update_status':
-                appointment_id = text_data_json.get('appointment_id')
-                new_status = text_data_json.get('status')
-                await self.update_appointment_status(appointment_id, new_status)
+            content = json.loads(text_data)
         except json.JSONDecodeError:
-            pass
+            return
+        if isinstance(content, dict):
+            await self.receive_content(content)
     
-    async def appointment_status_update(self, event):
-        """Handle appointment status updates"""
-        await self.send(text_data=json.dumps({
-            'type': 'status_update',
-            'appointment_id': event['appointment_id'],
-            'status': event['status'],
-            'updated_by': event['updated_by']
-        }))
+    async def receive_content(self, content):
+        # Single-stream sockets take that stream's messages unwrapped
+        for stream in self.streams:
+            await getattr(self, f'receive_{stream}')(content)
     
-    async def appointment_reminder(self, event):
-        """Handle appointment reminders"""
-        await self.send(text_data=json.dumps({
-            'type': 'reminder',
-            'appointment': event['appointment'],
-            'message': event['message']
-        }))
+    async def stream_event(self, stream, payload, coalesce_key=None):
+        if stream in self.streams:
+            await self.send_event(payload, coalesce_key=coalesce_key)
+
+
+# Single-stream routes kept for clients that predate ws/stream/; they receive and drop the other stream's events
+class NotificationConsumer(StreamConsumer):
+    default_streams = ('notifications',)
+
+
+class AppointmentConsumer(StreamConsumer):
+    default_streams = ('appointments',)
+
+
+class MultiplexConsumer(StreamConsumer):
+    """Notifications and appointments over one socket.
     
-    @database_sync_to_async
-    def update_appointment_status(self, appointment_id, new_status):
-        try:
-            from appointments.models import Appointment
-            appointment = Appointment.objects.get(id=appointment_id)
-            
-            # Check permissions
-            if (self.user.user_type == 'doctor' and appointment.doctor.user == self.user) or \
-               (self.user.user_type == 'patient' and appointment.patient == self.user):
-                appointment.status = new_status
-                appointment.save()
-                return True
-            return False
-        except Appointment.DoesNotExist:
-            return False
+    Client messages are ``{"type": "subscribe"|"unsubscribe", "streams": [...]}``,
+    optionally with a ``since`` cursor for the notifications stream, or
+    ``{"stream": name, "payload": {...}}`` carrying a message of that stream's
+    own protocol. Events arrive as ``{"stream": name, "payload": {...}}``.
+    Streams can also be subscribed on connect with ``?streams=a,b``.
+    """
+    
+    def initial_streams(self, query):
+        return [stream for value in query.get('streams', []) for stream in value.split(',')]
+    
+    async def receive_content(self, content):
+        message_type = content.get('type')
+        streams = content.get('streams')
+        if message_type in ('subscribe', 'unsubscribe') and isinstance(streams, list):
+            for stream in streams:
+                if message_type == 'subscribe':
+                    await self.subscribe(stream, content.get('since'))
+                else:
+                    await self.unsubscribe(stream)
+            await self.send_event({'type': 'subscriptions', 'streams': sorted(self.streams)})
+        elif content.get('stream') in self.streams and isinstance(content.get('payload'), dict):
+            await getattr(self, f"receive_{content['stream']}")(content['payload'])
+    
+    async def stream_event(self, stream, payload, coalesce_key=None):
+        if stream in self.streams:
+            await self.send_event({'stream': stream, 'payload': payload},
+                                  coalesce_key=(stream, coalesce_key) if coalesce_key is not None else None)
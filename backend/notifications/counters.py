@@ -0,0 +1,133 @@
+from collections import Counter
+from datetime import timedelta
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+from .models import Notification
+
+CACHE_KEY = 'notifications:unread:v1:{}'
+# Counters expire so any drift the reconciliation misses heals by itself
+CACHE_TIMEOUT = 60 * 60
+RECONCILE_BATCH_SIZE = 1000
+
+
+def counter_key(user_id):
+    return CACHE_KEY.format(user_id)
+
+
+def count_unread(user_id):
+    return Notification.objects.filter(recipient_id=user_id, is_read=False).count()
+
+
+def unread_count(user_id):
+    """The cached unread count, counted from the partial unread index on a miss"""
+    key = counter_key(user_id)
+    count = cache.get(key)
+    if count is None:
+        count = count_unread(user_id)
+        # add() so a counter another request seeded meanwhile is not overwritten. That counter was
+        # seeded after a commit this count may predate, so it is the one to return.
+        if not cache.add(key, count, CACHE_TIMEOUT):
+            cached = cache.get(key)
+            if cached is not None:
+                count = cached
+    return count
+
+
+def _apply(deltas):
+    for user_id, delta in deltas.items():
+        if not delta:
+            continue
+        key = counter_key(user_id)
+        try:
+            if cache.incr(key, delta) < 0:
+                cache.delete(key)
+        except ValueError:
+            # Not cached. A reader may be about to store a count taken before this commit, so seed the
+            # counter from the committed rows; that reader's add() then fails and it returns this count.
+            cache.set(key, count_unread(user_id), CACHE_TIMEOUT)
+
+
+def adjust_unread(deltas):
+    """Apply ``{user id: change}`` to the cached counters once the transaction commits"""
+    deltas = {user_id: delta for user_id, delta in Counter(deltas).items() if delta}
+    if deltas:
+        transaction.on_commit(lambda: _apply(deltas))
+
+
+def notifications_created(notifications):
+    """Count notifications written with bulk_create, which sends no signals"""
+    adjust_unread(Counter(
+        notification.recipient_id for notification in notifications if not notification.is_read
+    ))
+
+
+def reset_unread(user_ids):
+    """Drop counters once the transaction commits, after bulk changes whose effect per user is unknown"""
+    keys = [counter_key(user_id) for user_id in set(user_ids)]
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def mark_read(user_id, notification_id):
+    """Mark one notification read; returns False when the user has no such notification"""
+    read = Notification.objects.filter(id=notification_id, recipient_id=user_id, is_read=False).update(
+        is_read=True, updated_at=timezone.now())
+    if read:
+        adjust_unread({user_id: -1})
+        return True
+    return Notification.objects.filter(id=notification_id, recipient_id=user_id).exists()
+
+
+def mark_all_read(user_id):
+    updated = Notification.objects.filter(recipient_id=user_id, is_read=False).update(
+        is_read=True, updated_at=timezone.now())
+    adjust_unread({user_id: -updated})
+    return updated
+
+
+def _drop_drifted(counts):
+    """Delete the cached counters that disagree with ``{key: counted}``; returns how many"""
+    cached = cache.get_many(list(counts))
+    drifted = [key for key, value in cached.items() if value != counts[key]]
+    if drifted:
+        cache.delete_many(drifted)
+    return len(drifted)
+
+
+def reconcile_unread_counts(batch_size=RECONCILE_BATCH_SIZE, now=None):
+    """Drop every cached counter that disagrees with the database count.
+
+    The counts come from the partial unread index. Users with nothing unread
+    whose notifications changed within ``CACHE_TIMEOUT``, and so may still
+    hold a counter from before the change, are expected to be at zero; older
+    counters have expired. Drifted counters are deleted rather than
+    overwritten, since an increment committed after the count would be lost
+    under a stale value. The next read counts again. Returns the number of
+    counters dropped.
+    """
+    now = now or timezone.now()
+    dropped = 0
+    counted = set()
+    counts = {}
+    for row in (Notification.objects.filter(is_read=False).values('recipient_id')
+                .annotate(unread=Count('id')).order_by('recipient_id').iterator(chunk_size=batch_size)):
+        counted.add(row['recipient_id'])
+        counts[counter_key(row['recipient_id'])] = row['unread']
+        if len(counts) >= batch_size:
+            dropped += _drop_drifted(counts)
+            counts = {}
+
+    changed = (Notification.objects.filter(updated_at__gte=now - timedelta(seconds=CACHE_TIMEOUT))
+               .values_list('recipient_id', flat=True).order_by('recipient_id').distinct())
+    for recipient_id in changed.iterator(chunk_size=batch_size):
+        if recipient_id in counted:
+            continue
+        counts[counter_key(recipient_id)] = 0
+        if len(counts) >= batch_size:
+            dropped += _drop_drifted(counts)
+            counts = {}
+    if counts:
+        dropped += _drop_drifted(counts)
+    return dropped
@@ -0,0 +1,42 @@
+import asyncio
+import signal
+from datetime import timedelta
+from channels.layers import get_channel_layer
+from django.core.management.base import BaseCommand, CommandError
+from notifications.scheduler import (
+    LOAD_INTERVAL, LOOKAHEAD, TICK_SECONDS, DeliveryScheduler, SchedulerLockUnavailable
+)
+
+
+class Command(BaseCommand):
+    help = 'Deliver notifications with scheduled_for set at their due time (runs until interrupted)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lookahead', type=float, default=LOOKAHEAD.total_seconds(),
+                            help='Seconds ahead that pending notifications are loaded')
+        parser.add_argument('--load-interval', type=float, default=LOAD_INTERVAL,
+                            help='Seconds between loads from the database')
+        parser.add_argument('--tick', type=float, default=TICK_SECONDS, help='Timer wheel resolution in seconds')
+
+    def handle(self, *args, **options):
+        if options['load_interval'] >= options['lookahead']:
+            raise CommandError('--load-interval must be shorter than --lookahead or notifications can be late')
+        scheduler = DeliveryScheduler(
+            get_channel_layer(),
+            lookahead=timedelta(seconds=options['lookahead']),
+            load_interval=options['load_interval'],
+            tick=options['tick'],
+            exclusive=True
+        )
+        try:
+            asyncio.run(self.run(scheduler))
+        except SchedulerLockUnavailable as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(f'Stopped after delivering {scheduler.delivered} notifications.'))
+
+    async def run(self, scheduler):
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+        await scheduler.run(stop)
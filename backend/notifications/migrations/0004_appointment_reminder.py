@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-17 20:04
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0006_appointment_updated_index'),
+        ('notifications', '0003_outbox_event'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AppointmentReminder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('day_before', '24 Hours Before'), ('hour_before', '1 Hour Before')], max_length=20)),
+                ('run_token', models.CharField(max_length=32)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('appointment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reminders', to='appointments.appointment')),
+                ('notification', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='reminder', to='notifications.notification')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['run_token'], name='reminder_run_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='appointmentreminder',
+            constraint=models.UniqueConstraint(fields=('appointment', 'kind'), name='reminder_unique_kind'),
+        ),
+    ]
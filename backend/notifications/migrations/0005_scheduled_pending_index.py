@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-17 20:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0004_appointment_reminder'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(condition=models.Q(('is_sent', False), ('scheduled_for__isnull', False)), fields=['scheduled_for'], name='notif_scheduled_pending_idx'),
+        ),
+    ]
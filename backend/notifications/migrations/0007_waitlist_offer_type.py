@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 20:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0006_notification_updated_at'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='notification',
+            name='notification_type',
+            field=models.CharField(choices=[('appointment_reminder', 'Appointment Reminder'), ('appointment_confirmed', 'Appointment Confirmed'), ('appointment_cancelled', 'Appointment Cancelled'), ('waitlist_offer', 'Waitlist Slot Offered'), ('test_results', 'Test Results Available'), ('prescription_ready', 'Prescription Ready'), ('follow_up_required', 'Follow-up Required'), ('system_update', 'System Update')], max_length=30),
+        ),
+    ]
@@ -1,5 +1,8 @@
 from django.db import models
+from django.db.models import Q
+from django.utils import timezone
 from accounts.models import User
+from appointments.models import Appointment
 import uuid
 
 
@@ -8,6 +11,7 @@ class Notification(models.Model):
         ('appointment_reminder', 'Appointment Reminder'),
         ('appointment_confirmed', 'Appointment Confirmed'),
         ('appointment_cancelled', 'Appointment Cancelled'),
+        ('waitlist_offer', 'Waitlist Slot Offered'),
         ('test_results', 'Test Results Available'),
         ('prescription_ready', 'Prescription Ready'),
         ('follow_up_required', 'Follow-up Required'),
@@ -32,14 +36,63 @@ class Notification(models.Model):
     scheduled_for = models.DateTimeField(null=True, blank=True)
     sent_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Bumped by every change a client can see, including bulk read-state updates
+    updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Notification timeline and its keyset cursor
+            models.Index(fields=['recipient', '-created_at', '-id'], name='notif_recipient_created_idx'),
+            models.Index(fields=['recipient', 'is_read', '-created_at'], name='notif_recipient_read_idx'),
+            # Delta sync reads a recipient's changes after a cursor as one range
+            models.Index(fields=['recipient', 'updated_at', 'id'], name='notif_recipient_updated_idx'),
+            # Unread badge counts and lists only ever touch this small slice
+            models.Index(fields=['recipient', '-created_at'], condition=Q(is_read=False),
+                         name='notif_unread_idx'),
+            # Due-soon loads for the delivery scheduler
+            models.Index(fields=['scheduled_for'], condition=Q(is_sent=False, scheduled_for__isnull=False),
+                         name='notif_scheduled_pending_idx'),
+        ]
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the loaded read state so a save can adjust the cached unread count
+        instance._loaded_is_read = instance.__dict__.get('is_read')
+        return instance
     
     def __str__(self):
         return f"{self.title} - {self.recipient.get_full_name()}"
 
 
+class AppointmentReminder(models.Model):
+    """Ledger of reminders sent; the unique constraint makes each one go out once"""
+    KINDS = (
+        ('day_before', '24 Hours Before'),
+        ('hour_before', '1 Hour Before'),
+    )
+    
+    appointment = models.ForeignKey(Appointment, on_delete=models.CASCADE, related_name='reminders')
+    kind = models.CharField(max_length=20, choices=KINDS)
+    # Identifies the run that claimed the reminder
+    run_token = models.CharField(max_length=32)
+    notification = models.OneToOneField(Notification, on_delete=models.SET_NULL, null=True, blank=True,
+                                        related_name='reminder')
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['appointment', 'kind'], name='reminder_unique_kind'),
+        ]
+        indexes = [
+            models.Index(fields=['run_token'], name='reminder_run_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_kind_display()} - {self.appointment_id}"
+
+
 class NotificationPreference(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='notification_preferences')
     appointment_reminders_email = models.BooleanField(default=True)
@@ -55,3 +108,37 @@ class NotificationPreference(models.Model):
     
     def __str__(self):
         return f"Notification Preferences - {self.user.get_full_name()}"
+
+
+class OutboxEvent(models.Model):
+    """A side effect recorded in the same transaction as the change that caused it.
+
+    The relay publishes pending events to the channel layer or Celery and
+    marks them published; an event may be delivered more than once, so each
+    carries its idempotency key to the consumer.
+    """
+    KINDS = (
+        ('channel', 'Channel Layer'),
+        ('task', 'Celery Task'),
+    )
+    
+    idempotency_key = models.CharField(max_length=200, unique=True)
+    kind = models.CharField(max_length=10, choices=KINDS)
+    destination = models.CharField(max_length=200)
+    payload = models.JSONField(default=dict)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    available_at = models.DateTimeField(default=timezone.now)
+    published_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            # The relay only ever reads the unpublished tail
+            models.Index(fields=['available_at', 'id'], condition=Q(published_at__isnull=True),
+                         name='outbox_pending_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.kind}:{self.destination} ({self.idempotency_key})"
@@ -0,0 +1,181 @@
+import asyncio
+import logging
+import uuid
+from datetime import timedelta
+from asgiref.sync import async_to_sync
+from celery import current_app
+from channels.layers import get_channel_layer
+from django.db import transaction
+from django.db.models import Count, Max, Min, Q
+from django.utils import timezone
+from kombu.exceptions import OperationalError
+from .models import OutboxEvent
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_BATCH_SIZE = 100
+MAX_BATCHES_PER_RUN = 50
+MAX_BACKOFF_SECONDS = 300
+# How long a relay holds the events it claimed; ones it has not settled by then are claimed again
+CLAIM_LEASE = timedelta(seconds=60)
+RETENTION = timedelta(days=7)
+
+
+def channel_event(group, message, key=None):
+    """An unsaved event that sends ``message`` to a channel-layer group"""
+    return OutboxEvent(
+        kind='channel',
+        destination=group,
+        payload=message,
+        idempotency_key=key or uuid.uuid4().hex
+    )
+
+
+def task_event(name, args=(), kwargs=None, key=None):
+    """An unsaved event that queues the named Celery task.
+
+    Events are delivered at least once and Celery does not drop repeated task
+    ids, so the task must be safe to run twice with the same arguments.
+    """
+    return OutboxEvent(
+        kind='task',
+        destination=name,
+        payload={'args': list(args), 'kwargs': kwargs or {}},
+        idempotency_key=key or uuid.uuid4().hex
+    )
+
+
+def enqueue(events):
+    """Write events in the caller's transaction and wake the relay once it commits.
+
+    Events whose idempotency key already exists are dropped, so retried
+    producers do not publish twice.
+    """
+    events = list(events)
+    if events:
+        OutboxEvent.objects.bulk_create(events, ignore_conflicts=True)
+        transaction.on_commit(wake_relay)
+    return events
+
+
+def wake_relay():
+    from .tasks import relay_outbox
+    try:
+        relay_outbox.delay()
+    except OperationalError:
+        logger.warning('Could not wake the outbox relay; leaving events for the periodic run')
+
+
+async def _send_channel_events(channel_layer, events):
+    return await asyncio.gather(*(
+        channel_layer.group_send(event.destination, {**event.payload, 'event_id': event.idempotency_key})
+        for event in events
+    ), return_exceptions=True)
+
+
+def publish(events):
+    """Publish a batch and return ``{event id: error}`` for the ones that failed"""
+    errors = {}
+
+    channel_events = [event for event in events if event.kind == 'channel']
+    if channel_events:
+        try:
+            results = async_to_sync(_send_channel_events)(get_channel_layer(), channel_events)
+        except Exception as e:
+            results = [e] * len(channel_events)
+        for event, result in zip(channel_events, results):
+            if isinstance(result, Exception):
+                errors[event.id] = repr(result)
+
+    for event in events:
+        if event.kind != 'task':
+            continue
+        try:
+            # The key is used as the task id to trace a run back to its event; it does not deduplicate
+            current_app.send_task(event.destination, args=event.payload.get('args', []),
+                                  kwargs=event.payload.get('kwargs', {}), task_id=event.idempotency_key)
+        except Exception as e:
+            errors[event.id] = repr(e)
+    return errors
+
+
+def claim_batch(batch_size=OUTBOX_BATCH_SIZE, now=None):
+    """Lease a batch of due events to this relay and return them.
+
+    Rows are locked with SKIP LOCKED only while ``available_at`` is pushed
+    past the lease, so several relays can drain the table side by side
+    without holding locks or a transaction open while they publish.
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        events = list(
+            OutboxEvent.objects.select_for_update(skip_locked=True)
+            .filter(published_at__isnull=True, available_at__lte=now)
+            .order_by('available_at', 'id')[:batch_size]
+        )
+        if events:
+            OutboxEvent.objects.filter(id__in=[event.id for event in events]).update(available_at=now + CLAIM_LEASE)
+    return events
+
+
+def relay_batch(batch_size=OUTBOX_BATCH_SIZE):
+    """Publish one batch of due events; returns ``(published, failed)``.
+
+    Failed events are retried with exponential backoff. A relay that dies
+    after publishing leaves its events to be published again once the lease
+    runs out.
+    """
+    now = timezone.now()
+    events = claim_batch(batch_size, now)
+    if not events:
+        return 0, 0
+
+    errors = publish(events)
+    published = [event.id for event in events if event.id not in errors]
+    failed = [event for event in events if event.id in errors]
+
+    if published:
+        OutboxEvent.objects.filter(id__in=published).update(published_at=timezone.now())
+    for event in failed:
+        event.attempts += 1
+        event.last_error = errors[event.id][:1000]
+        event.available_at = now + timedelta(seconds=min(2 ** event.attempts, MAX_BACKOFF_SECONDS))
+    if failed:
+        OutboxEvent.objects.bulk_update(failed, ['attempts', 'last_error', 'available_at'])
+    return len(published), len(failed)
+
+
+def relay_pending(batch_size=OUTBOX_BATCH_SIZE, max_batches=MAX_BATCHES_PER_RUN):
+    """Drain due events batch by batch, stopping early when a whole batch fails"""
+    total = 0
+    for _ in range(max_batches):
+        published, failed = relay_batch(batch_size)
+        total += published
+        if not published:
+            break
+    return total
+
+
+def purge_published(older_than=RETENTION):
+    cutoff = timezone.now() - older_than
+    deleted, _ = OutboxEvent.objects.filter(published_at__lt=cutoff).delete()
+    return deleted
+
+
+def outbox_metrics(now=None):
+    """Backlog size and age of the oldest unpublished event"""
+    now = now or timezone.now()
+    stats = OutboxEvent.objects.filter(published_at__isnull=True).aggregate(
+        pending=Count('id'),
+        retrying=Count('id', filter=Q(attempts__gt=0)),
+        max_attempts=Max('attempts'),
+        oldest=Min('created_at'),
+    )
+    last_published = OutboxEvent.objects.aggregate(last=Max('published_at'))['last']
+    return {
+        'pending': stats['pending'],
+        'retrying': stats['retrying'],
+        'max_attempts': stats['max_attempts'] or 0,
+        'lag_seconds': (now - stats['oldest']).total_seconds() if stats['oldest'] else 0.0,
+        'last_published_at': last_published.isoformat() if last_published else None,
+    }
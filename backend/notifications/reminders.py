@@ -0,0 +1,121 @@
+import uuid
+from datetime import timedelta
+from itertools import islice
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from appointments.models import Appointment
+from .counters import notifications_created
+from .models import AppointmentReminder, Notification
+from .outbox import enqueue
+
+# Reminder kind -> how far ahead of the appointment it is sent
+REMINDER_LEADS = {
+    'day_before': timedelta(hours=24),
+    'hour_before': timedelta(hours=1),
+}
+# Matches the hourly beat entry, so consecutive runs cover back-to-back windows
+REMINDER_WINDOW = timedelta(hours=1)
+REMINDER_CHUNK_SIZE = 1000
+
+
+def schedule_window(start, end):
+    """Filter for appointments starting in ``[start, end)``, on the local date and time columns"""
+    start, end = timezone.localtime(start), timezone.localtime(end)
+    if start.date() == end.date():
+        return Q(scheduled_date=start.date(), scheduled_time__gte=start.time(), scheduled_time__lt=end.time())
+    return (
+        Q(scheduled_date=start.date(), scheduled_time__gte=start.time())
+        | Q(scheduled_date__gt=start.date(), scheduled_date__lt=end.date())
+        | Q(scheduled_date=end.date(), scheduled_time__lt=end.time())
+    )
+
+
+def window_start(now):
+    """Runs are aligned to the hour, so a run that starts late still covers its own window"""
+    return timezone.localtime(now).replace(minute=0, second=0, microsecond=0)
+
+
+def due_appointments(kind, now):
+    start = window_start(now) + REMINDER_LEADS[kind]
+    return Appointment.objects.filter(schedule_window(start, start + REMINDER_WINDOW), status='confirmed')
+
+
+def claim_reminders(kind, appointment_ids, run_token):
+    """Insert ledger rows and return ``{appointment id: notification id}`` for the ones this run won.
+
+    Rows that already exist are skipped by the unique constraint, so a
+    reminder another run has claimed, or already sent, is never claimed again.
+    Each row points at a fresh notification id that the caller must create in
+    the same transaction; the foreign key is only checked at commit.
+    """
+    appointment_ids = list(appointment_ids)
+    AppointmentReminder.objects.bulk_create([
+        AppointmentReminder(appointment_id=appointment_id, kind=kind, run_token=run_token,
+                            notification_id=uuid.uuid4())
+        for appointment_id in appointment_ids
+    ], ignore_conflicts=True)
+    return dict(AppointmentReminder.objects.filter(
+        kind=kind, run_token=run_token, appointment_id__in=appointment_ids
+    ).values_list('appointment_id', 'notification_id'))
+
+
+def reminder_notification(kind, appointment):
+    """Build the unsaved reminder; expects ``doctor__user`` to be selected"""
+    doctor_name = appointment.doctor.user.get_full_name()
+    if kind == 'day_before':
+        title = 'Appointment Reminder'
+        message = (f'You have an appointment on {appointment.scheduled_date} at '
+                   f'{appointment.scheduled_time:%H:%M} with Dr. {doctor_name}')
+    else:
+        title = 'Appointment Starting Soon'
+        message = f'Your appointment with Dr. {doctor_name} starts in 1 hour'
+    return Notification(
+        recipient_id=appointment.patient_id,
+        notification_type='appointment_reminder',
+        title=title,
+        message=message,
+        delivery_method='push'
+    )
+
+
+def send_reminder_batch(kind, appointments, run_token):
+    """Claim, write and queue the pushes for one chunk in a fixed number of queries"""
+    from .tasks import notification_events
+
+    with transaction.atomic():
+        claimed = claim_reminders(kind, [appointment.id for appointment in appointments], run_token)
+        if not claimed:
+            return 0
+        notifications = []
+        for appointment in appointments:
+            if appointment.id in claimed:
+                notification = reminder_notification(kind, appointment)
+                notification.id = claimed[appointment.id]
+                notifications.append(notification)
+        Notification.objects.bulk_create(notifications)
+        notifications_created(notifications)
+        # Real-time pushes go through the outbox, whose relay sends each batch concurrently
+        enqueue(notification_events(notifications))
+    return len(notifications)
+
+
+def send_due_reminders(now=None, chunk_size=REMINDER_CHUNK_SIZE):
+    """Send every reminder due in this run's window; returns ``{kind: sent}``.
+
+    Due appointments are read in one query with the doctor's user joined,
+    and handled a chunk per transaction.
+    """
+    now = now or timezone.now()
+    sent = {}
+    for kind in REMINDER_LEADS:
+        run_token = uuid.uuid4().hex
+        due = (due_appointments(kind, now).select_related('doctor__user')
+               .order_by('scheduled_date', 'scheduled_time', 'id').iterator(chunk_size=chunk_size))
+        sent[kind] = 0
+        while True:
+            chunk = list(islice(due, chunk_size))
+            if not chunk:
+                break
+            sent[kind] += send_reminder_batch(kind, chunk, run_token)
+    return sent
@@ -4,4 +4,5 @@ from . import consumers
 websocket_urlpatterns = [
     re_path(r'ws/notifications/$', consumers.NotificationConsumer.as_asgi()),
     re_path(r'ws/appointments/$', consumers.AppointmentConsumer.as_asgi()),
+    re_path(r'ws/stream/$', consumers.MultiplexConsumer.as_asgi()),
 ]
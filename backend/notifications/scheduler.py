@@ -0,0 +1,270 @@
+import asyncio
+import logging
+import math
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from asgiref.sync import sync_to_async
+from django.db import connection
+from django.utils import timezone
+from .models import Notification
+
+logger = logging.getLogger(__name__)
+
+SCHEDULER_GROUP = 'notification_scheduler'
+TICK_SECONDS = 0.05
+LOOKAHEAD = timedelta(minutes=2)  # How far ahead pending notifications are loaded into the wheel
+LOAD_INTERVAL = 60.0  # Seconds between loads; new notifications announce themselves in between
+FLUSH_INTERVAL = 1.0  # Seconds between batched is_sent updates
+FLUSH_BATCH_SIZE = 500
+SCHEDULER_LOCK_ID = 0x6e6f7469  # Postgres advisory lock held by the running scheduler
+
+
+class TimerWheel:
+    """Hierarchical timing wheel keyed on seconds since the epoch.
+
+    Level 0 has ``slots`` buckets of one tick each; every bucket of a higher
+    level spans a full turn of the level below. Timers are placed on the
+    lowest level whose range covers them and cascade down as the wheel turns,
+    so adding and expiring are O(1) however many timers are pending.
+    Timers beyond the top level wait in an overflow list that is re-sorted
+    into the wheel once per top-level turn.
+    """
+
+    def __init__(self, tick=TICK_SECONDS, slots=64, levels=4, now=None):
+        self.tick = tick
+        self.slots = slots
+        self.levels = levels
+        self.current = self._tick_of(time.time() if now is None else now)
+        self.wheels = [[[] for _ in range(slots)] for _ in range(levels)]
+        self.overflow = []
+        self.size = 0
+
+    def _tick_of(self, moment):
+        return math.floor(moment / self.tick)
+
+    def add(self, due, item):
+        """Schedule ``item`` for ``due`` (epoch seconds); overdue timers fire on the next advance"""
+        self._place(max(math.ceil(due / self.tick), self.current + 1), due, item)
+        self.size += 1
+
+    def _place(self, due_tick, due, item):
+        delta = due_tick - self.current
+        span = 1
+        for level in range(self.levels):
+            if delta < span * self.slots:
+                self.wheels[level][(due_tick // span) % self.slots].append((due_tick, due, item))
+                return
+            span *= self.slots
+        self.overflow.append((due_tick, due, item))
+
+    def advance(self, now=None):
+        """Turn the wheel up to ``now`` and return the expired items in due order"""
+        target = self._tick_of(time.time() if now is None else now)
+        expired = []
+        while self.current < target:
+            self.current += 1
+            self._cascade()
+            bucket = self.wheels[0][self.current % self.slots]
+            if bucket:
+                self.wheels[0][self.current % self.slots] = []
+                expired.extend(bucket)
+        self.size -= len(expired)
+        return [item for _, _, item in sorted(expired, key=lambda timer: (timer[0], timer[1]))]
+
+    def _cascade(self):
+        span = 1
+        for level in range(1, self.levels + 1):
+            span *= self.slots
+            if self.current % span:
+                return
+            if level == self.levels:
+                timers, self.overflow = self.overflow, []
+            else:
+                index = (self.current // span) % self.slots
+                timers, self.wheels[level][index] = self.wheels[level][index], []
+            for timer in timers:
+                self._place(*timer)
+
+
+def scheduled_message(notification):
+    from .tasks import notification_payload
+
+    return {
+        'type': 'notification_message',
+        'notification': notification_payload(notification),
+        'event_id': f'notification:{notification.id}',
+    }
+
+
+def schedule_event(notification):
+    """Outbox event telling a running scheduler about a notification due before its next load"""
+    from .outbox import channel_event
+
+    return channel_event(SCHEDULER_GROUP, {
+        'type': 'notification.scheduled',
+        'id': str(notification.id),
+        'due': notification.scheduled_for.timestamp(),
+    }, key=f'scheduled:{notification.id}')
+
+
+class SchedulerLockUnavailable(Exception):
+    pass
+
+
+def acquire_scheduler_lock():
+    """Take, or confirm this connection still holds, the lock that keeps a second scheduler out.
+
+    The lock lives as long as the current connection. If that connection was
+    dropped and replaced, this fails once another scheduler has taken the lock.
+    Other databases are assumed to run a single scheduler and always succeed.
+    """
+    if connection.vendor != 'postgresql':
+        return True
+    with connection.cursor() as cursor:
+        # Advisory locks stack per call, so only try for it when this session does not already hold it
+        cursor.execute(
+            "SELECT 1 FROM pg_locks WHERE locktype = 'advisory' AND pid = pg_backend_pid() "
+            "AND classid = 0 AND objid = %s AND objsubid = 1 AND granted", [SCHEDULER_LOCK_ID]
+        )
+        if cursor.fetchone():
+            return True
+        cursor.execute('SELECT pg_try_advisory_lock(%s)', [SCHEDULER_LOCK_ID])
+        return cursor.fetchone()[0]
+
+
+class DeliveryScheduler:
+    """Delivers notifications with ``scheduled_for`` set at their due time.
+
+    Pending notifications due within ``lookahead`` are loaded from the
+    partial index on ``scheduled_for`` into a timer wheel, and notifications
+    created in between are announced on the scheduler group. Each one is sent
+    to its recipient's ``user_<id>`` group when its timer fires, and the sent
+    ones are marked in batches. A crash between sending and marking re-sends
+    on restart; the ``event_id`` lets clients drop the duplicate.
+
+    Only one scheduler may run at a time, or both would send every
+    notification. With ``exclusive`` it takes ``acquire_scheduler_lock`` on
+    its database thread before starting and confirms it at every load,
+    raising ``SchedulerLockUnavailable`` if another scheduler holds it.
+    """
+
+    def __init__(self, channel_layer, lookahead=LOOKAHEAD, load_interval=LOAD_INTERVAL, tick=TICK_SECONDS,
+                 flush_interval=FLUSH_INTERVAL, exclusive=False):
+        self.channel_layer = channel_layer
+        self.exclusive = exclusive
+        self.lookahead = lookahead
+        self.load_interval = load_interval
+        self.flush_interval = flush_interval
+        self.wheel = TimerWheel(tick=tick)
+        self.loaded_until = None
+        # Ids in the wheel or sent but not yet marked, so reloads do not schedule them twice
+        self.tracked = set()
+        self.sent = []
+        self.delivered = 0
+
+    def track(self, notification_id, due):
+        if notification_id not in self.tracked:
+            self.tracked.add(notification_id)
+            self.wheel.add(due, notification_id)
+
+    def load(self, now=None):
+        """Add every unsent notification due within the lookahead, including overdue ones"""
+        if self.exclusive and not acquire_scheduler_lock():
+            raise SchedulerLockUnavailable('Another notification scheduler is running')
+        now = now or timezone.now()
+        self.loaded_until = now + self.lookahead
+        pending = Notification.objects.filter(
+            is_sent=False, scheduled_for__isnull=False, scheduled_for__lte=self.loaded_until
+        ).values_list('id', 'scheduled_for')
+        for notification_id, scheduled_for in pending:
+            self.track(notification_id, scheduled_for.timestamp())
+
+    def announce(self, message):
+        """A notification created since the last load; later ones are picked up by the next load"""
+        due = datetime.fromtimestamp(message['due'], tz=dt_timezone.utc)
+        if self.loaded_until is not None and due <= self.loaded_until:
+            self.track(Notification._meta.pk.to_python(message['id']), message['due'])
+
+    def due_notifications(self, ids, notifications, now=None):
+        """The unsent notifications among ``ids`` still due by ``now``, in the order they fell due.
+
+        ``notifications`` are the rows as read back when the timers fired.
+        Ones rescheduled to later since they were loaded go back on the wheel,
+        or are left to the load that reaches them; deleted, sent or
+        unscheduled ones are forgotten.
+        """
+        now = now or timezone.now()
+        due = []
+        for pk in ids:
+            notification = notifications.get(pk)
+            if notification is None or notification.is_sent or notification.scheduled_for is None:
+                self.tracked.discard(pk)
+            elif notification.scheduled_for > now:
+                if self.loaded_until is not None and notification.scheduled_for <= self.loaded_until:
+                    self.wheel.add(notification.scheduled_for.timestamp(), pk)
+                else:
+                    self.tracked.discard(pk)
+            else:
+                due.append(notification)
+        return due
+
+    def mark_sent(self, ids):
+        Notification.objects.filter(id__in=ids).update(is_sent=True, sent_at=timezone.now())
+
+    async def dispatch(self, now=None):
+        ids = self.wheel.advance(now)
+        if not ids:
+            return 0
+        rows = await sync_to_async(Notification.objects.in_bulk)(ids)
+        moment = timezone.now() if now is None else datetime.fromtimestamp(now, tz=dt_timezone.utc)
+        notifications = self.due_notifications(ids, rows, moment)
+        results = await asyncio.gather(*(
+            self.channel_layer.group_send(f'user_{notification.recipient_id}', scheduled_message(notification))
+            for notification in notifications
+        ), return_exceptions=True)
+        for notification, result in zip(notifications, results):
+            if isinstance(result, Exception):
+                logger.warning('Delivering notification %s failed: %r', notification.id, result)
+                self.tracked.discard(notification.id)  # Retried by the next load
+            else:
+                self.sent.append(notification.id)
+        return len(notifications)
+
+    async def flush(self):
+        while self.sent:
+            batch, self.sent = self.sent[:FLUSH_BATCH_SIZE], self.sent[FLUSH_BATCH_SIZE:]
+            await sync_to_async(self.mark_sent)(batch)
+            self.tracked.difference_update(batch)
+            self.delivered += len(batch)
+
+    async def run(self, stop=None):
+        """Run until ``stop`` (an asyncio.Event) is set"""
+        stop = stop or asyncio.Event()
+        channel = await self.channel_layer.new_channel()
+        await self.channel_layer.group_add(SCHEDULER_GROUP, channel)
+        listener = asyncio.ensure_future(self.listen(channel))
+        next_load = next_flush = 0.0
+        try:
+            while not stop.is_set():
+                clock = time.monotonic()
+                if clock >= next_load:
+                    await sync_to_async(self.load)()
+                    next_load = clock + self.load_interval
+                await self.dispatch()
+                if clock >= next_flush:
+                    await self.flush()
+                    next_flush = clock + self.flush_interval
+                try:
+                    await asyncio.wait_for(stop.wait(), timeout=self.wheel.tick)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            listener.cancel()
+            await self.channel_layer.group_discard(SCHEDULER_GROUP, channel)
+            await self.flush()
+
+    async def listen(self, channel):
+        while True:
+            message = await self.channel_layer.receive(channel)
+            if message.get('type') == 'notification.scheduled':
+                self.announce(message)
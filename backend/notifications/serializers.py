@@ -1,10 +1,12 @@
 from rest_framework import serializers
 from .models import Notification, NotificationPreference
 from accounts.serializers import UserSerializer
+from alturos_health.eager_loading import EagerLoadingMixin
 
 
-class NotificationSerializer(serializers.ModelSerializer):
+class NotificationSerializer(EagerLoadingMixin, serializers.ModelSerializer):
     recipient = UserSerializer(read_only=True)
+    select_related_fields = ('recipient',)
     
     class Meta:
         model = Notification
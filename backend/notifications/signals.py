@@ -0,0 +1,28 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .counters import adjust_unread
+from .models import Notification
+from .outbox import enqueue
+from .scheduler import schedule_event
+
+
+@receiver(post_save, sender=Notification)
+def notification_scheduled(sender, instance, created, **kwargs):
+    if created and instance.scheduled_for and not instance.is_sent:
+        enqueue([schedule_event(instance)])
+
+
+@receiver(post_save, sender=Notification)
+def notification_read_state_changed(sender, instance, created, **kwargs):
+    loaded = None if created else getattr(instance, '_loaded_is_read', None)
+    if created and not instance.is_read:
+        adjust_unread({instance.recipient_id: 1})
+    elif loaded is not None and loaded != instance.is_read:
+        adjust_unread({instance.recipient_id: -1 if instance.is_read else 1})
+    instance._loaded_is_read = instance.is_read
+
+
+@receiver(post_delete, sender=Notification)
+def notification_deleted(sender, instance, **kwargs):
+    if not instance.is_read:
+        adjust_unread({instance.recipient_id: -1})
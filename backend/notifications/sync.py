@@ -0,0 +1,92 @@
+import base64
+import binascii
+import json
+import uuid
+from datetime import timedelta
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.utils import timezone
+from .models import Notification
+
+SNAPSHOT_SIZE = 20  # Latest notifications sent when a client cannot be caught up with a delta
+SYNC_MAX_CHANGES = 200  # Changes replayed as a delta; a bigger gap gets a snapshot instead
+# Changes this recent may still sit in an uncommitted transaction, so cursors never move past them
+SYNC_SETTLE = timedelta(seconds=5)
+NIL_ID = uuid.UUID(int=0)
+
+
+def encode_cursor(updated_at, pk):
+    values = [updated_at.isoformat(), str(pk)]
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode('ascii')
+
+
+def decode_cursor(cursor):
+    """``(updated_at, id)`` from a cursor, or None when it is missing or malformed"""
+    if not cursor:
+        return None
+    try:
+        updated_at, pk = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        updated_at = Notification._meta.get_field('updated_at').to_python(updated_at)
+        pk = Notification._meta.pk.to_python(pk)
+    except (binascii.Error, UnicodeError, ValueError, TypeError, ValidationError):
+        return None
+    if updated_at is None or pk is None:
+        return None
+    return updated_at, pk
+
+
+def settled_cursor(position, now):
+    """Encode ``position``, held back to the settle horizon so late commits are not skipped"""
+    horizon = now - SYNC_SETTLE
+    if position is None or position[0] > horizon:
+        position = (horizon, NIL_ID)
+    return encode_cursor(*position)
+
+
+def sync_payload(notification):
+    return {
+        'id': str(notification.id),
+        'title': notification.title,
+        'message': notification.message,
+        'notification_type': notification.notification_type,
+        'is_read': notification.is_read,
+        'created_at': notification.created_at.isoformat(),
+        'updated_at': notification.updated_at.isoformat(),
+    }
+
+
+def sync_notifications(user_id, cursor=None, now=None):
+    """What a client holding ``cursor`` is missing: ``{'mode', 'notifications', 'cursor'}``.
+
+    With a valid cursor the reply is a delta of every notification created or
+    changed since, oldest change first, read as one range of the
+    ``(recipient, updated_at, id)`` index. Clients upsert these by id. Without
+    a usable cursor, or when more than ``SYNC_MAX_CHANGES`` changed, the reply
+    is a snapshot of the latest ``SNAPSHOT_SIZE`` notifications, newest first,
+    which replaces whatever the client holds. Either way it carries the cursor
+    to send next time. Changes within ``SYNC_SETTLE`` of now may be sent again.
+    """
+    now = now or timezone.now()
+    notifications = Notification.objects.filter(recipient_id=user_id)
+    position = decode_cursor(cursor)
+    if position is not None:
+        updated_at, pk = position
+        changes = list(notifications.filter(
+            Q(updated_at__gt=updated_at) | Q(updated_at=updated_at, id__gt=pk)
+        ).order_by('updated_at', 'id')[:SYNC_MAX_CHANGES + 1])
+        if len(changes) <= SYNC_MAX_CHANGES:
+            if changes:
+                position = (changes[-1].updated_at, changes[-1].id)
+            return {
+                'mode': 'delta',
+                'notifications': [sync_payload(notification) for notification in changes],
+                'cursor': settled_cursor(position, now),
+            }
+
+    snapshot = notifications.order_by('-created_at', '-id')[:SNAPSHOT_SIZE]
+    return {
+        'mode': 'snapshot',
+        'notifications': [sync_payload(notification) for notification in snapshot],
+        # Everything changed before the horizon is either in the snapshot or too old to matter
+        'cursor': settled_cursor(None, now),
+    }
@@ -1,129 +1,92 @@
 from celery import shared_task
-from django.utils import timezone
-from datetime import timedelta
-from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
-import json
 
-from .models import Notification
+from . import counters
+from .outbox import OUTBOX_BATCH_SIZE, channel_event, enqueue, purge_published, relay_pending
+from .reminders import send_due_reminders
 from appointments.models import Appointment
 
 
 @shared_task
 def send_appointment_reminders():
-    """Send appointment reminders 24 hours and 1 hour before appointment"""
-    channel_layer = get_channel_layer()
-    now = timezone.now()
-    
-    # 24-hour reminders
-    tomorrow = now + timedelta(hours=24)
-    appointments_24h = Appointment.objects.filter(
-        scheduled_date=tomorrow.date(),
-        status='confirmed'
-    )
-    
-    for appointment in appointments_24h:
-        # Create notification
-        notification = Notification.objects.create(
-            recipient=appointment.patient,
-            notification_type='appointment_reminder',
-            title='Appointment Reminder',
-            message=f'You have an appointment tomorrow at {appointment.scheduled_time} with Dr. {appointment.doctor.user.get_full_name()}',
-            delivery_method='push'
-        )
-        
-        # Send real-time notification
-        async_to_sync(channel_layer.group_send)(
-            f"user_{appointment.patient.id}",
-            {
-                'type': 'notification_message',
-                'notification': {
-                    'id': str(notification.id),
-                    'title': notification.title,
-                    'message': notification.message,
-                    'type': notification.notification_type,
-                    'created_at': notification.created_at.isoformat()
-                }
-            }
-        )
-    
-    # 1-hour reminders
-    one_hour_later = now + timedelta(hours=1)
-    appointments_1h = Appointment.objects.filter(
-        scheduled_date=one_hour_later.date(),
-        scheduled_time__hour=one_hour_later.hour,
-        status='confirmed'
-    )
-    
-    for appointment in appointments_1h:
-        # Create notification
-        notification = Notification.objects.create(
-            recipient=appointment.patient,
-            notification_type='appointment_reminder',
-            title='Appointment Starting Soon',
-            message=f'Your appointment with Dr. {appointment.doctor.user.get_full_name()} starts in 1 hour',
-            delivery_method='push'
-        )
-        
-        # Send real-time notification
-        async_to_sync(channel_layer.group_send)(
-            f"user_{appointment.patient.id}",
-            {
-                'type': 'notification_message',
-                'notification': {
-                    'id': str(notification.id),
-                    'title': notification.title,
-                    'message': notification.message,
-                    'type': notification.notification_type,
-                    'created_at': notification.created_at.isoformat()
-                }
-            }
-        )
+    """Send the 24-hour and 1-hour reminders due in this hour's window, each exactly once"""
+    return send_due_reminders()
 
 
 @shared_task
 def send_notification_to_user(user_id, notification_data):
     """Send real-time notification to specific user"""
-    channel_layer = get_channel_layer()
-    
-    async_to_sync(channel_layer.group_send)(
-        f"user_{user_id}",
-        {
-            'type': 'notification_message',
-            'notification': notification_data
-        }
-    )
+    enqueue([channel_event(f"user_{user_id}", {
+        'type': 'notification_message',
+        'notification': notification_data
+    })])
 
 
 @shared_task
 def broadcast_appointment_update(appointment_id, status, updated_by_id):
     """Broadcast appointment status updates to relevant users"""
-    channel_layer = get_channel_layer()
-    
     try:
-        appointment = Appointment.objects.get(id=appointment_id)
-        
-        # Notify patient
-        async_to_sync(channel_layer.group_send)(
-            f"appointments_{appointment.patient.id}",
-            {
-                'type': 'appointment_status_update',
-                'appointment_id': str(appointment_id),
-                'status': status,
-                'updated_by': updated_by_id
-            }
-        )
-        
-        # Notify doctor
-        async_to_sync(channel_layer.group_send)(
-            f"appointments_{appointment.doctor.user.id}",
-            {
-                'type': 'appointment_status_update',
-                'appointment_id': str(appointment_id),
-                'status': status,
-                'updated_by': updated_by_id
-            }
-        )
-        
+        appointment = Appointment.objects.select_related('doctor').get(id=appointment_id)
     except Appointment.DoesNotExist:
-        pass
+        return
+    
+    appointment.status = status
+    enqueue(appointment_status_events([appointment], updated_by_id))
+
+
+def notification_payload(notification):
+    return {
+        'id': str(notification.id),
+        'title': notification.title,
+        'message': notification.message,
+        'type': notification.notification_type,
+        'created_at': notification.created_at.isoformat()
+    }
+
+
+def notification_events(notifications):
+    """Outbox events pushing new notifications to their recipients"""
+    return [
+        channel_event(f"user_{notification.recipient_id}", {
+            'type': 'notification_message',
+            'notification': notification_payload(notification)
+        }, key=f'notification:{notification.id}')
+        for notification in notifications
+    ]
+
+
+def appointment_status_events(appointments, updated_by_id):
+    """Outbox events telling both parties of each appointment about its new status, on their user groups.
+
+    The key includes ``updated_at``, so a re-sent copy of the same change
+    publishes once while a later change to the same status still goes out.
+    """
+    events = []
+    for appointment in appointments:
+        message = {
+            'type': 'appointment_status_update',
+            'appointment_id': str(appointment.id),
+            'status': appointment.status,
+            'updated_by': str(updated_by_id)
+        }
+        change = f'{appointment.id}:{appointment.status}:{appointment.updated_at.isoformat()}'
+        for user_id in (appointment.patient_id, appointment.doctor.user_id):
+            events.append(channel_event(f"user_{user_id}", message, key=f'status:{change}:{user_id}'))
+    return events
+
+
+@shared_task
+def relay_outbox(batch_size=OUTBOX_BATCH_SIZE):
+    """Publish pending outbox events to the channel layer and Celery"""
+    return relay_pending(batch_size)
+
+
+@shared_task
+def purge_outbox():
+    """Delete published outbox events past the retention window"""
+    return purge_published()
+
+
+@shared_task
+def reconcile_unread_counts():
+    """Correct any drift in the cached unread counters"""
+    return counters.reconcile_unread_counts()
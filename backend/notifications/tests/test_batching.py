@@ -0,0 +1,104 @@
+import asyncio
+import json
+import pytest
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from asgiref.testing import ApplicationCommunicator
+from notifications.batching import BatchedSendMixin
+from notifications.consumers import AppointmentConsumer
+
+
+class SlowClient(BatchedSendMixin):
+    batch_interval = 0.01
+    batch_max_events = 3
+    batch_max_buffer = 5
+
+    def __init__(self, query_string=b'protocol=batch', delay=0):
+        self.scope = {'query_string': query_string}
+        self.delay = delay
+        self.frames = []
+        self.setup_batching()
+
+    async def send(self, text_data):
+        await asyncio.sleep(self.delay)
+        self.frames.append(json.loads(text_data))
+
+
+async def settle(client):
+    while client.flush_task is not None and not client.flush_task.done():
+        await asyncio.sleep(0.01)
+
+
+def test_plain_protocol_sends_one_frame_per_event():
+    async def run():
+        client = SlowClient(query_string=b'')
+        await client.send_event({'type': 'a'})
+        await client.send_event({'type': 'b'})
+        return client.frames
+
+    assert async_to_sync(run)() == [{'type': 'a'}, {'type': 'b'}]
+
+
+def test_events_are_coalesced_into_frames():
+    async def run():
+        client = SlowClient()
+        await client.send_event({'type': 'status', 'status': 'confirmed'}, coalesce_key=('status', 1))
+        await client.send_event({'type': 'other'})
+        await client.send_event({'type': 'status', 'status': 'cancelled'}, coalesce_key=('status', 1))
+        await settle(client)
+        return client.frames
+
+    assert async_to_sync(run)() == [[{'type': 'other'}, {'type': 'status', 'status': 'cancelled'}]]
+
+
+def test_slow_client_gets_a_drop_marker_instead_of_a_backlog():
+    async def run():
+        client = SlowClient(delay=0.05)
+        for number in range(3):
+            await client.send_event({'number': number})
+        # The full buffer is flushed at once; the rest arrives while that send is in flight
+        await asyncio.sleep(0.01)
+        for number in range(3, 10):
+            await client.send_event({'number': number})
+        await settle(client)
+        return client.frames
+
+    first, second, third = async_to_sync(run)()
+    assert first == [{'number': 0}, {'number': 1}, {'number': 2}]
+    assert second == [{'type': 'events_dropped', 'count': 2}, {'number': 5}, {'number': 6}]
+    assert third == [{'number': 7}, {'number': 8}, {'number': 9}]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_batched_appointment_socket(patient, settings):
+    settings.CHANNEL_LAYERS = {'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}}
+
+    async def run():
+        communicator = ApplicationCommunicator(AppointmentConsumer.as_asgi(), {
+            'type': 'websocket', 'path': '/ws/appointments/', 'query_string': b'protocol=batch',
+            'headers': [], 'subprotocols': [], 'user': patient,
+        })
+        await communicator.send_input({'type': 'websocket.connect'})
+        assert (await communicator.receive_output(timeout=1))['type'] == 'websocket.accept'
+        layer = get_channel_layer()
+        for status in ('confirmed', 'in_progress', 'completed'):
+            await layer.group_send(f'user_{patient.id}', {
+                'type': 'appointment_status_update',
+                'appointment_id': 'a1',
+                'status': status,
+                'updated_by': 'doctor',
+            })
+        await layer.group_send(f'user_{patient.id}', {
+            'type': 'appointment_reminder',
+            'appointment': {'id': 'a2'},
+            'message': 'Soon',
+        })
+        frame = json.loads((await communicator.receive_output(timeout=1))['text'])
+        assert await communicator.receive_nothing(timeout=0.1)
+        await communicator.send_input({'type': 'websocket.disconnect', 'code': 1000})
+        await communicator.wait(timeout=1)
+        return frame
+
+    frame = async_to_sync(run)()
+    assert [event['type'] for event in frame] == ['status_update', 'reminder']
+    assert frame[0]['status'] == 'completed'
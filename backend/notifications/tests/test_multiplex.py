@@ -0,0 +1,96 @@
+import json
+import pytest
+from asgiref.sync import async_to_sync
+from asgiref.testing import ApplicationCommunicator
+from channels.layers import get_channel_layer
+from notifications.consumers import MultiplexConsumer, NotificationConsumer
+
+STATUS_EVENT = {'type': 'appointment_status_update', 'appointment_id': 'a1', 'status': 'confirmed',
+                'updated_by': 'doctor'}
+NOTIFICATION_EVENT = {'type': 'notification_message', 'notification': {'id': 'n1', 'title': 'Hello'},
+                      'event_id': 'notification:n1'}
+
+
+@pytest.fixture(autouse=True)
+def in_memory_layer(settings):
+    settings.CHANNEL_LAYERS = {'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}}
+
+
+def open_socket(consumer, user, query_string=b''):
+    return ApplicationCommunicator(consumer.as_asgi(), {
+        'type': 'websocket', 'path': '/ws/stream/', 'query_string': query_string,
+        'headers': [], 'subprotocols': [], 'user': user,
+    })
+
+
+async def connect(communicator):
+    await communicator.send_input({'type': 'websocket.connect'})
+    assert (await communicator.receive_output(timeout=1))['type'] == 'websocket.accept'
+
+
+async def receive(communicator):
+    return json.loads((await communicator.receive_output(timeout=1))['text'])
+
+
+async def send(communicator, content):
+    await communicator.send_input({'type': 'websocket.receive', 'text': json.dumps(content)})
+
+
+async def close(communicator):
+    await communicator.send_input({'type': 'websocket.disconnect', 'code': 1000})
+    await communicator.wait(timeout=1)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_streams_share_one_socket_and_one_group(patient):
+    layer = get_channel_layer()
+    group = f'user_{patient.id}'
+
+    async def run():
+        communicator = open_socket(MultiplexConsumer, patient, b'streams=notifications')
+        await connect(communicator)
+        assert await receive(communicator) == {'stream': 'notifications',
+                                               'payload': {'type': 'unread_count', 'count': 0}}
+        assert len(layer.groups[group]) == 1
+
+        # Not subscribed to appointments yet
+        await layer.group_send(group, STATUS_EVENT)
+        assert await communicator.receive_nothing(timeout=0.1)
+
+        await send(communicator, {'type': 'subscribe', 'streams': ['appointments', 'unknown']})
+        assert await receive(communicator) == {'type': 'subscriptions', 'streams': ['appointments', 'notifications']}
+        await layer.group_send(group, STATUS_EVENT)
+        frame = await receive(communicator)
+        assert frame['stream'] == 'appointments' and frame['payload']['status'] == 'confirmed'
+
+        await send(communicator, {'stream': 'notifications', 'payload': {'type': 'get_notifications'}})
+        frame = await receive(communicator)
+        assert frame['stream'] == 'notifications' and frame['payload']['type'] == 'notifications_list'
+
+        await send(communicator, {'type': 'unsubscribe', 'streams': ['notifications']})
+        assert await receive(communicator) == {'type': 'subscriptions', 'streams': ['appointments']}
+        await layer.group_send(group, NOTIFICATION_EVENT)
+        assert await communicator.receive_nothing(timeout=0.1)
+
+        await close(communicator)
+        assert group not in layer.groups
+
+    async_to_sync(run)()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_single_stream_sockets_drop_other_streams(patient):
+    layer = get_channel_layer()
+
+    async def run():
+        communicator = open_socket(NotificationConsumer, patient)
+        await connect(communicator)
+        assert await receive(communicator) == {'type': 'unread_count', 'count': 0}
+
+        await layer.group_send(f'user_{patient.id}', STATUS_EVENT)
+        await layer.group_send(f'user_{patient.id}', NOTIFICATION_EVENT)
+        frame = await receive(communicator)
+        assert frame == {'type': 'new_notification', 'notification': NOTIFICATION_EVENT['notification']}
+        await close(communicator)
+
+    async_to_sync(run)()
@@ -0,0 +1,135 @@
+import pytest
+from datetime import time, timedelta
+from unittest import mock
+from django.db import transaction
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from accounts.models import User
+from appointments.models import Appointment
+from appointments.services import change_appointment_status
+from notifications.models import Notification, OutboxEvent
+from notifications.outbox import (
+    CLAIM_LEASE, channel_event, claim_batch, enqueue, outbox_metrics, relay_batch, relay_pending, task_event
+)
+from notifications.tasks import appointment_status_events, send_appointment_reminders
+
+
+@pytest.fixture
+def layer():
+    layer = mock.Mock()
+    layer.group_send = mock.AsyncMock()
+    with mock.patch('notifications.outbox.get_channel_layer', return_value=layer):
+        yield layer
+
+
+@pytest.mark.django_db
+def test_enqueue_drops_duplicate_keys():
+    enqueue([channel_event('user_1', {'type': 'a'}, key='k1')])
+    enqueue([channel_event('user_1', {'type': 'a'}, key='k1'), channel_event('user_2', {'type': 'b'}, key='k2')])
+    assert list(OutboxEvent.objects.values_list('idempotency_key', flat=True)) == ['k1', 'k2']
+
+
+@pytest.mark.django_db
+def test_events_are_discarded_with_their_transaction():
+    with pytest.raises(RuntimeError):
+        with transaction.atomic():
+            enqueue([channel_event('user_1', {'type': 'a'})])
+            raise RuntimeError
+    assert not OutboxEvent.objects.exists()
+
+
+@pytest.mark.django_db
+def test_relay_publishes_channel_and_task_events(layer):
+    enqueue([
+        channel_event('user_1', {'type': 'notification_message', 'notification': {}}, key='n1'),
+        task_event('appointments.tasks.generate_qr_codes', args=[['abc']], key='qr:abc'),
+    ])
+    with mock.patch('notifications.outbox.current_app.send_task') as send_task:
+        assert relay_batch() == (2, 0)
+
+    layer.group_send.assert_awaited_once_with('user_1', {'type': 'notification_message', 'notification': {},
+                                                         'event_id': 'n1'})
+    send_task.assert_called_once_with('appointments.tasks.generate_qr_codes', args=[['abc']], kwargs={},
+                                      task_id='qr:abc')
+    assert not OutboxEvent.objects.filter(published_at__isnull=True).exists()
+    assert relay_batch() == (0, 0)
+
+
+@pytest.mark.django_db
+def test_claimed_events_are_leased_to_one_relay(layer):
+    enqueue([channel_event('user_1', {'type': 'a'}, key='k1')])
+    now = timezone.now()
+    assert [event.idempotency_key for event in claim_batch(now=now)] == ['k1']
+    # Claimed but not yet settled: other relays skip it until the lease runs out
+    assert claim_batch(now=now) == []
+    assert relay_batch() == (0, 0)
+    assert [event.idempotency_key for event in claim_batch(now=now + CLAIM_LEASE)] == ['k1']
+
+
+@pytest.mark.django_db
+def test_failed_events_back_off_and_are_retried(layer):
+    layer.group_send.side_effect = [ConnectionError('redis down'), None]
+    enqueue([channel_event('user_1', {'type': 'a'}, key='k1')])
+
+    assert relay_pending() == 0
+    event = OutboxEvent.objects.get()
+    assert event.attempts == 1 and 'redis down' in event.last_error
+    assert event.available_at > timezone.now()
+    assert outbox_metrics()['retrying'] == 1
+
+    OutboxEvent.objects.update(available_at=timezone.now())
+    assert relay_pending() == 1
+    assert OutboxEvent.objects.get().published_at is not None
+
+
+@pytest.mark.django_db
+def test_status_change_writes_events_with_the_change(patient, doctor):
+    appointment = Appointment.objects.create(patient=patient, doctor=doctor, appointment_type='consultation',
+                                             scheduled_date=timezone.localdate(), scheduled_time=time(9, 0),
+                                             reason_for_visit='Checkup')
+    notification = change_appointment_status(appointment, 'confirmed', doctor.user)
+
+    destinations = sorted(OutboxEvent.objects.values_list('destination', flat=True))
+    assert destinations == sorted([f'user_{patient.id}', f'user_{patient.id}', f'user_{doctor.user.id}'])
+    assert OutboxEvent.objects.filter(idempotency_key=f'notification:{notification.id}').exists()
+    assert OutboxEvent.objects.filter(idempotency_key__startswith='status:').count() == 2
+
+    # A retried producer writes the same status events again; they are dropped, not published twice
+    enqueue(appointment_status_events([appointment], doctor.user.id))
+    assert OutboxEvent.objects.filter(idempotency_key__startswith='status:').count() == 2
+
+    # Re-entering a status is a new change and is published again
+    Appointment.objects.filter(pk=appointment.pk).update(status='scheduled')
+    change_appointment_status(Appointment.objects.get(pk=appointment.pk), 'confirmed', doctor.user)
+    assert OutboxEvent.objects.filter(idempotency_key__startswith='status:').count() == 4
+
+
+@pytest.mark.django_db
+def test_reminders_go_through_the_outbox(patient, doctor):
+    start = timezone.localtime() + timedelta(hours=24)
+    Appointment.objects.create(patient=patient, doctor=doctor, appointment_type='consultation',
+                               scheduled_date=start.date(), scheduled_time=start.time().replace(second=0, microsecond=0),
+                               reason_for_visit='Checkup', status='confirmed')
+    with mock.patch('notifications.outbox.get_channel_layer') as get_layer:
+        send_appointment_reminders()
+    get_layer.assert_not_called()
+    notification = Notification.objects.get()
+    assert OutboxEvent.objects.get().idempotency_key == f'notification:{notification.id}'
+
+
+@pytest.mark.django_db
+def test_metrics_endpoint_is_admin_only(patient):
+    enqueue([channel_event('user_1', {'type': 'a'})])
+    OutboxEvent.objects.update(created_at=timezone.now() - timedelta(seconds=30))
+
+    client = APIClient()
+    client.force_authenticate(patient)
+    assert client.get(reverse('outbox-metrics')).status_code == 403
+
+    admin = User.objects.create_user(username='admin', password='Password123', user_type='admin')
+    client.force_authenticate(admin)
+    r = client.get(reverse('outbox-metrics'))
+    assert r.status_code == 200
+    assert r.data['pending'] == 1
+    assert r.data['lag_seconds'] >= 30
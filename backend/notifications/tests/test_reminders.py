@@ -0,0 +1,121 @@
+import pytest
+from datetime import datetime, time, timedelta
+from django.utils import timezone
+from appointments.models import Appointment
+from notifications.models import AppointmentReminder, Notification, OutboxEvent
+from notifications.reminders import claim_reminders, due_appointments, send_due_reminders, send_reminder_batch
+
+
+def at(day, hour, minute=0):
+    return timezone.make_aware(datetime.combine(day, time(hour, minute)))
+
+
+@pytest.fixture
+def day():
+    return timezone.localdate() + timedelta(days=3)
+
+
+def book(patient, doctor, day, hour, minute=0, status='confirmed'):
+    return Appointment.objects.create(patient=patient, doctor=doctor, appointment_type='consultation',
+                                      scheduled_date=day, scheduled_time=time(hour, minute),
+                                      reason_for_visit='Checkup', status=status)
+
+
+@pytest.mark.django_db
+def test_hourly_runs_send_each_reminder_exactly_once(patient, doctor, day):
+    morning = book(patient, doctor, day, 9, 30)
+    book(patient, doctor, day, 15)
+    book(patient, doctor, day, 11, status='scheduled')
+
+    # A full day of hourly runs, each a few seconds late
+    for hour in range(24):
+        send_due_reminders(at(day - timedelta(days=1), hour) + timedelta(seconds=20))
+    for hour in range(24):
+        send_due_reminders(at(day, hour) + timedelta(seconds=20))
+
+    reminders = AppointmentReminder.objects.all()
+    assert reminders.filter(kind='day_before').count() == 2
+    assert reminders.filter(kind='hour_before').count() == 2
+    assert Notification.objects.count() == 4
+    assert OutboxEvent.objects.count() == 4
+    assert not reminders.filter(notification__isnull=True).exists()
+    day_before = reminders.get(appointment=morning, kind='day_before')
+    assert '09:30' in day_before.notification.message
+
+
+@pytest.mark.django_db
+def test_window_is_exact_and_ends_at_midnight(patient, doctor, day):
+    late = book(patient, doctor, day, 23, 30)
+    after_midnight = book(patient, doctor, day + timedelta(days=1), 0, 15)
+    book(patient, doctor, day, 22, 59)
+
+    assert set(due_appointments('hour_before', at(day, 22, 40))) == {late}
+    assert set(due_appointments('hour_before', at(day, 23, 5))) == {after_midnight}
+    assert set(due_appointments('day_before', at(day - timedelta(days=1), 23, 5))) == {late}
+    assert set(due_appointments('day_before', at(day, 0, 5))) == {after_midnight}
+
+
+@pytest.mark.django_db
+def test_concurrent_runs_claim_disjoint_reminders(patient, doctor, day):
+    appointment = book(patient, doctor, day, 10)
+    assert send_reminder_batch('day_before', [appointment], 'run-a') == 1
+    assert claim_reminders('day_before', [appointment.id], 'run-b') == {}
+    assert Notification.objects.get().id == AppointmentReminder.objects.get().notification_id
+    Notification.objects.all().delete()
+
+    assert send_due_reminders(at(day - timedelta(days=1), 10)) == {'day_before': 0, 'hour_before': 0}
+    assert not Notification.objects.exists()
+
+
+def seed_window(patients, doctor, start, count):
+    """Bulk-insert confirmed appointments spread over the hour starting at ``start``"""
+    Appointment.objects.bulk_create([
+        Appointment(appointment_id=f'B{n:07d}', patient=patients[n % len(patients)], doctor=doctor,
+                    appointment_type='consultation', status='confirmed', reason_for_visit='Checkup',
+                    scheduled_date=start.date(), scheduled_time=(start + timedelta(seconds=n * 3600 // count)).time())
+        for n in range(count)
+    ], batch_size=2000)
+
+
+@pytest.mark.django_db
+def test_query_count_does_not_grow_with_reminders(patient, doctor, day):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    now = at(day - timedelta(days=1), 10)
+    counts = []
+    for count in (5, 50):
+        AppointmentReminder.objects.all().delete()
+        Appointment.objects.all().delete()
+        seed_window([patient], doctor, at(day, 10), count)
+        with CaptureQueriesContext(connection) as context:
+            assert send_due_reminders(now)['day_before'] == count
+        counts.append(len(context.captured_queries))
+    assert counts[0] == counts[1]
+
+
+@pytest.mark.benchmark
+@pytest.mark.django_db
+def test_reminder_pipeline_throughput(patient, doctor, day):
+    import time as clock
+    from unittest import mock
+    from channels.layers import InMemoryChannelLayer
+    from notifications.outbox import relay_pending
+
+    count = 5000
+    seed_window([patient], doctor, at(day, 10), count)
+
+    began = clock.perf_counter()
+    assert send_due_reminders(at(day - timedelta(days=1), 10))['day_before'] == count
+    written = clock.perf_counter() - began
+
+    began = clock.perf_counter()
+    with mock.patch('notifications.outbox.get_channel_layer', return_value=InMemoryChannelLayer()):
+        published = 0
+        while published < count:
+            published += relay_pending()
+    relayed = clock.perf_counter() - began
+
+    # 100,000 reminders must be written and pushed in minutes, not hours
+    projected = (written + relayed) * 100000 / count
+    assert projected < 300, f'100k reminders would take {projected:.0f}s'
@@ -0,0 +1,138 @@
+import asyncio
+import pytest
+import random
+import time
+from datetime import timedelta
+from unittest import mock
+from asgiref.sync import async_to_sync
+from channels.layers import InMemoryChannelLayer
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.utils import timezone
+from notifications.models import Notification, OutboxEvent
+from notifications.scheduler import SCHEDULER_GROUP, DeliveryScheduler, SchedulerLockUnavailable, TimerWheel
+
+
+def test_timer_wheel_fires_every_level_at_its_tick():
+    wheel = TimerWheel(tick=1, slots=4, levels=2, now=0)
+    rng = random.Random(3)
+    dues = [rng.uniform(0, 40) for _ in range(200)]
+    for n, due in enumerate(dues):
+        wheel.add(due, n)
+
+    fired = {}
+    for second in range(1, 42):
+        for n in wheel.advance(second):
+            fired[n] = second
+    # Beyond both levels (16 ticks) timers wait in the overflow and still fire on time
+    assert fired == {n: max(1, int(-(-due // 1))) for n, due in enumerate(dues)}
+    assert wheel.size == 0
+
+
+def test_timer_wheel_returns_expired_items_in_due_order():
+    wheel = TimerWheel(tick=0.1, now=100)
+    wheel.add(100.35, 'b')
+    wheel.add(100.31, 'a')
+    wheel.add(99.0, 'overdue')
+    assert wheel.advance(100.2) == ['overdue']
+    assert wheel.advance(100.4) == ['a', 'b']
+
+
+def make_notification(user, due):
+    return Notification.objects.create(recipient=user, notification_type='system_update', title='Maintenance',
+                                       message='Tonight', scheduled_for=due)
+
+
+@pytest.mark.django_db
+def test_scheduled_notifications_are_announced_through_the_outbox(patient):
+    notification = make_notification(patient, timezone.now() + timedelta(seconds=30))
+    event = OutboxEvent.objects.get()
+    assert event.destination == SCHEDULER_GROUP
+    assert event.payload['id'] == str(notification.id)
+
+
+@pytest.mark.django_db(transaction=True)
+@mock.patch('notifications.tasks.relay_outbox.delay')
+def test_scheduler_delivers_on_time_and_marks_sent_in_batches(wake, patient):
+    layer = InMemoryChannelLayer()
+    overdue = make_notification(patient, timezone.now() - timedelta(minutes=5))
+    soon = make_notification(patient, timezone.now() + timedelta(seconds=0.4))
+    later = make_notification(patient, timezone.now() + timedelta(hours=1))
+
+    async def scenario():
+        inbox = await layer.new_channel()
+        await layer.group_add(f'user_{patient.id}', inbox)
+        scheduler = DeliveryScheduler(layer, lookahead=timedelta(seconds=5), flush_interval=0.2)
+        stop = asyncio.Event()
+        running = asyncio.ensure_future(scheduler.run(stop))
+
+        received = []
+        for _ in range(2):
+            message = await asyncio.wait_for(layer.receive(inbox), timeout=3)
+            received.append((message['notification']['id'], time.time()))
+
+        # Created after the load, due before the next one: announced on the scheduler group
+        await asyncio.sleep(0.1)
+        announced = await asyncio.get_running_loop().run_in_executor(
+            None, make_notification, patient, timezone.now() + timedelta(seconds=0.3)
+        )
+        await layer.group_send(SCHEDULER_GROUP, {'type': 'notification.scheduled', 'id': str(announced.id),
+                                                 'due': announced.scheduled_for.timestamp()})
+        message = await asyncio.wait_for(layer.receive(inbox), timeout=3)
+        received.append((message['notification']['id'], time.time()))
+
+        stop.set()
+        await running
+        return received, announced
+
+    received, announced = async_to_sync(scenario)()
+    assert [notification_id for notification_id, _ in received] == [str(overdue.id), str(soon.id), str(announced.id)]
+    # Never early; how late depends on the machine, so only the order is checked beyond that
+    for notification, (_, at) in zip((soon, announced), received[1:]):
+        assert at >= notification.scheduled_for.timestamp()
+
+    sent = dict(Notification.objects.values_list('id', 'is_sent'))
+    assert sent == {overdue.id: True, soon.id: True, announced.id: True, later.id: False}
+    assert Notification.objects.get(pk=soon.pk).sent_at is not None
+
+
+@pytest.mark.django_db
+def test_rescheduled_notifications_are_not_delivered_early(patient):
+    layer = mock.AsyncMock()
+    start = timezone.now()
+    moved = make_notification(patient, start + timedelta(seconds=1))
+    postponed = make_notification(patient, start + timedelta(seconds=2))
+    cancelled = make_notification(patient, start + timedelta(seconds=1))
+    scheduler = DeliveryScheduler(layer, lookahead=timedelta(seconds=60))
+    scheduler.load(now=start)
+
+    Notification.objects.filter(pk=moved.pk).update(scheduled_for=start + timedelta(seconds=30))
+    Notification.objects.filter(pk=postponed.pk).update(scheduled_for=start + timedelta(hours=1))
+    Notification.objects.filter(pk=cancelled.pk).update(scheduled_for=None)
+    assert async_to_sync(scheduler.dispatch)(now=start.timestamp() + 3) == 0
+    layer.group_send.assert_not_called()
+    # Back on the wheel for its new time; the others wait for a later load or are dropped
+    assert scheduler.tracked == {moved.id}
+
+    assert async_to_sync(scheduler.dispatch)(now=start.timestamp() + 31) == 1
+    assert layer.group_send.call_args.args[1]['notification']['id'] == str(moved.id)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_exclusive_scheduler_stops_when_its_lock_is_lost():
+    layer = InMemoryChannelLayer()
+    scheduler = DeliveryScheduler(layer, lookahead=timedelta(seconds=5), load_interval=0.1, exclusive=True)
+    # Held at start-up, then taken by another scheduler after this one's connection was replaced
+    with mock.patch('notifications.scheduler.acquire_scheduler_lock', side_effect=[True, False]) as acquire:
+        with pytest.raises(SchedulerLockUnavailable):
+            async_to_sync(asyncio.wait_for)(scheduler.run(), timeout=3)
+    assert acquire.call_count == 2
+
+
+@pytest.mark.django_db(transaction=True)
+@mock.patch('notifications.scheduler.acquire_scheduler_lock', return_value=False)
+def test_command_refuses_to_start_beside_another_scheduler(acquire):
+    command = 'notifications.management.commands.run_notification_scheduler'
+    with mock.patch(f'{command}.get_channel_layer', return_value=InMemoryChannelLayer()):
+        with pytest.raises(CommandError, match='Another notification scheduler is running'):
+            call_command('run_notification_scheduler', stdout=mock.Mock())
@@ -0,0 +1,104 @@
+import json
+from datetime import timedelta
+import pytest
+from asgiref.sync import async_to_sync
+from asgiref.testing import ApplicationCommunicator
+from django.db.models import F
+from django.utils import timezone
+from notifications import sync
+from notifications.consumers import NotificationConsumer
+from notifications.counters import mark_all_read, mark_read
+from notifications.models import Notification
+from notifications.sync import sync_notifications
+
+
+def notify(user, title='Hello'):
+    return Notification.objects.create(recipient=user, notification_type='system_update', title=title,
+                                       message='World')
+
+
+def age():
+    """Move every change so far back past the settle horizon"""
+    Notification.objects.update(updated_at=F('updated_at') - timedelta(minutes=1))
+
+
+def later():
+    """A moment past the settle horizon of everything written so far"""
+    return timezone.now() + sync.SYNC_SETTLE + timedelta(seconds=1)
+
+
+@pytest.mark.django_db
+def test_delta_carries_only_new_notifications_and_read_changes(patient, doctor, django_assert_num_queries):
+    first, second = notify(patient, 'First'), notify(patient, 'Second')
+    notify(doctor.user)
+    age()
+    initial = sync_notifications(patient.id)
+    assert initial['mode'] == 'snapshot'
+    assert [item['title'] for item in initial['notifications']] == ['Second', 'First']
+
+    mark_read(patient.id, first.id)
+    third = notify(patient, 'Third')
+    with django_assert_num_queries(1):
+        delta = sync_notifications(patient.id, initial['cursor'], now=later())
+    assert delta['mode'] == 'delta'
+    assert [(item['id'], item['is_read']) for item in delta['notifications']] == [
+        (str(first.id), True), (str(third.id), False)
+    ]
+
+    assert sync_notifications(patient.id, delta['cursor'], now=later())['notifications'] == []
+    mark_all_read(patient.id)
+    caught_up = sync_notifications(patient.id, delta['cursor'], now=later())
+    assert {item['id'] for item in caught_up['notifications']} == {str(second.id), str(third.id)}
+
+
+@pytest.mark.django_db
+def test_cursor_stays_behind_recent_changes(patient):
+    sent = sync_notifications(patient.id)
+    notification = notify(patient)
+    # Not settled yet, so the next sync sends it again rather than risk skipping a late commit
+    for _ in range(2):
+        delta = sync_notifications(patient.id, sent['cursor'])
+        assert [item['id'] for item in delta['notifications']] == [str(notification.id)]
+        sent = delta
+
+
+@pytest.mark.django_db
+def test_large_gaps_and_bad_cursors_fall_back_to_a_snapshot(patient, monkeypatch):
+    cursor = sync_notifications(patient.id)['cursor']
+    for number in range(4):
+        notify(patient, f'N{number}')
+    monkeypatch.setattr(sync, 'SYNC_MAX_CHANGES', 3)
+    monkeypatch.setattr(sync, 'SNAPSHOT_SIZE', 2)
+
+    fallback = sync_notifications(patient.id, cursor, now=later())
+    assert fallback['mode'] == 'snapshot'
+    assert [item['title'] for item in fallback['notifications']] == ['N3', 'N2']
+    for bad in ('not-a-cursor', 'WyJ4Il0=', ''):
+        assert sync_notifications(patient.id, bad)['mode'] == 'snapshot'
+
+
+@pytest.mark.django_db(transaction=True)
+def test_reconnect_with_cursor(patient, settings):
+    settings.CHANNEL_LAYERS = {'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}}
+    notify(patient, 'Seen')
+    age()
+    cursor = sync_notifications(patient.id)['cursor']
+    missed = notify(patient, 'Missed')
+
+    async def reconnect():
+        communicator = ApplicationCommunicator(NotificationConsumer.as_asgi(), {
+            'type': 'websocket', 'path': '/ws/notifications/', 'query_string': f'since={cursor}'.encode(),
+            'headers': [], 'subprotocols': [], 'user': patient,
+        })
+        await communicator.send_input({'type': 'websocket.connect'})
+        assert (await communicator.receive_output(timeout=1))['type'] == 'websocket.accept'
+        frames = [json.loads((await communicator.receive_output(timeout=1))['text']) for _ in range(2)]
+        await communicator.send_input({'type': 'websocket.disconnect', 'code': 1000})
+        await communicator.wait(timeout=1)
+        return frames
+
+    unread, listing = async_to_sync(reconnect)()
+    assert unread == {'type': 'unread_count', 'count': 2}
+    assert listing['type'] == 'notifications_list'
+    assert listing['mode'] == 'delta'
+    assert [item['id'] for item in listing['notifications']] == [str(missed.id)]
@@ -0,0 +1,155 @@
+import pytest
+from unittest import mock
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+from notifications import counters
+from notifications.consumers import NotificationConsumer
+from notifications.counters import (
+    count_unread, counter_key, notifications_created, reconcile_unread_counts, unread_count
+)
+from notifications.models import Notification
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+
+
+@pytest.fixture
+def committing(django_capture_on_commit_callbacks):
+    """Run on_commit callbacks as they would run after a real commit"""
+    def run():
+        return django_capture_on_commit_callbacks(execute=True)
+    return run
+
+
+def notify(user, **kwargs):
+    return Notification.objects.create(recipient=user, notification_type='system_update', title='Hello',
+                                       message='World', **kwargs)
+
+
+def token_client(user):
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}')
+    return client
+
+
+@pytest.mark.django_db
+def test_counter_follows_every_write_path(patient, committing):
+    assert unread_count(patient.id) == 0
+    with committing():
+        first = notify(patient)
+        notify(patient, is_read=True)
+    assert cache.get(counter_key(patient.id)) == 1
+
+    with committing():
+        bulk = Notification.objects.bulk_create([
+            Notification(recipient=patient, notification_type='system_update', title='Bulk', message='x')
+            for _ in range(3)
+        ])
+        notifications_created(bulk)
+    assert unread_count(patient.id) == 4
+
+    client = APIClient()
+    client.force_authenticate(patient)
+    with committing():
+        assert client.post(reverse('mark-notification-read', args=[first.id])).status_code == 200
+        # Marking it again must not count twice
+        assert client.post(reverse('mark-notification-read', args=[first.id])).status_code == 200
+    assert unread_count(patient.id) == 3
+
+    with committing():
+        client.patch(reverse('notification_detail', args=[first.id]), {'is_read': False}, format='json')
+    assert unread_count(patient.id) == 4
+    with committing():
+        bulk[0].delete()
+    assert unread_count(patient.id) == 3
+
+    with committing():
+        async_to_sync(consumer_for(patient).mark_notification_read)(str(bulk[1].id))
+    assert unread_count(patient.id) == 2
+
+    with committing():
+        client.post(reverse('mark-all-notifications-read'))
+    assert cache.get(counter_key(patient.id)) == 0
+    assert Notification.objects.filter(is_read=False).count() == 0
+
+
+def consumer_for(user):
+    consumer = NotificationConsumer()
+    consumer.user = user
+    return consumer
+
+
+@pytest.mark.django_db
+def test_endpoint_skips_the_database_on_a_hit(patient, django_assert_num_queries):
+    notify(patient)
+    client = token_client(patient)
+    url = reverse('notification-unread-count')
+    with django_assert_num_queries(1):
+        assert client.get(url).data == {'count': 1}
+    with django_assert_num_queries(0):
+        assert client.get(url).data == {'count': 1}
+    assert APIClient().get(url).status_code == 401
+
+
+@pytest.mark.django_db
+def test_reconciliation_repairs_drift(patient, doctor, django_assert_num_queries):
+    for _ in range(3):
+        notify(patient)
+    notify(doctor.user)
+    cache.set(counter_key(patient.id), 7)
+    cache.set(counter_key(doctor.user.id), 1)
+
+    # Only the drifted counter is dropped, and the next read counts it again
+    assert reconcile_unread_counts() == 1
+    assert cache.get(counter_key(patient.id)) is None
+    assert cache.get(counter_key(doctor.user.id)) == 1
+    assert unread_count(patient.id) == 3
+    with django_assert_num_queries(0):
+        assert async_to_sync(consumer_for(patient).get_unread_count)() == 3
+
+    # A user who read everything is reset too, not left with a stale counter
+    Notification.objects.filter(recipient=doctor.user).update(is_read=True, updated_at=timezone.now())
+    assert reconcile_unread_counts() == 1
+    assert cache.get(counter_key(doctor.user.id)) is None
+
+
+@pytest.mark.django_db
+def test_reconciliation_does_not_overwrite_a_later_increment(patient, committing):
+    notify(patient)
+    assert unread_count(patient.id) == 1
+    real_drop = counters._drop_drifted
+
+    def drop_after_a_commit(counts):
+        # A notification commits after reconciliation counted but before it touches the cache
+        with committing():
+            notify(patient)
+        return real_drop(counts)
+
+    with mock.patch('notifications.counters._drop_drifted', side_effect=drop_after_a_commit):
+        reconcile_unread_counts()
+    assert unread_count(patient.id) == 2
+
+
+@pytest.mark.django_db
+def test_commit_racing_a_cache_miss_is_not_lost(patient, committing):
+    real_count = count_unread
+    raced = []
+
+    def count_then_commit(user_id):
+        count = real_count(user_id)
+        if not raced:
+            # A notification commits after the reader counted but before it stores the count
+            raced.append(True)
+            with committing():
+                notify(patient)
+        return count
+
+    with mock.patch('notifications.counters.count_unread', side_effect=count_then_commit):
+        assert unread_count(patient.id) == 1
+    assert cache.get(counter_key(patient.id)) == 1
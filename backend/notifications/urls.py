@@ -6,5 +6,7 @@ urlpatterns = [
     path('<uuid:pk>/', views.NotificationDetailView.as_view(), name='notification_detail'),
     path('<uuid:notification_id>/read/', views.mark_notification_read, name='mark-notification-read'),
     path('mark-all-read/', views.mark_all_read, name='mark-all-notifications-read'),
+    path('unread-count/', views.unread_notification_count, name='notification-unread-count'),
+    path('outbox/metrics/', views.outbox_metrics_view, name='outbox-metrics'),
     path('create/', views.create_notification, name='create-notification'),
 ]
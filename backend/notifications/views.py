@@ -1,19 +1,26 @@
 from rest_framework import generics, permissions, status
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, authentication_classes, permission_classes
 from rest_framework.response import Response
+from rest_framework_simplejwt.authentication import JWTStatelessUserAuthentication
+from . import counters
 from .models import Notification, NotificationPreference
+from .outbox import outbox_metrics
 from .serializers import NotificationSerializer, NotificationPreferenceSerializer
+from alturos_health.eager_loading import EagerLoadingViewMixin
+from alturos_health.pagination import KeysetPagination
 
 
-class NotificationListView(generics.ListAPIView):
+class NotificationListView(EagerLoadingViewMixin, generics.ListAPIView):
     serializer_class = NotificationSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
+    keyset_ordering = ('-created_at', '-id')
     
     def get_queryset(self):
         return Notification.objects.filter(recipient=self.request.user).order_by('-created_at')
 
 
-class NotificationDetailView(generics.RetrieveUpdateDestroyAPIView):
+class NotificationDetailView(EagerLoadingViewMixin, generics.RetrieveUpdateDestroyAPIView):
     serializer_class = NotificationSerializer
     permission_classes = [permissions.IsAuthenticated]
     
@@ -24,28 +31,26 @@ class NotificationDetailView(generics.RetrieveUpdateDestroyAPIView):
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
 def mark_notification_read(request, notification_id):
-    try:
-        notification = Notification.objects.get(
-            id=notification_id,
-            recipient=request.user
-        )
-        notification.is_read = True
-        notification.save()
-        return Response({'message': 'Notification marked as read'})
-    except Notification.DoesNotExist:
+    if not counters.mark_read(request.user.id, notification_id):
         return Response({'error': 'Notification not found'}, status=status.HTTP_404_NOT_FOUND)
+    return Response({'message': 'Notification marked as read'})
 
 
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
 def mark_all_read(request):
-    Notification.objects.filter(
-        recipient=request.user,
-        is_read=False
-    ).update(is_read=True)
+    counters.mark_all_read(request.user.id)
     return Response({'message': 'All notifications marked as read'})
 
 
+@api_view(['GET'])
+@authentication_classes([JWTStatelessUserAuthentication])
+@permission_classes([permissions.IsAuthenticated])
+def unread_notification_count(request):
+    """Badge count from the cached counter; the user is taken from the token, not loaded"""
+    return Response({'count': counters.unread_count(request.user.id)})
+
+
 class NotificationPreferenceView(generics.RetrieveUpdateAPIView):
     serializer_class = NotificationPreferenceSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -69,3 +74,12 @@ def create_notification(request):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def outbox_metrics_view(request):
+    """Outbox backlog and relay lag for monitoring"""
+    if request.user.user_type != 'admin' and not request.user.is_staff:
+        return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
+    return Response(outbox_metrics())
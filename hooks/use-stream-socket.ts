@@ -0,0 +1,195 @@
+"use client"
+
+import { useEffect, useState } from "react"
+
+export type StreamName = "notifications" | "appointments"
+
+type Listener = (payload: any) => void
+
+interface Subscription {
+  listener: Listener
+  // Cursor the stream resumes from after a reconnect
+  getSince?: () => string | null
+}
+
+// One socket per tab carries every stream; hooks subscribe to the streams they need
+const subscriptions: Record<StreamName, Set<Subscription>> = {
+  notifications: new Set(),
+  appointments: new Set(),
+}
+const connectionListeners = new Set<(connected: boolean) => void>()
+let socket: WebSocket | null = null
+let reconnectTimer: ReturnType<typeof setTimeout> | null = null
+let refreshing = false
+// Set once the access token has been refreshed for a handshake that has not succeeded yet
+let refreshedToken = false
+
+// Close code the server sends when the access token expires
+const TOKEN_EXPIRED_CLOSE_CODE = 4001
+
+function activeStreams() {
+  return (Object.keys(subscriptions) as StreamName[]).filter((stream) => subscriptions[stream].size > 0)
+}
+
+function setConnected(connected: boolean) {
+  connectionListeners.forEach((listener) => listener(connected))
+}
+
+function sendSubscribe(streams: StreamName[]) {
+  if (!socket || socket.readyState !== WebSocket.OPEN || streams.length === 0) return
+  const since = streams
+    .flatMap((stream) => Array.from(subscriptions[stream]))
+    .map((subscription) => subscription.getSince?.())
+    .find((cursor) => cursor)
+  socket.send(JSON.stringify({ type: "subscribe", streams, since: since ?? undefined }))
+}
+
+function scheduleReconnect(delay = 3000) {
+  if (reconnectTimer || activeStreams().length === 0) return
+  reconnectTimer = setTimeout(() => {
+    reconnectTimer = null
+    connect()
+  }, delay)
+}
+
+// "ok" with a new access token stored, "rejected" when the refresh token is no good, "failed" when unreachable
+async function refreshAccessToken(): Promise<"ok" | "rejected" | "failed"> {
+  const refresh = localStorage.getItem("refresh_token")
+  if (!refresh) return "rejected"
+  try {
+    const response = await fetch("/api/auth/token/refresh/", {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify({ refresh }),
+    })
+    if (!response.ok) return response.status >= 500 ? "failed" : "rejected"
+    const data = await response.json()
+    localStorage.setItem("access_token", data.access)
+    // Refresh tokens rotate, and the old one is blacklisted
+    if (data.refresh) localStorage.setItem("refresh_token", data.refresh)
+    try {
+      document.cookie = `access_token=${data.access}; Path=/; Max-Age=${60 * 60 * 4}; SameSite=Lax`
+    } catch (_) {
+      // ignore if not in browser
+    }
+    return "ok"
+  } catch (error) {
+    return "failed"
+  }
+}
+
+async function refreshAndReconnect() {
+  refreshing = true
+  const result = await refreshAccessToken()
+  refreshing = false
+  if (result === "ok") {
+    refreshedToken = true
+    scheduleReconnect(0)
+  } else if (result === "failed") {
+    scheduleReconnect()
+  } else {
+    // The session is over; the next login starts a socket again
+    console.log("[v0] Stream WebSocket token refresh rejected, not reconnecting")
+  }
+}
+
+function connect() {
+  if (socket || reconnectTimer || refreshing) return
+  const token = localStorage.getItem("access_token")
+  if (!token) return
+
+  const ws = new WebSocket(`ws://localhost:8000/ws/stream/?token=${token}`)
+  socket = ws
+  let opened = false
+
+  ws.onopen = () => {
+    opened = true
+    refreshedToken = false
+    console.log("[v0] Stream WebSocket connected")
+    setConnected(true)
+    sendSubscribe(activeStreams())
+  }
+
+  ws.onmessage = (event) => {
+    try {
+      const data = JSON.parse(event.data)
+      const stream = data.stream as StreamName
+      if (stream in subscriptions) {
+        subscriptions[stream].forEach((subscription) => subscription.listener(data.payload))
+      }
+    } catch (error) {
+      console.error("[v0] Error parsing stream WebSocket message:", error)
+    }
+  }
+
+  ws.onclose = (event) => {
+    console.log("[v0] Stream WebSocket disconnected")
+    if (socket === ws) socket = null
+    setConnected(false)
+    if (activeStreams().length === 0) return
+
+    if (event.code === TOKEN_EXPIRED_CLOSE_CODE || !opened) {
+      // An expired token, or a handshake the server rejected. A freshly refreshed token that is
+      // rejected too will not be accepted by retrying, so give up rather than loop.
+      if (!opened && refreshedToken) {
+        console.log("[v0] Stream WebSocket rejected after a token refresh, not reconnecting")
+        refreshedToken = false
+        return
+      }
+      refreshAndReconnect()
+      return
+    }
+
+    // Attempt to reconnect after 3 seconds while anything is still subscribed
+    scheduleReconnect()
+  }
+
+  ws.onerror = (error) => {
+    console.error("[v0] Stream WebSocket error:", error)
+  }
+}
+
+export function subscribeStream(stream: StreamName, listener: Listener, getSince?: () => string | null) {
+  const subscription: Subscription = { listener, getSince }
+  const first = subscriptions[stream].size === 0
+  subscriptions[stream].add(subscription)
+  if (!socket) {
+    connect()
+  } else if (first) {
+    sendSubscribe([stream])
+  }
+
+  return () => {
+    subscriptions[stream].delete(subscription)
+    if (subscriptions[stream].size > 0) return
+    if (activeStreams().length === 0) {
+      if (reconnectTimer) {
+        clearTimeout(reconnectTimer)
+        reconnectTimer = null
+      }
+      socket?.close()
+      socket = null
+    } else if (socket && socket.readyState === WebSocket.OPEN) {
+      socket.send(JSON.stringify({ type: "unsubscribe", streams: [stream] }))
+    }
+  }
+}
+
+export function sendToStream(stream: StreamName, payload: Record<string, unknown>) {
+  if (!socket || socket.readyState !== WebSocket.OPEN) return false
+  socket.send(JSON.stringify({ stream, payload }))
+  return true
+}
+
+export function useStreamConnected() {
+  const [isConnected, setIsConnected] = useState(socket?.readyState === WebSocket.OPEN)
+
+  useEffect(() => {
+    connectionListeners.add(setIsConnected)
+    return () => {
+      connectionListeners.delete(setIsConnected)
+    }
+  }, [])
+
+  return isConnected
+}
@@ -1,6 +1,7 @@
 "use client"
 
-import { useEffect, useState, useCallback } from "react"
+import { useEffect, useState, useCallback, useRef } from "react"
+import { sendToStream, subscribeStream, useStreamConnected } from "@/hooks/use-stream-socket"
 
 interface Notification {
   id: string
@@ -16,120 +17,79 @@ interface WebSocketMessage {
   notification?: Notification
   count?: number
   notifications?: Notification[]
+  mode?: "delta" | "snapshot"
+  cursor?: string
+}
+
+// Upsert changed notifications by id, keeping the newest first
+function mergeNotifications(current: Notification[], changes: Notification[]) {
+  const byId = new Map(current.map((notification) => [notification.id, notification]))
+  changes.forEach((notification) => byId.set(notification.id, notification))
+  return Array.from(byId.values()).sort((a, b) => b.created_at.localeCompare(a.created_at))
 }
 
 export function useWebSocketNotifications() {
-  const [socket, setSocket] = useState<WebSocket | null>(null)
   const [notifications, setNotifications] = useState<Notification[]>([])
   const [unreadCount, setUnreadCount] = useState(0)
-  const [isConnected, setIsConnected] = useState(false)
-
-  const connect = useCallback(() => {
-    const token = localStorage.getItem("access_token")
-    if (!token) return
-
-    const wsUrl = `ws://localhost:8000/ws/notifications/?token=${token}`
-    const ws = new WebSocket(wsUrl)
-
-    ws.onopen = () => {
-      console.log("[v0] WebSocket connected")
-      setIsConnected(true)
-      setSocket(ws)
-    }
+  const isConnected = useStreamConnected()
+  // Last sync cursor, so a reconnect only fetches what changed while offline
+  const cursorRef = useRef<string | null>(null)
 
-    ws.onmessage = (event) => {
-      try {
-        const data: WebSocketMessage = JSON.parse(event.data)
-        console.log("[v0] WebSocket message received:", data)
-
-        switch (data.type) {
-          case "new_notification":
-            if (data.notification) {
-              setNotifications((prev) => [data.notification!, ...prev])
-              setUnreadCount((prev) => prev + 1)
-
-              // Show browser notification if permission granted
-              if (Notification.permission === "granted") {
-                new Notification(data.notification.title, {
-                  body: data.notification.message,
-                  icon: "/favicon.ico",
-                })
-              }
-            }
-            break
-
-          case "unread_count":
-            if (typeof data.count === "number") {
-              setUnreadCount(data.count)
-            }
-            break
-
-          case "notifications_list":
-            if (data.notifications) {
-              setNotifications(data.notifications)
+  useEffect(() => {
+    const handleMessage = (data: WebSocketMessage) => {
+      console.log("[v0] Notification stream message received:", data)
+
+      switch (data.type) {
+        case "new_notification":
+          if (data.notification) {
+            const notification = data.notification
+            setNotifications((prev) => [notification, ...prev])
+            setUnreadCount((prev) => prev + 1)
+
+            // Show browser notification if permission granted
+            if (Notification.permission === "granted") {
+              new Notification(notification.title, {
+                body: notification.message,
+                icon: "/favicon.ico",
+              })
             }
-            break
-        }
-      } catch (error) {
-        console.error("[v0] Error parsing WebSocket message:", error)
+          }
+          break
+
+        case "unread_count":
+          if (typeof data.count === "number") {
+            setUnreadCount(data.count)
+          }
+          break
+
+        case "notifications_list":
+          if (data.notifications) {
+            const changes = data.notifications
+            setNotifications((prev) => (data.mode === "delta" ? mergeNotifications(prev, changes) : changes))
+          }
+          if (data.cursor) {
+            cursorRef.current = data.cursor
+          }
+          break
       }
     }
 
-    ws.onclose = () => {
-      console.log("[v0] WebSocket disconnected")
-      setIsConnected(false)
-      setSocket(null)
-
-      // Attempt to reconnect after 3 seconds
-      setTimeout(() => {
-        connect()
-      }, 3000)
-    }
-
-    ws.onerror = (error) => {
-      console.error("[v0] WebSocket error:", error)
-    }
-
-    return ws
+    return subscribeStream("notifications", handleMessage, () => cursorRef.current)
   }, [])
 
-  const disconnect = useCallback(() => {
-    if (socket) {
-      socket.close()
-      setSocket(null)
-      setIsConnected(false)
+  const markAsRead = useCallback((notificationId: string) => {
+    if (sendToStream("notifications", { type: "mark_read", notification_id: notificationId })) {
+      // Update local state
+      setNotifications((prev) =>
+        prev.map((notif) => (notif.id === notificationId ? { ...notif, is_read: true } : notif)),
+      )
+      setUnreadCount((prev) => Math.max(0, prev - 1))
     }
-  }, [socket])
-
-  const markAsRead = useCallback(
-    (notificationId: string) => {
-      if (socket && socket.readyState === WebSocket.OPEN) {
-        socket.send(
-          JSON.stringify({
-            type: "mark_read",
-            notification_id: notificationId,
-          }),
-        )
-
-        // Update local state
-        setNotifications((prev) =>
-          prev.map((notif) => (notif.id === notificationId ? { ...notif, is_read: true } : notif)),
-        )
-        setUnreadCount((prev) => Math.max(0, prev - 1))
-      }
-    },
-    [socket],
-  )
+  }, [])
 
   const requestNotifications = useCallback(() => {
-    if (socket && socket.readyState === WebSocket.OPEN) {
-      socket.send(
-        JSON.stringify({
-          type: "get_notifications",
-        }),
-      )
-    }
-  }, [socket])
+    sendToStream("notifications", { type: "get_notifications", since: cursorRef.current ?? undefined })
+  }, [])
 
   // Request browser notification permission
   const requestNotificationPermission = useCallback(async () => {
@@ -141,13 +101,8 @@ export function useWebSocketNotifications() {
   }, [])
 
   useEffect(() => {
-    connect()
     requestNotificationPermission()
-
-    return () => {
-      disconnect()
-    }
-  }, [connect, disconnect, requestNotificationPermission])
+  }, [requestNotificationPermission])
 
   return {
     notifications,
@@ -155,7 +110,5 @@ export function useWebSocketNotifications() {
     isConnected,
     markAsRead,
     requestNotifications,
-    connect,
-    disconnect,
   }
 }